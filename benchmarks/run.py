@@ -0,0 +1,335 @@
+"""
+Benchmarks for the generation, export and dashboard-load hot paths.
+
+    python -m benchmarks.run                 # full suite
+    python -m benchmarks.run --quick         # smaller workloads, for a fast check
+    python -m benchmarks.run -k ammonia      # only benchmarks whose name contains "ammonia"
+
+Every workload uses fixed seeds and a fixed start time, so runs are comparable across commits.
+Each benchmark reports rows/sec and wall time (best of --repeat runs) and peak traced memory
+(one extra run under tracemalloc, so tracing overhead never affects the timings).
+Results are appended to benchmarks/results/history.jsonl (not committed) and compared with
+the previous run of the same benchmark; --fail-on-regression makes slowdowns fail the run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from simulator import Simulator
+from src.anomalies import AnomalyModel, empty_carry, inject_events
+from src.base_sensor import BaseSensor, time_grid
+from src.fleet import FleetSpec
+from src.network import LoRaNetwork
+from src.profiles import load_profiles
+from src.sensors.ammonia_sensor import AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterSensor
+from src.utils.data_export import CsvExporter, read_output
+from src.utils.payload_codec import decode, encode, frame_kind
+from src.utils.query import SimulationStore
+
+SEED = 1234
+BATCHED = {"batched": True}
+START = datetime(2025, 1, 1)
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "history.jsonl")
+
+
+class SineSensor(BaseSensor):
+    """Minimal BaseSensor subclass, so the base generation path can be measured on its own."""
+
+    def __init__(self, **kwargs):
+        super().__init__(type="sine", **kwargs)
+
+    def generate_reading(self, t):
+        return np.sin(t / 48) + self.rng.normal(0, 0.1)
+
+    def draw_values(self, rng, timestamps, draws):
+        return (rng.normal(0, 0.1, len(timestamps)),)
+
+    def generate_values(self, step0, timestamps, draws, samples):
+        return {"value": np.sin(np.arange(step0, step0 + len(timestamps)) / 48) + samples[0]}
+
+
+class Benchmark:
+    """
+    One workload. setup(params) builds untimed inputs (e.g. files to read back);
+    run(params, ctx) does the measured work and returns the number of rows it handled.
+    """
+
+    def __init__(self, name, params, run, setup=None):
+        self.name = name
+        self.params = params
+        self._run = run
+        self._setup = setup
+
+    @property
+    def key(self):
+        return self.name + "".join(f" {k}={v}" for k, v in self.params.items())
+
+    def measure(self, repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            params = dict(self.params, tmp=tmp)
+            with contextlib.redirect_stdout(io.StringIO()):
+                ctx = self._setup(params) if self._setup else None
+                times = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    rows = self._run(params, ctx)
+                    times.append(time.perf_counter() - t0)
+
+                tracemalloc.start()
+                self._run(params, ctx)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+        wall = min(times)
+        return {
+            "benchmark": self.key,
+            "rows": rows,
+            "wall_s": round(wall, 4),
+            "rows_per_sec": round(rows / wall, 1) if wall > 0 else None,
+            "peak_mb": round(peak / 2**20, 2),
+        }
+
+
+# --------------------------
+# Workloads
+# --------------------------
+
+def _sensor_generate(cls, call=None, **kwargs):
+    # kwargs go to the sensor, call to generate_data()
+    def run(p, ctx):
+        sensor = cls(seed=SEED, frequency=p["frequency"], **kwargs)
+        return len(sensor.generate_data(p["minutes"], start_time=START, **(call or {})))
+    return run
+
+
+def _fleet_spec(devices):
+    # devices split evenly between ammonia sensors and people counters over all locations
+    return FleetSpec({
+        "templates": {
+            "ammonia": {"kind": "ammonia", "frequency": 300},
+            "people_counter": {"kind": "people_counter", "frequency": 300},
+        },
+        "groups": [
+            {"name": "ammonia", "template": "ammonia", "count": max(1, devices // 2)},
+            {"name": "people_counter", "template": "people_counter", "count": max(1, devices - devices // 2),
+             "locations": ["toilet", "restaurant", "mall", "classroom"]},
+        ],
+    })
+
+
+def _run_all(p, ctx):
+    sim = Simulator(p["minutes"], start_time=START, output_dir=p["tmp"], seed=SEED, fleet=_fleet_spec(p["devices"]))
+    return len(sim.run_all())
+
+
+def _csv_setup(p):
+    sim = Simulator(p["minutes"], start_time=START, output_dir=p["tmp"], seed=SEED, fleet=_fleet_spec(p["devices"]))
+    return sim.run_all()
+
+
+def _csv_round_trip(p, ctx):
+    with CsvExporter(os.path.join(p["tmp"], "round_trip")) as exporter:
+        exporter.write(ctx)
+    return len(read_output(exporter.path))
+
+
+def _payload_setup(p):
+    df = _csv_setup(p)
+    kinds = df["sensor_type"].astype(str).map(frame_kind)
+    return {kind: part for kind, part in df.groupby(kinds, sort=False)}
+
+
+def _payload_round_trip(p, ctx):
+    # every reading encoded into uplink frames and decoded back, one batch per sensor kind
+    return sum(len(decode(encode(df, kind), kind)) for kind, df in ctx.items())
+
+
+def _profile_lookup(p, ctx):
+    # every compiled profile's channels at minute resolution; rows are timestamps looked up
+    timestamps = time_grid(START, p["minutes"], 60)[0]
+    rows = 0
+    for profile in load_profiles().profiles.values():
+        index = profile.index(timestamps)
+        for channel in profile.tables:
+            rows += len(profile.lookup(timestamps, channel, index))
+    return rows
+
+
+def _anomaly_inject(p, ctx):
+    # drawing and applying a chunk's anomalies for a fleet of devices at 5-minute intervals;
+    # the rate is high so events are frequent and their loops show
+    rng = np.random.default_rng(SEED)
+    model = AnomalyModel(0.05, {"spike": 1.0, "drift": 0.2, "stuck": 0.2, "dropout": 0.2})
+    num_points = p["minutes"] // 5
+    draws = [model.draw(rng, num_points) for _ in range(p["devices"])]
+    codes, magnitude, v = (np.column_stack(columns) for columns in zip(*draws))
+    value = np.zeros((num_points, p["devices"]))
+    carry = np.tile(empty_carry(1), (p["devices"], 1))
+    inject_events(codes, magnitude, v, np.zeros(codes.shape, dtype=bool), carry, {"value": value}, {"value": 1.0})
+    return value.size
+
+
+def _fleet_registry(p, ctx):
+    # fleet setup: compile the spec and allocate every device's devEUI
+    return len(_fleet_spec(p["devices"]).registry(SEED))
+
+
+def _network_deliver(p, ctx):
+    # the generated day of uplinks through 4 gateways, in one batch; rows are uplinks sent
+    network = LoRaNetwork(gateways=4, seed=SEED)
+    network.deliver(ctx)
+    network.flush()
+    return len(ctx)
+
+
+def _dashboard_setup(p):
+    Simulator(p["minutes"], start_time=START, output_dir=p["tmp"], seed=SEED,
+              output_format=p["format"], fleet=_fleet_spec(p["devices"])).run_all()
+
+
+def _dashboard_rollups(p, ctx):
+    # the dashboard's query: both outputs' hourly type rollups for the mall, filtered to the morning hours;
+    # rows are readings summarized
+    store = SimulationStore(p["tmp"])
+    rollup = store.rollup(["ammonia", "people_counter"], sensor_types=["ammonia", "people_counter_mall"],
+                          hours=range(6, 12))
+    return int(rollup["count"].sum())
+
+
+def benchmarks(quick=False):
+    days = [1] if quick else [1, 7]
+    frequencies = [300] if quick else [60, 300]
+    devices = [10, 100] if quick else [10, 100, 1000]
+    suite = []
+    for d in days:
+        for f in frequencies:
+            p = {"minutes": 1440 * d, "frequency": f}
+            suite += [
+                Benchmark("base_sensor.generate_data", p, _sensor_generate(SineSensor)),
+                Benchmark("base_sensor.generate_data[batched]", p, _sensor_generate(SineSensor, BATCHED)),
+                Benchmark("ammonia.generate_data", p, _sensor_generate(AmmoniaSensor)),
+                Benchmark("ammonia.generate_data[batched]", p, _sensor_generate(AmmoniaSensor, BATCHED)),
+                Benchmark("people_counter.generate_data", p, _sensor_generate(PeopleCounterSensor, location="mall")),
+                Benchmark("people_counter.generate_data[batched]", p,
+                          _sensor_generate(PeopleCounterSensor, BATCHED, location="mall")),
+            ]
+    for d in days:
+        suite.append(Benchmark("profiles.lookup", {"minutes": 1440 * d}, _profile_lookup))
+    for n in devices:
+        suite.append(Benchmark("anomalies.inject", {"minutes": 1440 * days[-1], "devices": n}, _anomaly_inject))
+    for n in devices:
+        suite.append(Benchmark("simulator.run_all", {"minutes": 1440, "devices": n}, _run_all))
+    for n in devices:
+        suite.append(Benchmark("csv.round_trip", {"minutes": 1440, "devices": n}, _csv_round_trip, _csv_setup))
+    for n in devices:
+        suite.append(Benchmark("payload.round_trip", {"minutes": 1440, "devices": n}, _payload_round_trip,
+                               _payload_setup))
+    for n in devices + [1_000_000]:
+        suite.append(Benchmark("fleet.registry", {"devices": n}, _fleet_registry))
+    for n in devices:
+        suite.append(Benchmark("network.deliver", {"minutes": 1440, "devices": n}, _network_deliver, _csv_setup))
+    for fmt in ["csv", "parquet"]:
+        suite.append(Benchmark("dashboard.rollup_metrics", {"minutes": 1440 * 7, "devices": devices[-1], "format": fmt},
+                               _dashboard_rollups, _dashboard_setup))
+    return suite
+
+
+# --------------------------
+# History
+# --------------------------
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _environment():
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_history(path):
+    """Latest recorded result per benchmark key."""
+    latest = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    latest[record["benchmark"]] = record
+    return latest
+
+
+def append_history(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for record in results:
+            f.write(json.dumps(record) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulator benchmarks.")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--history", default=HISTORY, help="JSON-lines file results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="don't append results to the history")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown in rows/sec vs the previous run that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args(argv)
+
+    previous = load_history(args.history)
+    env = dict(_environment(), run_at=datetime.now().isoformat(timespec="seconds"), quick=args.quick)
+    results, regressions = [], []
+    print(f"{'benchmark':<72} {'rows':>10} {'wall s':>8} {'rows/s':>12} {'peak MB':>8}  vs last")
+    for bench in benchmarks(args.quick):
+        if args.filter not in bench.key:
+            continue
+        record = dict(bench.measure(args.repeat), **env)
+        results.append(record)
+
+        change = ""
+        last = previous.get(record["benchmark"])
+        if last and last.get("rows_per_sec") and record["rows_per_sec"]:
+            ratio = record["rows_per_sec"] / last["rows_per_sec"] - 1
+            change = f"{ratio:+.0%}"
+            if ratio < -args.threshold:
+                change += " ⚠️"
+                regressions.append(record["benchmark"])
+        print(f"{record['benchmark']:<72} {record['rows']:>10,} {record['wall_s']:>8.3f} "
+              f"{record['rows_per_sec']:>12,.0f} {record['peak_mb']:>8.1f}  {change}")
+
+    if results and not args.no_save:
+        append_history(args.history, results)
+        print(f"\n📁 Results appended to {args.history}")
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} regression(s) beyond {args.threshold:.0%}: " + ", ".join(regressions))
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,11 +2,39 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+from datetime import date, datetime
 from simulator import Simulator
+from src.fleet import load_fleet_spec
+from src.jobs import JobManager
+from src.rollups import mean, means
+from src.utils.downsample import downsample
+from src.utils.query import SimulationStore
+from src.utils.stats import load_report
 
 
 st.set_page_config(page_title="IoT Sensor Dashboard", layout="wide")
 
+# Max points drawn per plotted series; more than this adds nothing at screen resolution
+POINT_BUDGET = 2000
+
+
+@st.cache_resource
+def get_store(output_dir):
+    # one store per session server: its indexed rollups are reused across reruns until the files change
+    return SimulationStore(output_dir)
+
+
+@st.cache_resource
+def get_jobs(output_dir):
+    # one worker pool per session server, shared by every session so identical requests run once
+    return JobManager(Simulator, output_dir, max_workers=max(1, (os.cpu_count() or 1) // 2))
+
+
+@st.cache_resource
+def get_fleet():
+    # fleet definition shared with the simulator (configs/sensors.yaml)
+    return load_fleet_spec()
+
 # --------------------------
 # 1. Sidebar / Controls
 # --------------------------
@@ -16,49 +44,72 @@ st.sidebar.title("Controls")
 output_dir = "outputs"
 os.makedirs(output_dir, exist_ok=True)
 
+fleet = get_fleet()
 location = st.sidebar.selectbox(
     "Select environment:",
-    ["Toilet", "Restaurant", "Mall", "Classroom"],
+    [loc.title() for loc in fleet.locations()],
     index=0
 )
 
-# Required base files
-ammonia_file = os.path.join(output_dir, "ammonia.csv")
+# Ammonia groups plus the people-counter groups covering this location (CSV, Parquet or Feather)
+store = get_store(output_dir)
+pc_type = f"people_counter_{location.lower()}"
+ammonia_names = fleet.names(kind="ammonia")
+pc_names = fleet.names(kind="people_counter", location=location.lower())
+sensor_names = ammonia_names + pc_names
 
-# Location-specific people counter file
-pc_file = os.path.join(output_dir, f"people_counter_{location.lower()}.csv")
-
-# Generate Data
+# Generate Data: runs as a background job; the page stays usable and picks up the new data when it is published
+jobs = get_jobs(output_dir)
 st.sidebar.markdown("Data Generation")
+days = st.sidebar.number_input("Days to simulate", min_value=1, max_value=365, value=1)
 if st.sidebar.button(f"Generate data for {location}"):
-    with st.spinner(f"Running simulator for {location}..."):
-        from simulator import Simulator  # simulator now in root
-        sim = Simulator(duration_minutes=1440)
-        sim.run_all(["ammonia", f"people_counter_{location.lower()}"])
-    st.sidebar.success(f"Generated simulation data for {location}")
+    # starting today at midnight, so the same request from any session is the same job
+    today = datetime.combine(date.today(), datetime.min.time())
+    job = jobs.submit(sensor_names, duration_minutes=1440 * days, start_time=today, fleet=fleet, stats=True,
+                      chunk_minutes=360)
+    st.session_state["job"] = job.key
+
+if "job_message" in st.session_state:
+    kind, message = st.session_state.pop("job_message")
+    getattr(st.sidebar, kind)(message)
+
+
+def job_status():
+    job = jobs.get(st.session_state.get("job"))
+    if job is None:
+        return
+    p = job.progress()
+    if job.active:
+        eta = f", ETA {p['eta_seconds']:.0f} s" if p["eta_seconds"] is not None else ""
+        st.progress(p["fraction"], text=f"{p['status'].title()}: {p['rows']:,} / {p['total']:,} rows, "
+                                        f"{p['rows_per_sec']:,.0f} rows/s{eta}")
+        if st.button("Cancel generation"):
+            job.cancel()
+        return
+    # finished: rerun the whole page so it reads the newly published outputs
+    del st.session_state["job"]
+    if p["status"] == "done":
+        st.session_state["job_message"] = ("success", f"Generated {p['rows']:,} readings for {location}")
+    elif p["status"] == "failed":
+        st.session_state["job_message"] = ("error", f"Generation failed: {job.error}")
+    else:
+        st.session_state["job_message"] = ("info", "Generation cancelled")
     st.rerun()
 
+
+# polls the running job every second without rerunning the rest of the page
+with st.sidebar:
+    st.fragment(job_status, run_every=1 if "job" in st.session_state else None)()
+
 # Load Data
-if not (os.path.exists(ammonia_file) and os.path.exists(pc_file)):
+if len(store.available(sensor_names)) < len(sensor_names):
     st.sidebar.warning(f"No data found for {location}")
     st.stop()
 
-# Load both datasets
-df_ammonia = pd.read_csv(ammonia_file)
-df_pc = pd.read_csv(pc_file)
-
-# Convert timestamps
-df_ammonia["timestamp"] = pd.to_datetime(df_ammonia["timestamp"])
-df_pc["timestamp"] = pd.to_datetime(df_pc["timestamp"])
-
-# Merge both datasets
-df = pd.concat([df_ammonia, df_pc], ignore_index=True)
-df.sort_values("timestamp", inplace=True)
-
 st.sidebar.success(f"Loaded data for {location} environment.")
 
-# Sensor selection (if multiple types exist)
-sensor_types = sorted(df["sensor_type"].dropna().unique())
+# Sensor selection (a group's output may hold several sensor types; only this location's are shown)
+sensor_types = (["ammonia"] if ammonia_names else []) + [pc_type]
 selected_sensors = st.sidebar.multiselect("Select sensors", sensor_types, default=sensor_types)
 
 # Define discrete periods and their hour ranges
@@ -102,15 +153,28 @@ for p in selected_periods:
     lo, hi = period_ranges[p]
     selected_hours.extend(range(lo, hi))
 
-# Filter dataframe
-if "timestamp" in df.columns:
-    df = df[df["timestamp"].dt.hour.isin(selected_hours)]
+# Metrics and charts come from the per-type rollups the simulator writes next to its outputs,
+# so a rerun reads one row per sensor type and bucket however many raw readings there are
+def rollup(names, types, granularity="hourly"):
+    types = [t for t in types if t in selected_sensors]
+    return store.rollup(names, level="type", granularity=granularity, sensor_types=types, hours=selected_hours)
 
-# Filter by sensor type
-df = df[df["sensor_type"].isin(selected_sensors)]
+
+def detail(names, types, hourly):
+    # per-minute buckets while they fit the point budget, hourly ones once the range is zoomed out
+    buckets = hourly.groupby("sensor_type", observed=True).size().max() if len(hourly) else 0
+    return rollup(names, types, "1min") if buckets * 60 <= POINT_BUDGET else hourly
+
+
+df = rollup(sensor_names, sensor_types)
+nh3_df = rollup(ammonia_names, ["ammonia"])
+pc_df = rollup(pc_names, [pc_type])
+df_series = detail(sensor_names, sensor_types, df)
+nh3_series = detail(ammonia_names, ["ammonia"], nh3_df)
+pc_series = detail(pc_names, [pc_type], pc_df)
 
 st.sidebar.markdown("---")
-show_anomalies = st.sidebar.checkbox("Highlight anomalies (>100 NH3 ppm or >10 occupancy change)", True)
+show_anomalies = st.sidebar.checkbox("Highlight labeled anomalies", True)
 
 # --------------------------
 # 2. Main Layout
@@ -121,7 +185,7 @@ st.markdown(
     "or real UnaBiz deployments. It supports multiple sensor types and realistic anomaly detection."
 )
 
-tab1, tab2, tab3, tab4 = st.tabs(["Overview", "People Counter", "Ammonia", "Network Health"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Overview", "People Counter", "Ammonia", "Network Health", "Run Stats"])
 
 # ======================================================
 # Overview Tab
@@ -130,47 +194,51 @@ with tab1:
     st.subheader("System Overview")
 
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total Readings", f"{len(df):,}")
-    col2.metric("Active Sensors", f"{len(sensor_types)}")
-    col3.metric("Average RSSI", f"{df['rssi'].mean():.1f} dBm" if 'rssi' in df else "—")
-    col4.metric("Average Battery", f"{df['battery'].mean():.1f}%" if 'battery' in df else "—")
-
-    if "nh3" in df.columns and "ammonia" in selected_sensors and not df[df["sensor_type"].str.contains("ammonia")].empty:
-        sub = df[df["sensor_type"].str.contains("ammonia")]
-        fig_nh3 = px.line(sub, x="timestamp", y="nh3", color="sensor_type",
+    col1.metric("Total Readings", f"{int(df['count'].sum()):,}")
+    # device counts come from the run's registry index, without scanning the readings
+    registry = store.registry()
+    if registry is not None:
+        col2.metric("Active Sensors", f"{sum(len(registry.by_type(t)) for t in selected_sensors):,}")
+    else:
+        col2.metric("Active Sensors", f"{len(sensor_types)}")
+    col3.metric("Average RSSI", f"{mean(df, 'rssi'):.1f} dBm" if 'rssi_sum' in df else "—")
+    col4.metric("Average Battery", f"{mean(df, 'battery'):.1f}%" if 'battery_sum' in df else "—")
+
+    if not nh3_df.empty:
+        fig_nh3 = px.line(downsample(means(nh3_series, ["nh3"]), "timestamp", "nh3", POINT_BUDGET, by="sensor_type"),
+                        x="timestamp", y="nh3", color="sensor_type",
                         title="Ammonia (NH₃) Levels Over Time")
         if show_anomalies:
-            df_spikes = df[df["nh3"] > 100]
-            fig_nh3.add_scatter(x=df_spikes["timestamp"], y=df_spikes["nh3"],
+            # buckets holding ground-truth anomalies where the output has labels, otherwise peaks above 100 ppm,
+            # marked at the bucket's peak
+            if "anomalies" in nh3_series:
+                df_spikes = nh3_series[nh3_series["anomalies"] > 0]
+            else:
+                df_spikes = nh3_series[nh3_series["nh3_max"] > 100]
+            fig_nh3.add_scatter(x=df_spikes["timestamp"], y=df_spikes["nh3_max"],
                                 mode="markers", marker=dict(color="red", size=8), name="Anomalies")
         st.plotly_chart(fig_nh3, use_container_width=True)
 
-    if "current_occupancy" in df.columns and any("people_counter" in s for s in selected_sensors):
-        pc_df = df[df["sensor_type"].str.contains("people_counter", na=False)]
-        if not pc_df.empty:
-            fig_occ = px.line(pc_df, x="timestamp", y="current_occupancy", color="sensor_type",
-                              title="Occupancy (People Counter Sensors)")
-            st.plotly_chart(fig_occ, use_container_width=True)
+    if not pc_df.empty:
+        fig_occ = px.line(downsample(means(pc_series, ["current_occupancy"]), "timestamp", "current_occupancy",
+                                     POINT_BUDGET, by="sensor_type"),
+                          x="timestamp", y="current_occupancy", color="sensor_type",
+                          title="Occupancy (People Counter Sensors)")
+        st.plotly_chart(fig_occ, use_container_width=True)
 
 # ======================================================
 # People Counter Tab
 # ======================================================
 with tab2:
     st.subheader("People Counter Metrics")
-    pc_df = df[df["sensor_type"].str.contains("people_counter", na=False)]
 
     if not pc_df.empty:
-        pc_df["period_in"] = pd.to_numeric(pc_df["period_in"], errors="coerce")
-        pc_df["period_out"] = pd.to_numeric(pc_df["period_out"], errors="coerce")
-        if "current_occupancy" in pc_df.columns:
-            pc_df["current_occupancy"] = pd.to_numeric(pc_df["current_occupancy"], errors="coerce")
-
-        # Calculate metrics safely
-        avg_in = pc_df["period_in"].dropna().mean()
-        avg_out = pc_df["period_out"].dropna().mean()
+        # sums over counts and the max of the bucket maxes give the same numbers as the raw readings
+        avg_in = mean(pc_df, "period_in")
+        avg_out = mean(pc_df, "period_out")
         max_occupancy = (
-            pc_df["current_occupancy"].max()
-            if "current_occupancy" in pc_df.columns else None
+            pc_df["current_occupancy_max"].max()
+            if "current_occupancy_max" in pc_df.columns else None
         )
         col1, col2, col3 = st.columns(3)
         col1.metric("Average Inflow", f"{avg_in:.1f}")
@@ -180,11 +248,14 @@ with tab2:
         else:
             col3.metric("Max Occupancy", "—")
 
-        fig_inout = px.bar(pc_df, x="timestamp", y=["period_in", "period_out"],
+        flows = means(pc_series, ["period_in", "period_out", "current_occupancy"])
+        fig_inout = px.bar(downsample(flows, "timestamp", ["period_in", "period_out"], POINT_BUDGET, method="minmax"),
+                           x="timestamp", y=["period_in", "period_out"],
                            title="People Flow (In/Out)", barmode="group")
         st.plotly_chart(fig_inout, use_container_width=True)
 
-        fig_occ2 = px.line(pc_df, x="timestamp", y="current_occupancy",
+        fig_occ2 = px.line(downsample(flows, "timestamp", "current_occupancy", POINT_BUDGET),
+                           x="timestamp", y="current_occupancy",
                            title="Occupancy Over Time")
         st.plotly_chart(fig_occ2, use_container_width=True)
     else:
@@ -195,18 +266,20 @@ with tab2:
 # ======================================================
 with tab3:
     st.subheader("Ammonia Sensor Metrics")
-    nh3_df = df[df["sensor_type"].str.contains("ammonia", na=False)]
 
     if not nh3_df.empty:
         col1, col2, col3 = st.columns(3)
-        col1.metric("Average NH₃", f"{nh3_df['nh3'].mean():.2f} ppm")
-        col2.metric("Average Temp", f"{nh3_df['temperature'].mean():.1f} °C")
-        col3.metric("Average Humidity", f"{nh3_df['humidity'].mean():.1f} %")
+        col1.metric("Average NH₃", f"{mean(nh3_df, 'nh3'):.2f} ppm")
+        col2.metric("Average Temp", f"{mean(nh3_df, 'temperature'):.1f} °C")
+        col3.metric("Average Humidity", f"{mean(nh3_df, 'humidity'):.1f} %")
 
-        fig_nh3_2 = px.line(nh3_df, x="timestamp", y="nh3", title="NH₃ Concentration Over Time")
+        air = means(nh3_series, ["nh3", "temperature", "humidity"])
+        fig_nh3_2 = px.line(downsample(air, "timestamp", "nh3", POINT_BUDGET),
+                            x="timestamp", y="nh3", title="NH₃ Concentration Over Time")
         st.plotly_chart(fig_nh3_2, use_container_width=True)
 
-        fig_temp = px.line(nh3_df, x="timestamp", y=["temperature", "humidity"],
+        fig_temp = px.line(downsample(air, "timestamp", ["temperature", "humidity"], POINT_BUDGET),
+                           x="timestamp", y=["temperature", "humidity"],
                            title="Temperature and Humidity Trends")
         st.plotly_chart(fig_temp, use_container_width=True)
     else:
@@ -218,17 +291,59 @@ with tab3:
 with tab4:
     st.subheader("Network & Device Health")
 
-    if "rssi" in df.columns:
-        fig_rssi = px.line(df, x="timestamp", y="rssi", color="sensor_type", title="RSSI Signal Strength")
+    health = means(df_series, [m for m in ("rssi", "snr", "battery") if f"{m}_sum" in df_series])
+
+    if "rssi" in health.columns:
+        fig_rssi = px.line(downsample(health, "timestamp", "rssi", POINT_BUDGET, by="sensor_type"),
+                           x="timestamp", y="rssi", color="sensor_type", title="RSSI Signal Strength")
         st.plotly_chart(fig_rssi, use_container_width=True)
 
-    if "snr" in df.columns:
-        fig_snr = px.line(df, x="timestamp", y="snr", color="sensor_type", title="SNR Levels")
+    if "snr" in health.columns:
+        fig_snr = px.line(downsample(health, "timestamp", "snr", POINT_BUDGET, by="sensor_type"),
+                          x="timestamp", y="snr", color="sensor_type", title="SNR Levels")
         st.plotly_chart(fig_snr, use_container_width=True)
 
-    if "battery" in df.columns:
-        fig_batt = px.line(df, x="timestamp", y="battery", color="sensor_type", title="Battery Drain Over Time")
+    if "battery" in health.columns:
+        fig_batt = px.line(downsample(health, "timestamp", "battery", POINT_BUDGET, by="sensor_type"),
+                           x="timestamp", y="battery", color="sensor_type", title="Battery Drain Over Time")
         st.plotly_chart(fig_batt, use_container_width=True)
 
+    if registry is not None:
+        devEUI = st.text_input("Look up a device by devEUI", placeholder="16 hex digits")
+        if devEUI:
+            try:
+                st.json(registry.get(devEUI.strip().lower()))
+            except KeyError:
+                st.warning(f"No device {devEUI} in this run")
+            except ValueError as e:
+                st.warning(str(e))
+
+# ======================================================
+# Run Stats Tab
+# ======================================================
+with tab5:
+    st.subheader("Simulator Run Stats")
+
+    stats_path = os.path.join(output_dir, "run_stats.json")
+    if os.path.exists(stats_path):
+        report = load_report(stats_path)
+        stages = pd.DataFrame(report["stages"])
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Wall Time", f"{report['wall_seconds']:.2f} s")
+        col2.metric("Rows Generated", f"{stages.loc[stages['stage'] == 'generate', 'rows'].sum():,}")
+        col3.metric("Bytes Written", f"{stages['bytes'].sum() / 2**20:.1f} MB")
+        col4.metric("Peak Memory", f"{report['peak_bytes'] / 2**20:.1f} MB" if report["peak_bytes"] else "—")
+        st.caption(f"Run finished {report['created']}")
+
+        fig_stages = px.bar(stages, x="sensor", y="seconds", color="stage", title="Time per Sensor and Stage")
+        st.plotly_chart(fig_stages, use_container_width=True)
+        st.dataframe(stages, use_container_width=True)
+        if report["profile"]:
+            st.markdown("**Top functions by cumulative time**")
+            st.dataframe(pd.DataFrame(report["profile"]), use_container_width=True)
+    else:
+        st.info("No run stats yet. Generate data from the sidebar to record them.")
+
 st.markdown("---")
 st.caption("© 2025 UnaBiz Internship Project — Sensor Data Simulator Dashboard by Rayson")
@@ -1,8 +1,27 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from src.sensors.ammonia_sensor import AmmoniaSensor
-from src.sensors.people_counter import PeopleCounterSensor
+from datetime import datetime, timedelta
+from src.checkpoint import capture_state, checkpoint_path, concat_states, load_checkpoint, restore_state, save_checkpoint
+from src.fleet import NODE_SPLITS, FleetSpec, load_fleet_spec
+from src.manifest import describe_output, node_dir, verify_nodes, write_manifest
+from src.registry import DEVICES_NAME
+from src.rollups import GRANULARITIES, LEVELS, RollupStream, RollupWriter, find_rollup, restore_rollup, rollup_path
+from src.utils.data_export import (TeeExporter, find_output, get_exporter, iter_output_chunks, iter_sorted_chunks,
+                                   iter_frame_chunks, merge_sorted)
+from src.utils.stats import RunStats, NullStats, NULL_STATS
+from src.schema import concat_frames
+from src.replay import ReplayScheduler
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _run_sensor_job(config, sensor_name, return_frame=True, keep_recent=False):
+    # process-pool entry point: each worker rebuilds its own Simulator from the picklable config
+    # and sends its stats back with the result
+    sim = Simulator(**config)
+    return sim.run_sensor(sensor_name, return_frame=return_frame, keep_recent=keep_recent), sim.stats
+
 
 class Simulator:
     """
@@ -10,54 +29,531 @@ class Simulator:
     Generates synchronized, realistic time-series data for testing and dashboards.
     """
 
-    def __init__(self, duration_minutes=1440, start_time=None, output_dir="outputs"):
+    def __init__(self, duration_minutes=1440, start_time=None, output_dir="outputs", seed=42, workers=1,
+                 chunk_minutes=None, output_format="csv", partition_by=None, compression=None, sinks=None,
+                 fleet=None, shard_size=10_000, stats=False, checkpoint=False, resume=False,
+                 node=None, node_split="range", network=None, rollups=True, rollup_levels=("type",), progress=None):
         self.duration_minutes = duration_minutes
+        self.seed = seed  # simulation seed; each device derives its own stream from it
         self.start_time = start_time if start_time else datetime.now()
+        # node=(i, n) runs only node i's share of every group's devices (see FleetSpec.node_devices),
+        # for spreading one run over n machines: outputs and a manifest go to <output_dir>/node-i-of-n,
+        # and merge_nodes() on the shared output_dir checks the manifests and assembles the dataset
+        self.root_dir = output_dir
+        self.node = tuple(node) if node is not None else None
+        self.node_split = node_split
+        if self.node is not None:
+            if len(self.node) != 2 or not 0 <= self.node[0] < self.node[1]:
+                raise ValueError(f"node must be (i, n) with 0 <= i < n, got {node!r}")
+            if node_split not in NODE_SPLITS:
+                raise ValueError(f"node_split must be one of {list(NODE_SPLITS)}, got {node_split!r}")
+            if seed is None:
+                raise ValueError("Node runs need a fixed seed, so every node derives the same devices")
+            output_dir = node_dir(output_dir, *self.node)
         self.output_dir = output_dir
+        self.workers = workers  # >1 fans sensors out to a process pool in run_all
+        # when set, sensors are generated and written chunk_minutes at a time so memory is bounded by chunk size
+        self.chunk_minutes = chunk_minutes
+        # output backend: "csv", "parquet" or "feather"/"arrow", optionally partitioned (e.g. ["sensor_type", "date"])
+        self.output_format = output_format
+        self.partition_by = partition_by
+        self.compression = compression
+        # rollups=True also writes each group's count/sum/min/max/last per sensor type at 1-minute,
+        # hourly and daily granularity under <output_dir>/rollups (see src/rollups.py); a list such as
+        # ["hourly", "daily"] writes only those. rollup_levels=("type", "device") adds per-device rollups,
+        # which are opt-in: at 1-minute granularity they are about as large as the raw output
+        self.rollups = tuple(GRANULARITIES) if rollups is True else tuple(rollups or ())
+        unknown = set(self.rollups) - set(GRANULARITIES)
+        if unknown:
+            raise ValueError(f"Unknown rollup granularities {sorted(unknown)} (expected some of {list(GRANULARITIES)})")
+        self.rollup_levels = tuple(rollup_levels)
+        unknown = set(self.rollup_levels) - set(LEVELS)
+        if unknown:
+            raise ValueError(f"Unknown rollup levels {sorted(unknown)} (expected some of {list(LEVELS)})")
+        # delivery sinks (see src/utils/sinks.py) that receive every generated chunk as well
+        self.sinks = list(sinks) if sinks else []
+        # optional LoRaNetwork (src/network.py) between the sensors and the sinks: sinks then get the
+        # gateway copies in arrival order (lost, duplicated and reordered); output files keep every reading
+        self.network = network
+        # optional progress(sensor_name, rows) callback, called after every generated chunk (in this process
+        # only, not in worker processes); raising from it stops the run, e.g. to cancel a background job
+        self.progress = progress
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # fleet definition: a FleetSpec, a YAML path, or None for configs/sensors.yaml.
+        # Each group is a runnable sensor name; its devices are built shard_size at a time when it runs
+        self.fleet = fleet if isinstance(fleet, FleetSpec) else load_fleet_spec(fleet)
+        self.shard_size = shard_size
 
-        # Registry of all available sensor classes
-        self.sensor_registry = {
-            "ammonia": AmmoniaSensor,
-            "people_counter_toilet": lambda **kwargs: PeopleCounterSensor(location="toilet", **kwargs),
-            "people_counter_restaurant": lambda **kwargs: PeopleCounterSensor(location="restaurant", **kwargs),
-            "people_counter_mall": lambda **kwargs: PeopleCounterSensor(location="mall", **kwargs),
-            "people_counter_classroom": lambda **kwargs: PeopleCounterSensor(location="classroom", **kwargs),
+        # stage timings/memory (src/utils/stats.py): False, True, or a RunStats with tracemalloc/cProfile options.
+        # When on, run_all writes them to <output_dir>/run_stats.json
+        if isinstance(stats, (RunStats, NullStats)):
+            self.stats = stats
+        else:
+            self.stats = RunStats() if stats else NULL_STATS
+
+        # checkpoint=True saves every device's state after a run (<output_dir>/.checkpoints/<group>.npz);
+        # resume=True continues each group from its checkpoint, appending the next duration_minutes
+        # to the existing outputs (groups without a checkpoint yet start fresh at start_time)
+        self.resume = resume
+        self.checkpoint = checkpoint or resume
+        if self.checkpoint and self.seed is None:
+            raise ValueError("Checkpoints need a fixed seed, so resumed devices get their identities back")
+        self._node_devices = {}
+        # every device of the fleet with its devEUI and metadata (src/registry.py); built here so
+        # worker processes get the same devEUIs with the fleet even when seed is None
+        self.registry = self.fleet.registry(self.seed)
+
+    def _worker_config(self):
+        # everything a worker process needs to rebuild an equivalent single-process Simulator
+        return {
+            "duration_minutes": self.duration_minutes,
+            "start_time": self.start_time,
+            "output_dir": self.root_dir,
+            "seed": self.seed,
+            "chunk_minutes": self.chunk_minutes,
+            "output_format": self.output_format,
+            "partition_by": self.partition_by,
+            "compression": self.compression,
+            "fleet": self.fleet,
+            "shard_size": self.shard_size,
+            "stats": self.stats.fresh(),
+            "checkpoint": self.checkpoint,
+            "resume": self.resume,
+            "node": self.node,
+            "node_split": self.node_split,
+            "rollups": self.rollups,
+            "rollup_levels": self.rollup_levels,
         }
 
-    def run_sensor(self, sensor_name, **kwargs):
-        """Run one sensor and return its DataFrame."""
-        if sensor_name not in self.sensor_registry:
-            raise ValueError(f"Unknown sensor type: {sensor_name}")
-        print(f"🟢 Running simulation for {sensor_name} ...")
+    def _devices(self, sensor_name):
+        # indices of the group's devices this Simulator runs: all of them, or this node's share
+        if self.node is None:
+            return np.arange(self.fleet.group(sensor_name)["count"])
+        if sensor_name not in self._node_devices:
+            self._node_devices[sensor_name] = self.fleet.node_devices(sensor_name, *self.node, self.node_split, self.seed)
+        return self._node_devices[sensor_name]
+
+    def expected_rows(self, sensors_to_run=None):
+        """Readings a run of these groups generates (fewer if anomalies drop some), from the registry's frequencies."""
+        total = 0
+        for name in sensors_to_run if sensors_to_run is not None else self.fleet.names():
+            frequency = self.registry.table["frequency"][self.registry.group_slice(name)][self._devices(name)]
+            total += int((self.duration_minutes * 60 // frequency.astype(np.float64)).sum())
+        return total
 
-        SensorClass = self.sensor_registry[sensor_name]
-        sensor = SensorClass(seed=42, **kwargs)
-        df = sensor.generate_data(duration_minutes=self.duration_minutes, start_time=self.start_time)
+    def _make_sensor(self, sensor_name, index=0, **kwargs):
+        # index tells apart several devices of the same sensor group
+        return self.fleet.materialize(sensor_name, index, index + 1, self.seed, **kwargs)[0]
+
+    def _iter_chunks(self, sensor, first_step=0):
+        # chunks are sized in minutes so every sensor covers the same time span per chunk
+        minutes = self.chunk_minutes if self.chunk_minutes else self.duration_minutes
+        chunk_size = max(1, int((minutes * 60) / sensor.frequency))
+        return sensor.iter_chunks(self.duration_minutes, chunk_size=chunk_size, start_time=self.start_time,
+                                  first_step=first_step)
+
+    def _exporter(self, name, append=False):
+        return get_exporter(os.path.join(self.output_dir, name), self.output_format,
+                            self.partition_by, self.compression, append=append)
+
+    def _sensor_exporter(self, sensor_name, append, keep_recent):
+        exporter = self._exporter(sensor_name, append)
+        if append and keep_recent:
+            # scratch copy of just the rows this resumed run appends to the sensor output
+            recent = get_exporter(os.path.join(self.output_dir, f".{sensor_name}.recent"), self.output_format)
+            exporter = TeeExporter(exporter, recent)
+        if self.rollups:
+            rollups = RollupWriter(self.output_dir, sensor_name, self.output_format, self.compression, append,
+                                   granularities=self.rollups, levels=self.rollup_levels)
+            exporter = TeeExporter(exporter, rollups)
+        return exporter
+
+    def _load_checkpoints(self, sensor_names):
+        """
+        With resume on: the checkpoints of sensor_names, after moving start_time to where they ended.
+        Returns {} when none of the groups has one yet (first run of a rolling dataset).
+        """
+        if not self.resume:
+            return {}
+        found = {name: load_checkpoint(checkpoint_path(self.output_dir, name)) for name in sensor_names}
+        missing = [name for name, checkpoint in found.items() if checkpoint is None]
+        if len(missing) == len(found):
+            return {}
+        if missing:
+            raise ValueError(f"Can't resume: no checkpoint for {missing} in {self.output_dir}")
+
+        ends = {meta["end_time"] for meta, _ in found.values()}
+        if len(ends) > 1:
+            raise ValueError(f"Can't resume: checkpoints end at different times {sorted(ends)}")
+        for name, (meta, _) in found.items():
+            count = len(self._devices(name))
+            if meta["seed"] != self.seed or meta["devices"] != count:
+                raise ValueError(f"Can't resume {name}: checkpoint has seed {meta['seed']} and {meta['devices']} "
+                                 f"devices, this run has seed {self.seed} and {count}")
+        self.start_time = datetime.fromisoformat(ends.pop())
+        return found
+
+    def _capture(self, sensor_name, devices):
+        with self.stats.stage(sensor_name, "checkpoint"):
+            return capture_state(devices)
+
+    def _save_checkpoint(self, sensor_name, states, frequency, first_step):
+        steps = first_step + int((self.duration_minutes * 60) / frequency)
+        meta = {
+            "sensor": sensor_name,
+            "seed": self.seed,
+            "devices": len(self._devices(sensor_name)),
+            "frequency": frequency,
+            "steps": steps,
+            "end_time": (self.start_time + timedelta(minutes=self.duration_minutes)).isoformat(),
+        }
+        with self.stats.stage(sensor_name, "checkpoint"):
+            save_checkpoint(checkpoint_path(self.output_dir, sensor_name), meta, concat_states(states))
+
+    def _run_shard(self, sensor_name, lo, hi, exporter, return_frame, resume_state=None, first_step=0, **kwargs):
+        # devices lo..hi-1 (positions in _devices()) only exist while their shard runs; returns their frames and the devices
+        with self.stats.stage(sensor_name, "build"):
+            devices = self.fleet.build_devices(sensor_name, self._devices(sensor_name)[lo:hi], self.seed, **kwargs)
+            if resume_state is not None:
+                restore_state(devices, resume_state, lo)
+        frames = []
+        for chunk in self.stats.timed_iter(self._iter_chunks(devices, first_step), sensor_name, "generate"):
+            with self.stats.stage(sensor_name, "export", rows=len(chunk)):
+                exporter.write(chunk)
+            if self.sinks:
+                self._send(sensor_name, chunk)
+            if self.progress is not None:
+                self.progress(sensor_name, len(chunk))
+            if return_frame:
+                frames.append(chunk)
+        if self.sinks and self.network is not None:
+            self._send(sensor_name, None)
+        return frames, devices
+
+    def _send(self, sensor_name, chunk):
+        # chunk to every sink, through the network if there is one (chunk=None: the copies still in flight)
+        if self.network is not None:
+            with self.stats.stage(sensor_name, "network", rows=len(chunk) if chunk is not None else 0):
+                chunk = self.network.deliver(chunk) if chunk is not None else self.network.flush()
+            if chunk.empty:
+                return
+        with self.stats.stage(sensor_name, "sinks", rows=len(chunk)):
+            for sink in self.sinks:
+                sink.send(chunk)
+
+    def run_sensor(self, sensor_name, return_frame=True, keep_recent=False, **kwargs):
+        """
+        Run one sensor group from the fleet config, writing its output chunk by chunk.
+        Returns its DataFrame, or just the output path with return_frame=False (nothing is kept in memory).
+        When resuming, only the new interval is generated and returned; it is appended to the output.
+        keep_recent additionally keeps a resumed run's new rows in a scratch output (used by run_all).
+        """
+        count = len(self._devices(sensor_name))
+        shards = [(lo, min(lo + self.shard_size, count)) for lo in range(0, count, self.shard_size)]
+        if not shards:
+            # more nodes than devices: this node has none of the group
+            print(f"⚪ No {sensor_name} devices on node {self.node[0]} of {self.node[1]}")
+            return None if not return_frame else pd.DataFrame()
+        checkpoint = self._load_checkpoints([sensor_name]).get(sensor_name)
+        meta, resume_state = checkpoint if checkpoint else ({"steps": 0}, None)
+        append = checkpoint is not None
+        if append:
+            print(f"🟢 Resuming {sensor_name} ({count:,} devices) from {self.start_time} ...")
+        else:
+            print(f"🟢 Running simulation for {sensor_name} ({count:,} devices) ...")
 
-        # Save individual sensor output
-        filename = f"{self.output_dir}/{sensor_name}.csv"
-        df.to_csv(filename, index=False)
-        print(f"✅ {sensor_name} data saved to {filename}")
-        return df
+        with self.stats.session():
+            states = []
+            shard_kwargs = dict(kwargs, resume_state=resume_state, first_step=meta["steps"])
+            if len(shards) == 1:
+                with self._sensor_exporter(sensor_name, append, keep_recent) as exporter:
+                    frames, devices = self._run_shard(sensor_name, *shards[0], exporter, return_frame, **shard_kwargs)
+                if self.checkpoint:
+                    states.append(self._capture(sensor_name, devices))
+            else:
+                # every shard is time-ordered on its own; shards are spilled to scratch files and k-way merged
+                scratch = os.path.join(self.output_dir, f".{sensor_name}.shards")
+                parts = []
+                for k, (lo, hi) in enumerate(shards):
+                    with get_exporter(os.path.join(scratch, f"shard-{k:05d}"), self.output_format) as part:
+                        _, devices = self._run_shard(sensor_name, lo, hi, part, False, **shard_kwargs)
+                    if self.checkpoint:
+                        states.append(self._capture(sensor_name, devices))
+                    parts.append(part.path)
+                frames = []
+                with self._sensor_exporter(sensor_name, append, keep_recent) as exporter:
+                    merged = merge_sorted([iter_output_chunks(path) for path in parts])
+                    for block in self.stats.timed_iter(merged, sensor_name, "shard_merge"):
+                        with self.stats.stage(sensor_name, "export", rows=len(block)):
+                            exporter.write(block)
+                        if return_frame:
+                            frames.append(block)
+                shutil.rmtree(scratch)
+            self.stats.add(sensor_name, "export", bytes=exporter.bytes_written, calls=0)
+            # saved only once the output is complete, so a failed run resumes from the previous checkpoint
+            if self.checkpoint:
+                self._save_checkpoint(sensor_name, states, devices.frequency, meta["steps"])
+        print(f"✅ {sensor_name} data saved to {exporter.path}")
+        if not return_frame:
+            return exporter.path
+        return concat_frames(frames, ignore_index=True) if frames else pd.DataFrame()
 
-    def run_all(self, sensors_to_run):
+    def run_all(self, sensors_to_run=None):
         """
         Run multiple sensors and return a merged DataFrame.
-        sensors_to_run: list of sensor names (must match registry keys)
+        sensors_to_run: list of sensor group names from the fleet config (None runs every group)
+        With chunk_minutes set, output is streamed to disk and nothing is returned.
+        With resume, every output (the combined one too) gets only the new interval appended.
+        With node set, only the node's devices run and, instead of a combined output, the node's
+        manifest is written (see merge_nodes) and returned.
+        """
+        # streaming runs keep nothing in memory: the combined output is merged back from the sensor files
+        streaming = bool(self.chunk_minutes)
+        if sensors_to_run is None:
+            sensors_to_run = self.fleet.names()
+        # resumed runs append the new interval to the combined output too
+        append = bool(self._load_checkpoints(sensors_to_run))
+        # node runs write no combined output, so they keep neither frames nor the rows a resume adds
+        return_frame = not streaming and self.node is None
+        keep_recent = streaming and append and self.node is None
+        with self.stats.session():
+            if self.workers and self.workers > 1 and len(sensors_to_run) > 1:
+                if self.sinks:
+                    raise ValueError("Sinks hold live connections and can't be shared with worker processes; "
+                                     "use workers=1")
+                # each worker generates and writes its own sensor output; results come back in submission order
+                n = len(sensors_to_run)
+                with ProcessPoolExecutor(max_workers=min(self.workers, n)) as pool:
+                    jobs = list(pool.map(_run_sensor_job, [self._worker_config()] * n, sensors_to_run,
+                                         [return_frame] * n, [keep_recent] * n))
+                results = [result for result, _ in jobs]
+                for _, worker_stats in jobs:
+                    self.stats.merge(worker_stats)
+            else:
+                results = [self.run_sensor(name, return_frame=return_frame, keep_recent=keep_recent)
+                           for name in sensors_to_run]
+
+            if self.node is not None:
+                # the combined output is built once every node is done, by merge_nodes()
+                with self.stats.stage("manifest", "manifest"):
+                    manifest = self._write_manifest(sensors_to_run)
+            else:
+                combined_path, blocks = self._write_combined(results, sensors_to_run, streaming, append)
+                with self.stats.stage("registry", "save"):
+                    self.registry.save(os.path.join(self.output_dir, DEVICES_NAME))
+        if self.node is not None:
+            print(f"\n📁 Node {self.node[0]} of {self.node[1]} manifest saved to {manifest['path']}")
+            self._report_sinks()
+            self._report_stats()
+            return manifest
+        print(f"\n📁 Combined simulation saved to {combined_path}")
+        self._report_sinks()
+        self._report_stats()
+        if streaming:
+            return None
+        return concat_frames(blocks, ignore_index=True) if blocks else pd.DataFrame()
+
+    def _write_combined(self, results, sensors_to_run, streaming, append):
+        # merges the sensor outputs (files when streaming, else frames) into combined_simulation;
+        # returns its path and, for a non-streaming run, the merged blocks.
+        # Every sensor's output is already time-ordered, so a k-way merge replaces concat + sort
+        if streaming and append:
+            # resumed sensor outputs still hold the earlier runs; merge just the rows added now
+            results = [find_output(self.output_dir, f".{name}.recent") for name in sensors_to_run]
+        if streaming:
+            sources = [iter_sorted_chunks(path) for path in results]
+        else:
+            sources = [iter_frame_chunks(df) for df in results]
+        blocks = []
+        with self._exporter("combined_simulation", append) as combined:
+            for block in self.stats.timed_iter(merge_sorted(sources), "combined_simulation", "merge"):
+                with self.stats.stage("combined_simulation", "export", rows=len(block)):
+                    combined.write(block)
+                if not streaming:
+                    blocks.append(block)
+        self.stats.add("combined_simulation", "export", bytes=combined.bytes_written, calls=0)
+        if streaming and append:
+            for path in results:
+                os.remove(path)
+        return combined.path, blocks
+
+    def _run_settings(self, nodes, split):
+        # what every node of a split run must agree on (src/manifest.py RUN_KEYS), plus the run's interval
+        return {
+            "nodes": nodes,
+            "split": split,
+            "seed": self.seed,
+            "fleet": self.fleet.digest,
+            "start_time": self.start_time.isoformat(),
+            "end_time": (self.start_time + timedelta(minutes=self.duration_minutes)).isoformat(),
+            "output_format": self.output_format,
+            "partition_by": list(self.partition_by) if self.partition_by else None,
+            "compression": self.compression,
+        }
+
+    def _describe(self, name, devices):
+        path = find_output(self.output_dir, name)
+        if path is None:
+            entry = {"path": None, "rows": 0, "start": None, "end": None, "sha256": None}
+        else:
+            entry = describe_output(path)
+        group_seed = self.fleet.group(name)["seed"] if name in self.fleet else None
+        return dict(entry, devices=devices, seed=group_seed if group_seed is not None else self.seed)
+
+    def _node_share(self, name):
+        # which of the group's devices this node generated (checked by verify_nodes):
+        # its [lo, hi) index range, or the devEUI hash bucket of a hash split
+        if self.node_split == "hash":
+            return {"bucket": self.node[0]}
+        indices = self._devices(name)
+        return {"range": [int(indices[0]), int(indices[-1]) + 1] if len(indices) else [0, 0]}
+
+    def _write_manifest(self, sensors_to_run):
+        # rows, time bounds and checksums of everything this node wrote, plus the seeds and devices they came from
+        manifest = {
+            "node": self.node[0],
+            "run": self._run_settings(self.node[1], self.node_split),
+            "outputs": {name: dict(self._describe(name, len(self._devices(name))), **self._node_share(name))
+                        for name in sensors_to_run},
+        }
+        manifest["path"] = write_manifest(self.output_dir, manifest)
+        return manifest
+
+    def merge_nodes(self):
+        """
+        Assemble a run that was split over nodes (Simulator(node=(i, n)), one per machine) once every
+        node's directory is under output_dir. The node manifests are checked first (all nodes finished,
+        same settings and fleet, every device covered once, checksums intact); then each group's node
+        outputs are k-way merged into <output_dir>/<group>, followed by the combined output.
+        Writes and returns a manifest of the merged dataset. A "range" split merges back to exactly
+        the rows and order a single-host run produces.
+        """
+        if self.node is not None:
+            raise ValueError("merge_nodes() assembles all nodes; run it on a Simulator without node")
+        with self.stats.session():
+            with self.stats.stage("manifest", "verify"):
+                manifests = verify_nodes(self.output_dir, self.fleet)
+            run = manifests[0][1]["run"]
+            names = list(manifests[0][1]["outputs"])
+            print(f"🟢 Merging {len(names)} outputs from {run['nodes']} nodes ...")
+
+            merged = []
+            for name in names:
+                entries = [(directory, manifest["outputs"][name]) for directory, manifest in manifests.values()]
+                sources = [iter_sorted_chunks(os.path.join(directory, entry["path"]))
+                           for directory, entry in entries if entry["path"] is not None]
+                with self._exporter(name) as exporter:
+                    for block in self.stats.timed_iter(merge_sorted(sources), name, "node_merge"):
+                        with self.stats.stage(name, "export", rows=len(block)):
+                            exporter.write(block)
+                expected = sum(entry["rows"] for _, entry in entries)
+                if exporter.rows_written != expected:
+                    raise ValueError(f"{name}: merged {exporter.rows_written:,} rows, the manifests list {expected:,}")
+                if exporter.rows_written:
+                    merged.append(exporter.path)
+                print(f"✅ {name}: {exporter.rows_written:,} rows from {len(sources)} nodes saved to {exporter.path}")
+
+            if self.rollups:
+                self._merge_rollups(names, manifests)
+
+            with self._exporter("combined_simulation") as combined:
+                sources = [iter_sorted_chunks(path) for path in merged]
+                for block in self.stats.timed_iter(merge_sorted(sources), "combined_simulation", "merge"):
+                    with self.stats.stage("combined_simulation", "export", rows=len(block)):
+                        combined.write(block)
+
+            with self.stats.stage("registry", "save"):
+                self.fleet.registry(run["seed"]).save(os.path.join(self.output_dir, DEVICES_NAME))
+            with self.stats.stage("manifest", "manifest"):
+                outputs = {name: self._describe(name, self.fleet.group(name)["count"]) for name in names}
+                outputs["combined_simulation"] = self._describe("combined_simulation", len(self.fleet))
+                manifest = {
+                    "node": None,
+                    "run": dict(run, output_format=self.output_format, compression=self.compression,
+                                partition_by=list(self.partition_by) if self.partition_by else None),
+                    "nodes": {str(i): manifest["outputs"] for i, (_, manifest) in manifests.items()},
+                    "outputs": outputs,
+                }
+                manifest["path"] = write_manifest(self.output_dir, manifest)
+        print(f"\n📁 Combined simulation saved to {combined.path}, manifest to {manifest['path']}")
+        self._report_stats()
+        return manifest
+
+    def _merge_rollups(self, names, manifests):
+        # each rollup's node parts are k-way merged in time order; buckets that several nodes
+        # contributed to (type rollups) are combined into one row by the stream
+        for name in names:
+            with_rows = sum(manifest["outputs"][name]["path"] is not None for _, manifest in manifests.values())
+            for level in self.rollup_levels:
+                for granularity in self.rollups:
+                    paths = [find_rollup(directory, name, level, granularity) for directory, _ in manifests.values()]
+                    paths = [path for path in paths if path is not None]
+                    if len(paths) != with_rows:
+                        print(f"⚠️ {name}: only {len(paths)} of {with_rows} nodes wrote {level}/{granularity} rollups, "
+                              "skipping them")
+                        continue
+                    sources = [(restore_rollup(chunk, level) for chunk in iter_sorted_chunks(path)) for path in paths]
+                    exporter = get_exporter(rollup_path(self.output_dir, name, level, granularity),
+                                            self.output_format, compression=self.compression)
+                    with RollupStream(exporter, level) as stream:
+                        for block in self.stats.timed_iter(merge_sorted(sources), name, "rollup_merge"):
+                            stream.add(block)
+
+    def _report_sinks(self):
+        if self.sinks and self.network is not None:
+            stats = self.network.stats.summary()
+            print(f"📶 Network: {stats['uplinks']:,} uplinks, {stats['lost']:,} lost ({stats['loss_rate']:.2%}), "
+                  f"{stats['duplicates']:,} duplicates, {stats['out_of_order']:,} out of order")
+        for sink in self.sinks:
+            sink.flush()
+            stats = sink.stats.summary()
+            print(f"📡 {stats['sink']}: {stats['delivered']:,} delivered ({stats['failed']:,} failed), "
+                  f"{stats['throughput_per_sec']:,.0f}/s, p50 {stats['latency_p50_ms']} ms, "
+                  f"p99 {stats['latency_p99_ms']} ms")
+
+    def _report_stats(self):
+        if not self.stats.enabled:
+            return
+        path = self.stats.write_json(os.path.join(self.output_dir, "run_stats.json"))
+        stages = self.stats.to_frame()
+        by_stage = stages.groupby("stage", sort=False)["seconds"].sum()
+        print(f"⏱️ {self.stats.wall_seconds:.2f} s total: "
+              + ", ".join(f"{stage} {seconds:.2f} s" for stage, seconds in by_stage.items())
+              + (f", peak {self.stats.peak_bytes / 2**20:.1f} MB" if self.stats.peak_bytes else ""))
+        print(f"📁 Run stats saved to {path}")
+
+    def replay(self, sensors_to_run, emit=None, speedup=1.0, devices_per_sensor=None, stagger=True):
+        """
+        Live mode: emit readings as they come due in wall-clock time (or sped up, e.g. speedup=60)
+        instead of writing historical files. emit(batch) receives lists of reading dicts;
+        by default readings go to the configured sinks (through the network, if there is one).
+        Runs for duration_minutes of simulated time and returns the lag summary.
+        devices_per_sensor overrides the configured device count of each group.
         """
-        all_dfs = []
+        network = self.network if emit is None else None
+        if emit is None and self.sinks:
+            def emit(batch):
+                if network is not None:
+                    batch = network.deliver(pd.DataFrame(batch))
+                for sink in self.sinks:
+                    sink.send(batch)
+        sensors = []
         for name in sensors_to_run:
-            df = self.run_sensor(name)
-            all_dfs.append(df)
-
-        # Merge all on timestamp (outer join)
-        combined = pd.concat(all_dfs, ignore_index=True)
-        combined.sort_values("timestamp", inplace=True)
-        combined.to_csv(f"{self.output_dir}/combined_simulation.csv", index=False)
-        print(f"\n📁 Combined simulation saved to {self.output_dir}/combined_simulation.csv")
-        return combined
+            count = devices_per_sensor if devices_per_sensor else self.fleet.group(name)["count"]
+            sensors += self.fleet.materialize(name, 0, count, self.seed)
+        print(f"🟢 Replaying {len(sensors)} devices at {speedup:g}x ...")
+        scheduler = ReplayScheduler(sensors, emit=emit, speedup=speedup, duration_minutes=self.duration_minutes,
+                                    start_time=self.start_time, stagger=stagger)
+        summary = scheduler.run_blocking().summary()
+        if network is not None and self.sinks:
+            in_flight = network.flush()
+            for sink in self.sinks:
+                sink.send(in_flight)
+        print(f"✅ Replay finished: {summary['emitted']:,} readings, lag p50 {summary['lag_p50_ms']} ms, "
+              f"p99 {summary['lag_p99_ms']} ms, max {summary['lag_max_ms']} ms")
+        self._report_sinks()
+        return summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Ground-truth labels written to the anomaly_type column (categorical, in this order)
+ANOMALY_TYPES = ["none", "spike", "zero", "drift", "stuck", "dropout", "radio"]
+NONE, SPIKE, ZERO, DRIFT, STUCK, DROPOUT, RADIO = range(len(ANOMALY_TYPES))
+
+# Types drawn from a single uniform per reading: each takes a band of [0, 1) as wide as its rate.
+# spike/zero hit one reading; drift/stuck/dropout start an event that lasts several readings
+BANDS = np.array([SPIKE, ZERO, DRIFT, STUCK, DROPOUT], dtype=np.uint8)
+EVENTS = (DRIFT, STUCK, DROPOUT)
+
+# event length in readings, [min, max]
+EVENT_LENGTHS = {DRIFT: (12, 72), STUCK: (6, 36), DROPOUT: (3, 24)}
+
+# An event can run past the end of a chunk; each device carries it over as one float vector:
+# [event type, readings left, readings done, drift amplitude, held value of each stuck column...]
+CARRY = 4
+
+
+def empty_carry(n_columns):
+    carry = np.full(CARRY + n_columns, np.nan)
+    carry[:CARRY] = 0
+    return carry
+
+
+def draw_radio(rng, n, anomaly_rate):
+    # rssi/snr for n uplinks; anomalous samples are degraded links. Returns rssi, snr and the anomaly mask
+    rssi = rng.normal(-25, 5, n)  # mean -25dBm, stddev 5dBm (from real data)
+    bad_rssi = rng.random(n) < anomaly_rate
+    rssi[bad_rssi] = rng.uniform(-80, -60, bad_rssi.sum())
+    snr = rng.normal(13.5, 1.5, n)  # mean 13.5dB, stddev 1.5dB (from real data)
+    bad_snr = rng.random(n) < anomaly_rate
+    snr[bad_snr] = rng.uniform(-10, 0, bad_snr.sum())
+    return rssi, snr, bad_rssi | bad_snr
+
+
+class AnomalyModel:
+    """
+    Per-reading anomaly probabilities of one device: weights scale its anomaly_rate per type,
+    so {"spike": 1.0, "drift": 0.1} means spikes at anomaly_rate and drift events starting at a tenth of it.
+    """
+
+    def __init__(self, anomaly_rate, weights):
+        names = [ANOMALY_TYPES[b] for b in BANDS]
+        unknown = set(weights) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown anomaly types {sorted(unknown)} (expected some of {names})")
+        self.rates = np.array([anomaly_rate * weights.get(name, 0.0) for name in names], dtype=float)
+        if (self.rates < 0).any() or self.rates.sum() > 1:
+            raise ValueError(f"Anomaly rates must be non-negative and sum to at most 1, got {dict(zip(names, self.rates))}")
+        self.edges = np.cumsum(self.rates)
+
+    def draw(self, rng, num_points):
+        """
+        Anomalies for a chunk of readings from one bulk RNG call: the type starting at each reading
+        (NONE for most), a magnitude in [0, 1) and, where something starts, a uniform that sets the event length.
+        """
+        u = rng.random(num_points)
+        hit = np.flatnonzero(u < self.edges[-1])
+        band = np.searchsorted(self.edges, u[hit], side="right")
+        codes = np.zeros(num_points, dtype=np.uint8)
+        codes[hit] = BANDS[band]
+        # where u falls inside its band is uniform too, so it doubles as the magnitude
+        magnitude = np.zeros(num_points)
+        magnitude[hit] = (u[hit] - (self.edges[band] - self.rates[band])) / self.rates[band]
+        v = np.zeros(num_points)
+        v[hit] = rng.random(len(hit))
+        return codes, magnitude, v
+
+
+@lru_cache(maxsize=None)
+def _shared_model(anomaly_rate, weights):
+    return AnomalyModel(anomaly_rate, dict(weights))
+
+
+def anomaly_model(anomaly_rate, weights):
+    """AnomalyModel for a rate and weights; it holds no state, so devices with the same settings share one."""
+    return _shared_model(anomaly_rate, tuple(sorted(weights.items())))
+
+
+class EventTrack:
+    """
+    Multi-step events of a chunk, as (readings, devices) arrays: the active event, how far a drift
+    has ramped, its amplitude, and the reading a stuck run repeats (-1: a value held since an earlier chunk).
+    One event per device at a time; starts that fall inside an active event are ignored.
+    Only devices with an event in the chunk are visited, each looping over its few starts.
+    """
+
+    def __init__(self, codes, magnitude, v, carry):
+        # codes/magnitude/v: AnomalyModel.draw() output stacked per device; carry: (devices, CARRY + columns)
+        num_points = codes.shape[0]
+        self.event = np.zeros(codes.shape, dtype=np.uint8)
+        self.progress = np.zeros(codes.shape)
+        self.amplitude = np.zeros(codes.shape)
+        self.hold_from = np.full(codes.shape, -1, dtype=np.intp)
+        self.carry_in = carry
+        self.carry = carry.copy()
+
+        starts = (codes >= DRIFT) & (codes <= DROPOUT)
+        for k in np.flatnonzero(starts.any(axis=0) | (carry[:, 0] > 0)):
+            last = None  # (kind, start, done, length, amplitude) of the latest event
+            kind, left, done, amp = carry[k, :CARRY]
+            if kind:
+                last = (int(kind), 0, int(done), int(done + left), amp)
+                self._fill(k, *last, hold=-1)
+            for s in np.flatnonzero(starts[:, k]):
+                if last is not None and s < last[1] + last[3] - last[2]:
+                    continue
+                lo, hi = EVENT_LENGTHS[codes[s, k]]
+                last = (codes[s, k], s, 0, lo + int(v[s, k] * (hi - lo + 1)), 2 * magnitude[s, k] - 1)
+                self._fill(k, *last, hold=s)
+
+            # an event still running at the end of the chunk continues in the next one
+            self.carry[k, :CARRY] = 0
+            if last is not None:
+                kind, s, done, length, amp = last
+                left = s + length - done - num_points
+                if left > 0:
+                    self.carry[k, :CARRY] = [kind, left, length - left, amp]
+
+    def _fill(self, k, kind, start, done, length, amp, hold):
+        end = min(start + length - done, self.event.shape[0])
+        self.event[start:end, k] = kind
+        self.progress[start:end, k] = (done + 1 + np.arange(end - start)) / length
+        self.amplitude[start:end, k] = amp
+        self.hold_from[start:end, k] = hold
+
+    @property
+    def keep(self):
+        """Readings that were delivered (dropout events lose theirs)."""
+        return self.event != DROPOUT
+
+    def apply(self, columns, drift_scales):
+        """
+        Apply stuck runs and drift to measurement columns in place. columns: name -> (readings, devices)
+        float array, in the order of the carried held values; drift_scales: name -> largest drift offset
+        (scalar or per device). A stuck run repeats every column's value from the reading it started at;
+        a drift ramps linearly to amplitude * scale and snaps back when the event ends.
+        """
+        rows, devs = np.nonzero(self.event == STUCK)
+        src = self.hold_from[rows, devs]
+        carried = src < 0
+        drifting = self.event == DRIFT
+        drifts = drifting.any()
+        last = self.event.shape[0] - 1
+        still_stuck = np.flatnonzero(self.carry[:, 0] == STUCK)
+        for c, (name, col) in enumerate(columns.items()):
+            col[rows, devs] = np.where(carried, self.carry_in[devs, CARRY + c], col[np.maximum(src, 0), devs])
+            if drifts and name in drift_scales:
+                col += np.where(drifting, self.amplitude * self.progress * drift_scales[name], 0.0)
+            # a stuck run that continues keeps repeating the same values in the next chunk
+            if len(still_stuck) and last >= 0:
+                self.carry[still_stuck, CARRY + c] = col[last, still_stuck]
+
+    def labels(self, codes, radio):
+        """anomaly_type codes: stuck and dropout hide anything else, spike/zero show on top of a drift."""
+        labels = np.where(radio, RADIO, NONE).astype(np.uint8)
+        labels[self.event == DRIFT] = DRIFT
+        point = (codes == SPIKE) | (codes == ZERO)
+        labels[point] = codes[point]
+        hidden = (self.event == STUCK) | (self.event == DROPOUT)
+        labels[hidden] = self.event[hidden]
+        return labels
+
+
+def label_categories(labels):
+    """Categorical anomaly_type column from label codes (same categories for every frame)."""
+    return pd.Categorical.from_codes(np.ravel(labels).astype(np.int8), categories=ANOMALY_TYPES)
+
+
+def inject_events(codes, magnitude, v, radio, carry, columns, drift_scales):
+    """
+    Run a chunk's multi-step events over (readings, devices) arrays: columns are changed in place
+    (see EventTrack.apply). Returns the delivered-rows mask, anomaly_type codes and the carry for the next chunk.
+    """
+    track = EventTrack(codes, magnitude, v, carry)
+    track.apply(columns, drift_scales)
+    return track.keep, track.labels(codes, radio), track.carry
+
+
+def fleet_drift_scales(sensors):
+    """Per-device drift scales of a lockstep fleet, one array per column."""
+    names = dict.fromkeys(name for s in sensors for name in s.drift_scales)
+    return {name: np.array([s.drift_scales.get(name, 0.0) for s in sensors], dtype=float) for name in names}
+
+
+def drop_lost(frame, keep):
+    """Rows of a generated frame that were actually delivered (keep: flat mask in frame order)."""
+    keep = np.ravel(keep)
+    return frame if keep.all() else frame[keep].reset_index(drop=True)
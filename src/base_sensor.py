@@ -1,66 +1,263 @@
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-import random
-
-def generate_random_devEUI():
-    return ''.join(random.choice('0123456789abcdef') for _ in range(16))
-
-class BaseSensor:
-    def __init__(self, type, devEUI=None, battery=100, seqNumber=0, seed=None, frequency=300, noise_level=0.0, anomaly_rate=0.01):
-        self.type = type
-        self.devEUI = devEUI if devEUI else generate_random_devEUI()
-        self.battery = battery
-        self.seqNumber = seqNumber
-        self.frequency = frequency # default 5min = 300s
-        self.noise_level = noise_level
-        self.anomaly_rate = anomaly_rate
-        if seed is not None:
-            np.random.seed(seed)
-        self.battery_drain_rate = 100 / (3 * 365 * 24 * (3600 / self.frequency))  # ~3-year life
-
-    
-    def _random_rssi(self, anomaly=False):
-        if np.random.random() < self.anomaly_rate:
-            return np.random.uniform(-80, -60)
-        return np.random.normal(-25, 5) # mean -25dBm, stddev 5dBm (from real data)
-
-    def _random_snr(self, anomaly=False):
-        if np.random.random() < self.anomaly_rate:
-            return np.random.uniform(-10, 0)
-        return np.random.normal(13.5, 1.5) # mean 13.5dB, stddev 1.5dB (from real data)
-
-    def _increment_seq(self):
-        self.seqNumber = (self.seqNumber + 1) % 65536
-
-    def generate_reading(self, t):
-        # to be overidden
-        raise NotImplementedError("Subclasses must implement generate_reading()")
-
-    def generate_data(self, duration_minutes=60, start_time=None):
-        # generate time-series data for the given duration.
-        if start_time is None:
-            start_time = datetime.now() # defaults to now
-        
-        num_points = int((duration_minutes * 60) / self.frequency)
-        timestamps = [start_time + timedelta(seconds=i * self.frequency) for i in range(num_points)]
-        readings = []
-        for t in range(num_points):
-            val = self.generate_reading(t)
-            if not np.isnan(val):
-                self.battery = max(0, self.battery - np.random.normal(self.battery_drain_rate, self.battery_drain_rate * 0.1))
-
-            record = {
-                "timestamp": timestamps[t],
-                "sensor_type": self.type,
-                "devEUI": self.devEUI,
-                "battery": round(self.battery, 2),
-                "rssi": round(self._random_rssi(), 1),
-                "snr": round(self._random_snr(), 1),
-                "seqNumber": self.seqNumber,
-                "value": val
-            }
-            self._increment_seq()
-            readings.append(record)
-
-        return pd.DataFrame(readings)
+import numpy as np
+from datetime import datetime, timedelta
+import hashlib
+from src.anomalies import anomaly_model, draw_radio, empty_carry, inject_events, label_categories, drop_lost
+from src.schema import build_frame, repeat_category
+
+HEX_DIGITS = np.array(list('0123456789abcdef'))
+
+def generate_random_devEUI(rng=None):
+    rng = rng if rng is not None else np.random.default_rng()
+    return ''.join(HEX_DIGITS[rng.integers(0, 16, 16)])
+
+def device_seed(seed, *identity):
+    # SeedSequence for one device, keyed by the simulation seed and the device identity
+    # (e.g. sensor name + index), so a device's stream never depends on which other devices run
+    key = tuple(int.from_bytes(hashlib.blake2b(str(part).encode(), digest_size=8).digest(), "little")
+                for part in identity)
+    return np.random.SeedSequence(seed, spawn_key=key)
+
+def time_grid(start_time, num_points, frequency):
+    # datetime64 timestamps for a run, plus the hour of day of each one
+    offsets = (np.arange(num_points) * frequency * 1_000_000_000).astype("timedelta64[ns]")
+    timestamps = np.datetime64(start_time, "ns") + offsets
+    hours = ((timestamps - timestamps.astype("datetime64[D]")) // np.timedelta64(1, "h")).astype(int)
+    return timestamps, hours
+
+# Samples that don't depend on sensor state (anomalies, radio, a fleet's noise) are laid out in fixed
+# blocks of BLOCK readings, each drawn from its own generator keyed by the device seed and the block number.
+# A reading gets the same samples however the run is cut into chunks, and a resumed run picks up at the next one
+BLOCK = 1024
+_BLOCK_KEY = 0x626C6F636B  # spawn-key tag of block generators ("block")
+
+def block_rng(seed_seq, block):
+    # generator of one block of a device's samples (seed_seq: the device's SeedSequence)
+    key = tuple(seed_seq.spawn_key) + (_BLOCK_KEY, block)
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed_seq.entropy, spawn_key=key)))
+
+def lockstep_step(sensors):
+    # readings generated so far by a fleet's devices, which always advance together
+    steps = {s._step for s in sensors}
+    if len(steps) > 1:
+        raise ValueError(f"fleet devices are out of step: {sorted(steps)}")
+    return steps.pop() if steps else 0
+
+
+class BlockSampler:
+    """
+    Per-reading samples in fixed blocks (see BLOCK). draw(block, origin) returns the samples of readings
+    block * BLOCK ... (block + 1) * BLOCK - 1 as a tuple of arrays, one row per reading; origin is the
+    timestamp of reading 0, for draws that depend on the time of day. The last block drawn is kept,
+    since the next chunk usually starts inside it.
+    """
+
+    def __init__(self, draw):
+        self.draw = draw
+        self._cached = None  # (block, origin, arrays)
+
+    def _block(self, block, origin):
+        if self._cached is None or self._cached[0] != block or self._cached[1] != origin:
+            self._cached = (block, origin, self.draw(block, origin))
+        return self._cached[2]
+
+    def take(self, step, num_points, origin=None):
+        """Samples of readings step ... step + num_points - 1 of the run."""
+        first = step // BLOCK
+        last = max(first, (step + num_points - 1) // BLOCK)
+        blocks = [self._block(b, origin) for b in range(first, last + 1)]
+        arrays = blocks[0] if len(blocks) == 1 else tuple(np.concatenate(columns) for columns in zip(*blocks))
+        lo = step - first * BLOCK
+        return tuple(a[lo:lo + num_points] for a in arrays)
+
+class BaseSensor:
+    kind = "base"  # frame schema, see src/schema.py
+    # attributes that carry over from one reading to the next; subclasses add their own
+    state_fields = ("battery", "seqNumber", "_anomaly_carry", "_step")
+    # anomaly types the sensor supports, as multiples of anomaly_rate (see src/anomalies.py);
+    # stuck events freeze anomaly_columns, drift events offset columns by up to drift_scales
+    anomaly_weights = {"drift": 0.02, "stuck": 0.02, "dropout": 0.02}
+    anomaly_columns = ("value",)
+    drift_scales = {"value": 1.0}
+    # whether readings drain the battery; sensors that report a fixed battery level turn it off
+    battery_drain = True
+
+    def __init__(self, type, devEUI=None, battery=100, seqNumber=0, seed=None, frequency=300, noise_level=0.0, anomaly_rate=0.01,
+                 anomaly_weights=None):
+        self.type = type
+        # seed: int, SeedSequence (see device_seed) or Generator; each sensor owns its own stream
+        self.rng = np.random.default_rng(seed)
+        # readings generated so far; block samples (see BlockSampler) are indexed by it
+        self._step = 0
+        self._seed_seq = self.rng.bit_generator.seed_seq
+        self._samples = BlockSampler(self._draw_block)
+        self._batch_samples = BlockSampler(self._draw_batch_block)
+        self.devEUI = devEUI if devEUI else generate_random_devEUI(self.rng)
+        self.battery = battery
+        self.seqNumber = seqNumber
+        self.frequency = frequency # default 5min = 300s
+        self.noise_level = noise_level
+        self.anomaly_rate = anomaly_rate
+        # anomaly_weights: overrides of the class defaults, e.g. {"stuck": 0.5} or {"spike": 0} to disable spikes
+        defaults = self.__class__.anomaly_weights
+        unsupported = set(anomaly_weights or {}) - set(defaults)
+        if unsupported:
+            raise ValueError(f"{self.kind} sensors support anomaly types {sorted(defaults)}, got {sorted(unsupported)}")
+        self.anomaly_weights = {**defaults, **(anomaly_weights or {})}
+        self.anomalies = anomaly_model(anomaly_rate, self.anomaly_weights)
+        self._anomaly_carry = empty_carry(len(self.anomaly_columns))
+        self.battery_drain_rate = 100 / (3 * 365 * 24 * (3600 / self.frequency))  # ~3-year life
+
+    def _draw_block(self, block, origin):
+        # one block of anomalies (point/event codes, magnitudes, event lengths) and radio samples
+        return self._draw_samples(block_rng(self._seed_seq, block))
+
+    def _draw_samples(self, rng):
+        codes, magnitude, v = self.anomalies.draw(rng, BLOCK)
+        rssi, snr, radio = draw_radio(rng, BLOCK, self.anomaly_rate)
+        return codes, magnitude, v, rssi, snr, radio
+
+    def _draw_batch_block(self, block, origin):
+        # the block of the per-row path (same generator, so the same anomalies and radio samples),
+        # followed by battery drain and the sensor's own draw_values() samples. Fleets draw each device's
+        # block here too, so the batched path and a fleet share one draw order
+        rng = block_rng(self._seed_seq, block)
+        draws = self._draw_samples(rng)
+        drain = rng.normal(self.battery_drain_rate, self.battery_drain_rate * 0.1, BLOCK)
+        timestamps = time_grid(origin, BLOCK, self.frequency)[0] + np.timedelta64(block * BLOCK * self.frequency, "s")
+        return draws + (drain,) + tuple(self.draw_values(rng, timestamps, draws))
+
+    def _draw_anomalies(self, num_points):
+        # the next num_points readings' anomalies and radio samples; the main stream (self.rng) only
+        # serves per-reading draws, so neither depends on how the run is chunked
+        draws = self._samples.take(self._step, num_points)
+        self._step += num_points
+        return draws
+
+    def _inject_events(self, draws, columns):
+        # applies the chunk's multi-step events to 1-D float columns (anomaly_columns, in place);
+        # returns the delivered-rows mask and the anomaly_type column
+        codes, magnitude, v, _, _, radio = draws
+        columns = {name: columns[name][:, None] for name in self.anomaly_columns}
+        keep, labels, carry = inject_events(codes[:, None], magnitude[:, None], v[:, None], radio[:, None],
+                                            self._anomaly_carry[None], columns, self.drift_scales)
+        self._anomaly_carry = carry[0]
+        return keep[:, 0], label_categories(labels)
+
+    def _increment_seq(self):
+        self.seqNumber = (self.seqNumber + 1) % 65536
+
+    def get_state(self):
+        # everything needed to continue the stream later: state_fields plus the RNG position
+        state = {field: getattr(self, field) for field in self.state_fields}
+        state["rng"] = self.rng.bit_generator.state
+        return state
+
+    def set_state(self, state):
+        for field in self.state_fields:
+            setattr(self, field, state[field])
+        self.rng.bit_generator.state = state["rng"]
+
+    def generate_reading(self, t):
+        # to be overidden
+        raise NotImplementedError("Subclasses must implement generate_reading()")
+
+    def draw_values(self, rng, timestamps, draws):
+        # batched counterpart of generate_reading()'s random draws: the per-reading samples of one block
+        # from its generator rng, as a tuple of arrays (timestamps and draws: the block's readings and
+        # its anomaly/radio samples). Override along with generate_values()
+        return ()
+
+    def generate_values(self, step0, timestamps, draws, samples):
+        # batched counterpart of generate_reading(): the chunk's value columns as a dict of float arrays,
+        # from its anomaly/radio samples (draws) and its rows of draw_values() (samples)
+        raise NotImplementedError("Subclasses must implement generate_values() for batched generation")
+
+    def _round_values(self, columns):
+        # reported values once drift/stuck events are applied; subclasses round them like their readings
+        return columns
+
+    def generate_data(self, duration_minutes=60, start_time=None, batched=False):
+        # generate time-series data for the given duration.
+        # batched: build the frame from columns (see _generate_chunk_batched) instead of reading by reading
+        if start_time is None:
+            start_time = datetime.now() # defaults to now
+        num_points = int((duration_minutes * 60) / self.frequency)
+        generate = self._generate_chunk_batched if batched else self._generate_chunk
+        return generate(start_time, num_points)
+
+    def iter_chunks(self, duration_minutes=60, chunk_size=288, start_time=None, first_step=0, batched=False):
+        # same data as generate_data(), yielded as frames of at most chunk_size readings.
+        # sensor state (battery, seqNumber, subclass state) carries over from one chunk to the next;
+        # first_step continues the reading index of an earlier run (see src/checkpoint.py)
+        if start_time is None:
+            start_time = datetime.now()
+        num_points = int((duration_minutes * 60) / self.frequency)
+        generate = self._generate_chunk_batched if batched else self._generate_chunk
+        for step0 in range(0, num_points, chunk_size):
+            chunk_start = start_time + timedelta(seconds=step0 * self.frequency)
+            yield generate(chunk_start, min(chunk_size, num_points - step0), first_step + step0)
+
+    def _generate_chunk(self, start_time, num_points, step0=0):
+        # num_points readings from start_time; step0 is the reading index within the whole run
+        timestamps, _ = time_grid(start_time, num_points, self.frequency)
+        draws = self._draw_anomalies(num_points)
+        # readings go straight into arrays of the schema dtypes
+        values = np.empty(num_points, dtype=np.float32)
+        battery = np.empty(num_points, dtype=np.float32)
+        seq = np.empty(num_points, dtype=np.uint16)
+        for i in range(num_points):
+            val = self.generate_reading(step0 + i)
+            if not np.isnan(val):
+                self.battery = max(0, self.battery - self.rng.normal(self.battery_drain_rate, self.battery_drain_rate * 0.1))
+
+            values[i] = val
+            battery[i] = round(self.battery, 2)
+            seq[i] = self.seqNumber
+            self._increment_seq()
+
+        keep, labels = self._inject_events(draws, {"value": values})
+        return drop_lost(build_frame(self.kind, {
+            "timestamp": timestamps,
+            "sensor_type": repeat_category(self.type, num_points),
+            "devEUI": repeat_category(self.devEUI, num_points),
+            "battery": battery,
+            "rssi": np.round(draws[3], 1),
+            "snr": np.round(draws[4], 1),
+            "seqNumber": seq,
+            "value": values,
+            "anomaly_type": labels
+        }), keep)
+
+    def _generate_chunk_batched(self, start_time, num_points, step0=0):
+        # columnar _generate_chunk: every per-reading sample, battery drain included, comes in blocks
+        # (see BlockSampler), so a chunk's frame never depends on how the run is cut
+        timestamps, _ = time_grid(start_time, num_points, self.frequency)
+        origin = timestamps[0] - np.timedelta64(self._step * self.frequency, "s") if num_points else None
+        samples = self._batch_samples.take(self._step, num_points, origin)
+        self._step += num_points
+        draws, drain = samples[:6], samples[6]
+        columns = self.generate_values(step0, timestamps, draws, samples[7:])
+
+        battery = np.full(num_points, self.battery)
+        if self.battery_drain and num_points:
+            # battery only drains on successful readings; subtracted in order, as the per-row path does
+            failed = np.isnan(np.stack([columns[name] for name in self.anomaly_columns])).any(axis=0)
+            drain = np.where(failed, 0, drain)
+            battery = np.maximum(0, np.subtract.accumulate(np.concatenate([[self.battery], drain]))[1:])
+            self.battery = float(battery[-1])
+
+        seq = (self.seqNumber + np.arange(num_points)) % 65536
+        self.seqNumber = int((self.seqNumber + num_points) % 65536)
+
+        keep, labels = self._inject_events(draws, columns)
+        return drop_lost(build_frame(self.kind, {
+            "timestamp": timestamps,
+            "sensor_type": repeat_category(self.type, num_points),
+            "devEUI": repeat_category(self.devEUI, num_points),
+            "battery": np.round(battery, 2),
+            "rssi": np.round(draws[3], 1),
+            "snr": np.round(draws[4], 1),
+            "seqNumber": seq,
+            **self._round_values(columns),
+            "anomaly_type": labels
+        }), keep)
@@ -0,0 +1,94 @@
+import json
+import os
+import numpy as np
+
+CHECKPOINT_VERSION = 2
+_MASK64 = (1 << 64) - 1
+
+
+def checkpoint_path(output_dir, name):
+    """Where the Simulator keeps the checkpoint of one sensor group."""
+    return os.path.join(output_dir, ".checkpoints", f"{name}.npz")
+
+
+def _sensors(devices):
+    # a single sensor, a lockstep fleet or a list of sensors
+    if isinstance(devices, (list, tuple)):
+        return list(devices)
+    return list(getattr(devices, "sensors", [devices]))
+
+
+def _scalar(value):
+    # numpy scalar -> plain Python value; NaN marks state that wasn't set yet (e.g. OU state before a run).
+    # Vector state (a row of a 2-D field, e.g. the anomaly carry) comes back as its own array
+    if np.ndim(value):
+        return np.array(value, dtype=float)
+    value = value.item()
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def capture_state(devices):
+    """
+    Per-device state (see BaseSensor.get_state) of sensors or a fleet as one array per field,
+    rows in device order. RNG positions are packed into uint64 halves, so the whole thing is
+    a handful of flat arrays however many devices there are.
+    """
+    states = [s.get_state() for s in _sensors(devices)]
+    arrays = {}
+    for field in states[0]:
+        if field != "rng":
+            arrays[field] = np.asarray([np.nan if st[field] is None else st[field] for st in states])
+
+    rngs = [st["rng"] for st in states]
+    generators = {r["bit_generator"] for r in rngs}
+    if generators != {"PCG64"}:
+        raise ValueError(f"Checkpoints support PCG64 generators (numpy's default), got {sorted(generators)}")
+    for key in ("state", "inc"):
+        values = [r["state"][key] for r in rngs]
+        arrays[f"rng_{key}_hi"] = np.array([v >> 64 for v in values], dtype=np.uint64)
+        arrays[f"rng_{key}_lo"] = np.array([v & _MASK64 for v in values], dtype=np.uint64)
+    arrays["rng_has_uint32"] = np.array([r["has_uint32"] for r in rngs], dtype=np.uint8)
+    arrays["rng_uinteger"] = np.array([r["uinteger"] for r in rngs], dtype=np.uint32)
+    return arrays
+
+
+def restore_state(devices, arrays, lo=0):
+    """Put sensors (or a fleet) back in the state captured for devices lo, lo+1, ... of arrays."""
+    for k, s in enumerate(_sensors(devices), start=lo):
+        state = {field: _scalar(arrays[field][k]) for field in s.state_fields}
+        state["rng"] = {
+            "bit_generator": "PCG64",
+            "state": {key: int(arrays[f"rng_{key}_hi"][k]) << 64 | int(arrays[f"rng_{key}_lo"][k])
+                      for key in ("state", "inc")},
+            "has_uint32": int(arrays["rng_has_uint32"][k]),
+            "uinteger": int(arrays["rng_uinteger"][k]),
+        }
+        s.set_state(state)
+
+
+def concat_states(parts):
+    """Join the captured states of consecutive shards into one set of arrays."""
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def save_checkpoint(path, meta, arrays):
+    """Write meta (JSON-able dict) and state arrays to a .npz file, replacing any earlier checkpoint atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(dict(meta, version=CHECKPOINT_VERSION))), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path):
+    """(meta, arrays) from save_checkpoint(), or None if there is no checkpoint at path."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path}: checkpoint version {meta.get('version')} is not supported "
+                             f"(expected {CHECKPOINT_VERSION})")
+        arrays = {key: data[key] for key in data.files if key != "meta"}
+    return meta, arrays
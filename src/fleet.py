@@ -0,0 +1,294 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from src.base_sensor import device_seed
+from src.profiles import load_profiles
+from src.registry import NO_LOCATION, DeviceRegistry, allocate_euis, group_key
+from src.sensors.ammonia_sensor import AmmoniaSensor, AmmoniaFleet
+from src.sensors.people_counter import PeopleCounterSensor, PeopleCounterFleet, LOCATIONS
+from src.utils.payload_codec import int_to_devEUI
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "sensors.yaml")
+
+# sensor kind -> (single-device class, lockstep fleet class)
+SENSOR_KINDS = {
+    "ammonia": (AmmoniaSensor, AmmoniaFleet),
+    "people_counter": (PeopleCounterSensor, PeopleCounterFleet),
+}
+
+# settings a template (or a group overriding it) may carry, with their types
+DEVICE_SETTINGS = {
+    "frequency": (int, float),
+    "anomaly_rate": (int, float),
+    "noise_level": (int, float),
+    "battery": (int, float),
+}
+TEMPLATE_KEYS = {"kind", "profile", "anomaly_weights", *DEVICE_SETTINGS}
+GROUP_KEYS = TEMPLATE_KEYS | {"name", "template", "count", "locations", "seed"}
+
+# compact per-device table: which group a device belongs to, its index in the group and its location
+DEVICE_DTYPE = np.dtype([("group", "u2"), ("index", "u4"), ("location", "u1")])
+
+# ways to split a group's devices over nodes (see FleetSpec.node_devices)
+NODE_SPLITS = ("range", "hash")
+
+
+def _check_keys(where, entry, allowed):
+    if not isinstance(entry, dict):
+        raise ValueError(f"{where}: expected a mapping, got {type(entry).__name__}")
+    unknown = set(entry) - allowed
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)} (allowed: {sorted(allowed)})")
+
+
+def _check_settings(where, entry):
+    for key, types in DEVICE_SETTINGS.items():
+        if key in entry and (isinstance(entry[key], bool) or not isinstance(entry[key], types)):
+            raise ValueError(f"{where}: {key} must be a number, got {entry[key]!r}")
+    if entry.get("frequency", 1) <= 0:
+        raise ValueError(f"{where}: frequency must be positive")
+    if not 0 <= entry.get("anomaly_rate", 0) <= 1:
+        raise ValueError(f"{where}: anomaly_rate must be between 0 and 1")
+
+
+class FleetSpec:
+    """
+    A validated fleet definition (see configs/sensors.yaml).
+    Groups are compiled into one small device table (DEVICE_DTYPE) at load time;
+    sensor objects are only built by materialize() for the device range a shard actually runs.
+    Devices get their devEUIs from the fleet's DeviceRegistry for the run's seed (see registry()).
+    """
+
+    def __init__(self, spec, source="<spec>"):
+        self.source = source
+        spec = spec or {}
+        _check_keys(source, spec, {"templates", "groups"})
+        # identifies the fleet definition in node manifests, so shards of different fleets are never merged
+        self.digest = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+        templates = spec.get("templates") or {}
+        groups = spec.get("groups") or []
+        if not groups:
+            raise ValueError(f"{source}: the fleet defines no groups")
+
+        for name, template in templates.items():
+            where = f"{source}: template {name!r}"
+            _check_keys(where, template, TEMPLATE_KEYS)
+            _check_settings(where, template)
+
+        self.groups = []
+        self._by_name = {}
+        for i, group in enumerate(groups):
+            compiled = self._compile_group(f"{source}: group #{i}", group, templates)
+            if compiled["name"] in self._by_name:
+                raise ValueError(f"{source}: duplicate group name {compiled['name']!r}")
+            self._by_name[compiled["name"]] = len(self.groups)
+            self.groups.append(compiled)
+
+        # device table, grouped and in index order, so a group's devices are one contiguous slice
+        counts = np.array([g["count"] for g in self.groups], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        table = np.empty(int(self.offsets[-1]), dtype=DEVICE_DTYPE)
+        table["group"] = np.repeat(np.arange(len(self.groups)), counts)
+        table["index"] = np.arange(len(table)) - np.repeat(self.offsets[:-1], counts)
+        for g, group in enumerate(self.groups):
+            table["location"][self.offsets[g]:self.offsets[g + 1]] = self._location_codes(group, np.arange(group["count"]))
+        self.table = table
+        self._registries = {}
+
+    def _compile_group(self, where, group, templates):
+        _check_keys(where, group, GROUP_KEYS)
+        name = group.get("name")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"{where}: every group needs a name")
+        where = f"{self.source}: group {name!r}"
+
+        template_name = group.get("template")
+        if template_name is not None and template_name not in templates:
+            raise ValueError(f"{where}: unknown template {template_name!r}")
+        merged = dict(templates.get(template_name) or {})
+        merged.update({k: v for k, v in group.items() if k in TEMPLATE_KEYS})
+        _check_settings(where, merged)
+
+        kind = merged.get("kind")
+        if kind not in SENSOR_KINDS:
+            raise ValueError(f"{where}: kind must be one of {sorted(SENSOR_KINDS)}, got {kind!r}")
+
+        count = group.get("count", 1)
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            raise ValueError(f"{where}: count must be a positive integer, got {count!r}")
+
+        locations = group.get("locations")
+        if kind == "people_counter":
+            locations = [locations] if isinstance(locations, str) else list(locations or ["toilet"])
+            unknown = [loc for loc in locations if loc not in LOCATIONS]
+            if unknown or not locations:
+                raise ValueError(f"{where}: locations must be taken from {LOCATIONS}, got {locations}")
+        elif locations:
+            raise ValueError(f"{where}: only people counters have locations")
+
+        weights = merged.get("anomaly_weights")
+        if weights is not None:
+            supported = SENSOR_KINDS[kind][0].anomaly_weights
+            if not isinstance(weights, dict) or set(weights) - set(supported):
+                raise ValueError(f"{where}: anomaly_weights must map some of {sorted(supported)} to numbers, got {weights!r}")
+            if any(isinstance(w, bool) or not isinstance(w, (int, float)) or w < 0 for w in weights.values()):
+                raise ValueError(f"{where}: anomaly_weights must be non-negative numbers, got {weights!r}")
+
+        profile = merged.get("profile")
+        if profile is not None and profile not in load_profiles().names(kind):
+            raise ValueError(f"{where}: no {kind} profile named {profile!r} in configs/profiles.yaml")
+
+        seed = group.get("seed")
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+            raise ValueError(f"{where}: seed must be an integer, got {seed!r}")
+
+        return {
+            "name": name,
+            "kind": kind,
+            "count": count,
+            "locations": locations or [],
+            "seed": seed,
+            "profile": profile,
+            "settings": {k: merged[k] for k in (*DEVICE_SETTINGS, "anomaly_weights") if k in merged},
+        }
+
+    def _location_codes(self, group, indices):
+        if not group["locations"]:
+            return np.full(len(indices), NO_LOCATION, dtype=np.uint8)
+        codes = np.array([LOCATIONS.index(loc) for loc in group["locations"]], dtype=np.uint8)
+        return codes[np.asarray(indices) % len(codes)]
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def group(self, name):
+        if name not in self._by_name:
+            raise ValueError(f"Unknown sensor type: {name}")
+        return self.groups[self._by_name[name]]
+
+    def names(self, kind=None, location=None):
+        """Group names, optionally only those of one kind and/or containing one location."""
+        return [g["name"] for g in self.groups
+                if (kind is None or g["kind"] == kind) and (location is None or location in g["locations"])]
+
+    def locations(self):
+        """Locations covered by at least one people-counter group, in LOCATIONS order."""
+        used = {loc for g in self.groups for loc in g["locations"]}
+        return [loc for loc in LOCATIONS if loc in used]
+
+    def sensor_types(self, name):
+        """The sensor_type values a group's output contains."""
+        group = self.group(name)
+        if group["kind"] == "people_counter":
+            return [f"people_counter_{loc}" for loc in group["locations"]]
+        return [group["kind"]]
+
+    def devices(self, name):
+        """The group's slice of the device table."""
+        self.group(name)
+        g = self._by_name[name]
+        return self.table[self.offsets[g]:self.offsets[g + 1]]
+
+    def shards(self, name, shard_size):
+        """(lo, hi) device index ranges of at most shard_size devices covering the group."""
+        count = self.group(name)["count"]
+        return [(lo, min(lo + shard_size, count)) for lo in range(0, count, shard_size)]
+
+    def node_devices(self, name, node, nodes, split="range", seed=None):
+        """
+        Indices of the group's devices that node (0..nodes-1) generates in a run split over nodes.
+        "range" gives each node a contiguous block; "hash" spreads devices by a hash of their devEUI
+        (derived from the seeds, so any machine computes the same split). Both cover every device once.
+        """
+        count = self.group(name)["count"]
+        if split == "range":
+            return np.arange(node * count // nodes, (node + 1) * count // nodes)
+        if split != "hash":
+            raise ValueError(f"Unknown node split {split!r} (expected one of {list(NODE_SPLITS)})")
+        # devEUIs are already uniform 64-bit hashes
+        return np.flatnonzero(self.registry(seed).devEUIs(name) % np.uint64(nodes) == node)
+
+    def registry(self, seed):
+        """
+        DeviceRegistry of every device for a simulation seed, built once per seed (in well under a
+        second for a million devices). seed=None draws the devEUIs once for this FleetSpec.
+        """
+        if seed not in self._registries:
+            self._registries[seed] = DeviceRegistry.from_fleet(self, seed)
+        return self._registries[seed]
+
+    def device_euis(self, name, indices, seed):
+        """
+        uint64 devEUIs of the devices at indices, without building them. Indices past the group's
+        count (e.g. replay's devices_per_sensor) aren't registered; they are hashed the same way,
+        unique among themselves.
+        """
+        group = self.group(name)
+        indices = np.asarray(indices, dtype=np.int64)
+        extra = indices >= group["count"]
+        if not extra.any():
+            return self.registry(seed).devEUIs(name, indices)
+        euis = np.empty(len(indices), dtype=np.uint64)
+        euis[~extra] = self.registry(seed).devEUIs(name, indices[~extra])
+        key = group_key(group["seed"] if group["seed"] is not None else seed, name)
+        euis[extra], _ = allocate_euis(np.full(int(extra.sum()), key, dtype=np.uint64), indices[extra])
+        return euis
+
+    def materialize(self, name, lo, hi, seed, **kwargs):
+        """
+        Build sensor objects for devices lo..hi-1 of a group.
+        Each device seeds from (group seed or simulation seed, group name, index), so a device's
+        data doesn't depend on the shard it runs in. kwargs override the configured settings.
+        """
+        return self.materialize_devices(name, range(lo, hi), seed, **kwargs)
+
+    def materialize_devices(self, name, indices, seed, **kwargs):
+        """materialize() for any device indices of a group, e.g. one node's share (see node_devices)."""
+        group = self.group(name)
+        SensorClass, _ = SENSOR_KINDS[group["kind"]]
+        indices = np.asarray(indices, dtype=np.int64)
+        euis = int_to_devEUI(self.device_euis(name, indices, seed)) if len(indices) else []
+        seed = group["seed"] if group["seed"] is not None else seed
+        settings = {**group["settings"], **kwargs}
+        if group["profile"] is not None and "profile" not in settings:
+            # one shared Profile for the whole group instead of each location's default
+            settings["profile"] = load_profiles().get(group["kind"], group["profile"])
+        codes = self._location_codes(group, indices)
+        sensors = []
+        for index, code, eui in zip(indices.tolist(), codes, euis):
+            if code != NO_LOCATION:
+                settings["location"] = LOCATIONS[code]
+            sensors.append(SensorClass(devEUI=eui, seed=device_seed(seed, name, index), **settings))
+        return sensors
+
+    def build(self, name, lo, hi, seed, **kwargs):
+        """
+        Something to generate devices lo..hi-1 with: the sensor itself for single-device groups,
+        otherwise the kind's lockstep fleet. Both offer iter_chunks() and frequency.
+        """
+        return self.build_devices(name, range(lo, hi), seed, **kwargs)
+
+    def build_devices(self, name, indices, seed, **kwargs):
+        """build() for any device indices of a group."""
+        sensors = self.materialize_devices(name, indices, seed, **kwargs)
+        if self.group(name)["count"] == 1:
+            return sensors[0]
+        _, FleetClass = SENSOR_KINDS[self.group(name)["kind"]]
+        return FleetClass(sensors)
+
+
+def load_fleet_spec(path=None):
+    """Read and validate a fleet YAML file (configs/sensors.yaml by default)."""
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("Fleet configs need PyYAML (pip install pyyaml)") from e
+
+    path = path or DEFAULT_CONFIG
+    with open(path) as f:
+        return FleetSpec(yaml.safe_load(f), source=path)
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Background generation jobs: each job is one Simulator.run_all in a worker process, written to a
+# staging directory (<output_dir>/.jobs/<key>) and moved into output_dir only once it is complete,
+# so whoever reads output_dir meanwhile keeps seeing the previous, whole outputs.
+JOBS_DIR = ".jobs"
+
+# output_dir entries shared by every group (one file per group inside); published file by file
+SHARED_DIRS = ("rollups", ".checkpoints")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's run when it has been asked to stop."""
+
+
+def job_key(params):
+    """Identifier of a job's parameters: identical requests get the same key."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _replace(src, dst):
+    # directories (partitioned outputs) are swapped with two renames; files with one atomic os.replace
+    if os.path.isdir(src):
+        old = dst + ".old"
+        if os.path.exists(dst):
+            os.rename(dst, old)
+        os.rename(src, dst)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        os.replace(src, dst)
+
+
+def publish(staging, output_dir):
+    """
+    Move a finished run's outputs from staging into output_dir, replacing the previous ones.
+    Each output is swapped atomically, so a reader sees either its old or its new version;
+    outputs of groups the run didn't generate are left alone.
+    """
+    for entry in sorted(os.listdir(staging)):
+        src, dst = os.path.join(staging, entry), os.path.join(output_dir, entry)
+        if entry in SHARED_DIRS and os.path.isdir(src):
+            os.makedirs(dst, exist_ok=True)
+            for name in sorted(os.listdir(src)):
+                _replace(os.path.join(src, name), os.path.join(dst, name))
+        else:
+            _replace(src, dst)
+
+
+def _run_job(simulator, config, sensor_names, staging, output_dir, state, cancel):
+    # pool entry point: runs the simulation into staging, reporting rows through the shared state dict,
+    # and publishes it unless cancel was set; returns "done" or "cancelled"
+    rows = 0
+
+    def progress(sensor_name, n):
+        nonlocal rows
+        if cancel.is_set():
+            raise JobCancelled()
+        rows += n
+        state.update(rows=rows, sensor=sensor_name, updated=time.time())
+
+    if cancel.is_set():
+        # cancelled while it waited in the pool's call queue
+        return "cancelled"
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        sim = simulator(**config, output_dir=staging, progress=progress)
+        state.update(status="running", total=sim.expected_rows(sensor_names), started=time.time())
+        sim.run_all(sensor_names)
+        if cancel.is_set():
+            return "cancelled"
+        state.update(status="publishing")
+        publish(staging, output_dir)
+        return "done"
+    except JobCancelled:
+        return "cancelled"
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class Job:
+    """A submitted generation job: its parameters, live progress and outcome."""
+
+    def __init__(self, key, params, future, state, cancel):
+        self.key = key
+        self.params = params
+        self.future = future
+        self.submitted = time.time()
+        self._state = state
+        self._cancel = cancel
+        self._final = None  # copy of the shared state once the job is over (the manager may be gone by then)
+
+    @property
+    def status(self):
+        """queued, running, publishing, done, cancelled or failed."""
+        if self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            return self._snapshot().get("status", "queued")
+        if self.future.exception() is not None:
+            return "failed"
+        return self.future.result()
+
+    @property
+    def active(self):
+        return not self.future.done()
+
+    @property
+    def error(self):
+        return self.future.exception() if self.future.done() and not self.future.cancelled() else None
+
+    def _snapshot(self):
+        if self._final is not None:
+            return self._final
+        state = dict(self._state)
+        if self.future.done():
+            self._final = state
+        return state
+
+    def progress(self):
+        """Rows generated so far, the expected total, the fraction done, rows/sec and the ETA in seconds."""
+        state = self._snapshot()
+        rows, total = state.get("rows", 0), state.get("total", 0)
+        elapsed = state.get("updated", 0) - state.get("started", 0)
+        rate = rows / elapsed if rows and elapsed > 0 else 0.0
+        done = self.status == "done"
+        return {
+            "status": self.status,
+            "sensor": state.get("sensor"),
+            "rows": rows,
+            "total": total,
+            # the estimate leaves out dropped readings, and the combined merge comes after the last row
+            "fraction": 1.0 if done else min(rows / total, 0.99) if total else 0.0,
+            "rows_per_sec": rate,
+            "eta_seconds": max(total - rows, 0) / rate if rate and not done else None,
+        }
+
+    def cancel(self):
+        """Stop the job: a queued job never starts, a running one stops after its current chunk."""
+        if not self.future.cancel():
+            self._cancel.set()
+
+
+class JobManager:
+    """
+    Runs generation jobs on a pool of worker processes, so callers (the dashboard) never wait on a run.
+    Submitting the same parameters while a job for them is still queued or running returns that job
+    instead of starting another. Finished jobs publish their outputs into output_dir.
+    simulator is what each job runs, normally simulator.Simulator: anything that takes its arguments
+    and offers expected_rows() and run_all(). It must be importable by name in the worker processes.
+    """
+
+    def __init__(self, simulator, output_dir="outputs", max_workers=1):
+        self.simulator = simulator
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.jobs = {}
+        self._pool = None
+        self._manager = None
+
+    def _start(self):
+        # spawned, not forked: the caller may be a threaded server (Streamlit)
+        if self._pool is None:
+            context = mp.get_context("spawn")
+            self._manager = context.Manager()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def submit(self, sensor_names, **simulator_kwargs):
+        """
+        Queue a run_all of sensor_names with these Simulator arguments (all but output_dir and progress);
+        returns its Job, or the active job already running the same parameters.
+        """
+        fleet = simulator_kwargs.get("fleet")
+        params = dict(simulator_kwargs, sensors=sorted(sensor_names),
+                      fleet=getattr(fleet, "digest", fleet))
+        key = job_key(params)
+        job = self.jobs.get(key)
+        if job is not None and job.active:
+            return job
+        self._start()
+        state = self._manager.dict(status="queued")
+        cancel = self._manager.Event()
+        staging = os.path.join(self.output_dir, JOBS_DIR, key)
+        future = self._pool.submit(_run_job, self.simulator, simulator_kwargs, list(sensor_names), staging,
+                                   self.output_dir, state, cancel)
+        job = Job(key, params, future, state, cancel)
+        self.jobs[key] = job
+        return job
+
+    def get(self, key):
+        return self.jobs.get(key)
+
+    def active(self):
+        return [job for job in self.jobs.values() if job.active]
+
+    def shutdown(self, cancel=True):
+        """Stop the pool (cancelling what is still queued or running by default)."""
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            for job in self.jobs.values():
+                job._snapshot()
+            self._manager.shutdown()
+            self._pool = self._manager = None
@@ -1,4 +1,5 @@
 from src.sensors.people_counter import PeopleCounterSensor
+from src.utils.data_export import export_frame
 
 def main():
     # Test the sensor for each location type
@@ -22,8 +23,7 @@ def main():
         print(df[['period_in', 'period_out', 'current_occupancy']].describe())
         
         # Save to CSV
-        filename = f"people_counter_{loc}.csv"
-        df.to_csv(filename, index=False)
+        filename = export_frame(df, f"people_counter_{loc}", "csv")
         print(f"✅ Saved {filename}")
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+from src.utils.data_export import iter_output_chunks, part_files
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
+# run settings every node of a split run must agree on before its outputs can be merged
+RUN_KEYS = ("nodes", "split", "seed", "fleet", "end_time", "output_format", "partition_by", "compression")
+
+
+def node_dir(output_dir, node, nodes):
+    """Where node (0-based) of a run split over nodes writes its outputs and manifest."""
+    return os.path.join(output_dir, f"node-{node:05d}-of-{nodes:05d}")
+
+
+def find_node_dirs(output_dir):
+    """Node directories under output_dir, as {(node, nodes): path}."""
+    found = {}
+    for path in glob.glob(os.path.join(output_dir, "node-*-of-*")):
+        match = re.fullmatch(r"node-(\d+)-of-(\d+)", os.path.basename(path))
+        if match and os.path.isdir(path):
+            found[(int(match[1]), int(match[2]))] = path
+    return found
+
+
+def output_checksum(path):
+    """sha256 of an output file, or of every part of a partition directory (with their relative paths)."""
+    digest = hashlib.sha256()
+    files = part_files(path) if os.path.isdir(path) else [path]
+    for file in files:
+        if os.path.isdir(path):
+            digest.update(os.path.relpath(file, path).replace(os.sep, "/").encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_output(path):
+    """Row count, time bounds and checksum of one output, read back from disk (timestamps only)."""
+    rows, start, end = 0, None, None
+    for chunk in iter_output_chunks(path, columns=["timestamp"]):
+        if chunk.empty:
+            continue
+        ts = pd.to_datetime(chunk["timestamp"])
+        rows += len(ts)
+        start = ts.min() if start is None else min(start, ts.min())
+        end = ts.max() if end is None else max(end, ts.max())
+    return {
+        "path": os.path.basename(path),
+        "rows": rows,
+        "start": start.isoformat() if start is not None else None,
+        "end": end.isoformat() if end is not None else None,
+        "sha256": output_checksum(path),
+    }
+
+
+def write_manifest(directory, manifest):
+    """Write manifest.json into directory (atomically, so a crashed node never leaves half a manifest)."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(dict(manifest, version=MANIFEST_VERSION), f, indent=2)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_manifest(directory):
+    """The manifest written into directory, or None if the node hasn't finished."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path}: manifest version {manifest.get('version')} is not supported "
+                         f"(expected {MANIFEST_VERSION})")
+    return manifest
+
+
+def _share_problems(name, entries, count, split, nodes):
+    # entries: {node: output entry}. A range split records each node's [lo, hi) device indices,
+    # a hash split the devEUI bucket (devEUI % nodes) it generated; together they must cover
+    # the group's count devices with no device generated twice
+    problems = []
+    if split == "hash":
+        owner = {}
+        for i, entry in sorted(entries.items()):
+            bucket = entry.get("bucket")
+            if not isinstance(bucket, int) or not 0 <= bucket < nodes:
+                problems.append(f"{name}: node {i} records no hash bucket in 0..{nodes - 1}")
+            elif bucket in owner:
+                problems.append(f"{name}: nodes {owner[bucket]} and {i} both generated hash bucket {bucket}")
+            else:
+                owner[bucket] = i
+        uncovered = sorted(set(range(nodes)) - set(owner))
+        if uncovered:
+            problems.append(f"{name}: no node generated hash buckets {uncovered}")
+        return problems
+
+    ranges = []
+    for i, entry in sorted(entries.items()):
+        share = entry.get("range")
+        if not share or len(share) != 2 or not 0 <= share[0] <= share[1] or share[1] - share[0] != entry["devices"]:
+            problems.append(f"{name}: node {i} records no device range matching its {entry['devices']} devices")
+        elif share[1] > share[0]:
+            ranges.append((share[0], share[1], i))
+    end, last = 0, None
+    for lo, hi, i in sorted(ranges):
+        if lo < end:
+            problems.append(f"{name}: nodes {last} and {i} both generated devices {lo}..{min(hi, end) - 1}")
+        elif lo > end:
+            problems.append(f"{name}: no node generated devices {end}..{lo - 1}")
+        if hi > end:
+            end, last = hi, i
+    if end < count:
+        problems.append(f"{name}: no node generated devices {end}..{count - 1}")
+    elif end > count:
+        problems.append(f"{name}: node {last} generated devices up to {end - 1}, the fleet has {count}")
+    return problems
+
+
+def verify_nodes(output_dir, fleet):
+    """
+    Check that the node outputs under output_dir make up one complete run of fleet:
+    every node of the split finished, all nodes ran the same settings, the nodes' shares of each
+    group's devices don't overlap and leave none out, and every output still matches its checksum.
+    Returns {node: (directory, manifest)} in node order; raises ValueError listing what is wrong.
+    """
+    found = find_node_dirs(output_dir)
+    if not found:
+        raise ValueError(f"No node outputs (node-*-of-*) in {output_dir}")
+    splits = sorted({nodes for _, nodes in found})
+    if len(splits) > 1:
+        raise ValueError(f"{output_dir} holds runs split over different node counts {splits}")
+    nodes = splits[0]
+
+    problems = []
+    missing = [i for i in range(nodes) if (i, nodes) not in found]
+    if missing:
+        problems.append(f"nodes {missing} of {nodes} have no output")
+    manifests = {}
+    for (i, _), directory in sorted(found.items()):
+        manifest = load_manifest(directory)
+        if manifest is None:
+            problems.append(f"node {i} has no {MANIFEST_NAME} (still running or failed)")
+        else:
+            manifests[i] = (directory, manifest)
+    if problems:
+        raise ValueError(f"Can't merge {output_dir}: " + "; ".join(problems))
+
+    first = manifests[0][1]
+    for i, (directory, manifest) in manifests.items():
+        differ = [key for key in RUN_KEYS if manifest["run"].get(key) != first["run"].get(key)]
+        if differ:
+            problems.append(f"node {i} ran with different {differ} than node 0")
+        if manifest["node"] != i:
+            problems.append(f"{directory} holds the manifest of node {manifest['node']}")
+    if first["run"]["fleet"] != fleet.digest:
+        problems.append("the nodes ran a different fleet definition than this Simulator's")
+
+    groups = {name for _, manifest in manifests.values() for name in manifest["outputs"]}
+    for name in sorted(groups):
+        entries = {i: manifest["outputs"].get(name) for i, (_, manifest) in manifests.items()}
+        if any(entry is None for entry in entries.values()):
+            problems.append(f"{name} is missing from some nodes")
+            continue
+        if name not in fleet:
+            problems.append(f"{name} is not a group of the fleet")
+            continue
+        count = fleet.group(name)["count"]
+        devices = sum(entry["devices"] for entry in entries.values())
+        if devices != count:
+            problems.append(f"{name}: nodes cover {devices} devices, the fleet has {count}")
+        problems += _share_problems(name, entries, count, first["run"]["split"], nodes)
+    for i, (directory, manifest) in manifests.items():
+        for name, entry in manifest["outputs"].items():
+            if entry["path"] is None:
+                continue
+            path = os.path.join(directory, entry["path"])
+            if not os.path.exists(path):
+                problems.append(f"node {i}: {entry['path']} is missing")
+            elif output_checksum(path) != entry["sha256"]:
+                problems.append(f"node {i}: {entry['path']} doesn't match its checksum")
+    if problems:
+        raise ValueError(f"Can't merge {output_dir}: " + "; ".join(problems))
+    return manifests
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from src.registry import mix64
+from src.utils.payload_codec import devEUI_to_int
+
+# A LoRaWAN network between the sensors and whoever consumes their uplinks.
+# Every uplink is heard by each gateway in range, so the network server sees one copy per
+# receiving gateway (each with its own rssi/snr), none when no gateway decodes it, and copies
+# arrive after a per-gateway backhaul latency, so delivery order differs from send order.
+# Everything is drawn for a whole batch of uplinks at once, as (uplinks, gateways) arrays.
+
+# demodulation floor: the SNR (dB) at which half the packets still decode (SF7; SF12 goes down to -20)
+SNR_FLOOR = -7.5
+
+def _unit(x):
+    # uint64 hashes -> uniforms in [0, 1)
+    return (x >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+class NetworkStats:
+    """What the network did to the uplinks it carried."""
+
+    def __init__(self):
+        self.uplinks = 0
+        self.lost = 0
+        self.copies = 0
+        self.late = 0
+        self.out_of_order = 0
+        self.batches = 0
+
+    def summary(self):
+        delivered = self.uplinks - self.lost
+        return {
+            "uplinks": self.uplinks,
+            "delivered": delivered,
+            "lost": self.lost,
+            "loss_rate": round(self.lost / self.uplinks, 4) if self.uplinks else 0.0,
+            "copies": self.copies,
+            "duplicates": self.copies - delivered,
+            "late": self.late,
+            "out_of_order": self.out_of_order,
+            "batches": self.batches,
+        }
+
+
+class LoRaNetwork:
+    """
+    Gateways between the sensors and the network server.
+
+    A device's reported rssi/snr is its link to its best gateway; every other gateway hears it
+    path_loss_spread dB worse at most (a fixed offset per device and gateway, from a hash of its devEUI),
+    and each copy gets its own fading. A copy decodes with a probability that is logistic in its SNR
+    around snr_floor, times 1 - base_loss (collisions, interference). Decoded copies reach the
+    server after their gateway's backhaul latency (lognormal around latency_ms); a late_rate share
+    is held up to late_max_s by a gateway's store-and-forward buffer.
+
+    deliver() takes generated frames in time order and returns the copies that have reached the
+    server by the newest reading seen so far, in arrival order, with a gateway and a received_at column;
+    flush() returns the ones still in flight. Rows carry the sensors' columns unchanged otherwise,
+    so seqNumber gaps, repeats and reordering show exactly what a consumer has to deal with.
+    """
+
+    def __init__(self, gateways=3, seed=0, path_loss_spread=25.0, fading_db=3.0, snr_floor=SNR_FLOOR,
+                 softness_db=1.0, base_loss=0.01, latency_ms=150.0, latency_sigma=0.6,
+                 late_rate=0.001, late_max_s=600.0):
+        if not 1 <= gateways <= 255:
+            raise ValueError(f"gateways must be between 1 and 255, got {gateways}")
+        if not 0 <= base_loss < 1 or not 0 <= late_rate <= 1:
+            raise ValueError("base_loss must be in [0, 1) and late_rate in [0, 1]")
+        self.gateways = gateways
+        self.seed = seed
+        self.path_loss_spread = path_loss_spread
+        self.fading_db = fading_db
+        self.snr_floor = snr_floor
+        self.softness_db = softness_db
+        self.base_loss = base_loss
+        self.latency_sigma = latency_sigma
+        self.late_rate = late_rate
+        self.late_max_s = late_max_s
+        self.rng = np.random.default_rng(seed)
+        # each gateway's typical backhaul latency (a cellular gateway is slower than a fibre one)
+        self.backhaul_ms = latency_ms * self.rng.uniform(0.5, 2.0, gateways)
+        self.stats = NetworkStats()
+        self._pending = None
+        self._newest = None  # newest timestamp seen so far; everything received by then is released
+        self._last_sent = np.iinfo(np.int64).min  # send time of the newest copy released so far
+
+    def link_offsets(self, devEUIs):
+        """
+        Extra path loss (dB) from each device to each gateway, as a (devices, gateways) array:
+        0 at the device's best gateway, stable for a devEUI whatever batch or run it shows up in.
+        """
+        eui = np.asarray(devEUI_to_int(devEUIs), dtype=np.uint64)
+        gateway = np.arange(self.gateways, dtype=np.uint64)
+        key = mix64(eui ^ mix64(self.seed % 2**64))
+        with np.errstate(over="ignore"):
+            offsets = _unit(mix64(key[:, None] + gateway[None, :])) * self.path_loss_spread
+        return offsets - offsets.min(axis=1, keepdims=True)
+
+    def _transmit(self, frame):
+        # every copy that decodes, unsorted: (rows, gateway, rssi, snr, received_at in ns)
+        n, g = len(frame), self.gateways
+        devices = frame["devEUI"]
+        if isinstance(devices.dtype, pd.CategoricalDtype):
+            codes, uniques = devices.cat.codes.to_numpy(), devices.cat.categories
+        else:
+            codes, uniques = pd.factorize(devices)
+        offsets = self.link_offsets(np.asarray(uniques, dtype=str))[codes]
+
+        fading = self.rng.normal(0.0, self.fading_db, (n, g))
+        snr = frame["snr"].to_numpy(dtype=np.float64)[:, None] - offsets + fading
+        p = (1.0 - self.base_loss) / (1.0 + np.exp((self.snr_floor - snr) / self.softness_db))
+        heard = self.rng.random((n, g)) < p
+        rows, gws = np.nonzero(heard)
+        # the same loss and fading show up in the rssi of that copy
+        rssi = frame["rssi"].to_numpy(dtype=np.float64)[rows] - offsets[rows, gws] + fading[rows, gws]
+
+        latency = self.backhaul_ms[gws] * np.exp(self.latency_sigma * self.rng.standard_normal(len(rows)))
+        late = self.rng.random(len(rows)) < self.late_rate
+        latency[late] += self.rng.uniform(0.0, self.late_max_s * 1000.0, int(late.sum()))
+        sent = frame["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        received = sent[rows] + (latency * 1e6).astype(np.int64)
+
+        self.stats.uplinks += n
+        self.stats.lost += n - int(heard.any(axis=1).sum())
+        self.stats.copies += len(rows)
+        self.stats.late += int(late.sum())
+        return rows, gws, rssi, snr[rows, gws], received
+
+    def _copies(self, frame):
+        rows, gws, rssi, snr, received = self._transmit(frame)
+        copies = frame.take(rows).reset_index(drop=True)
+        copies["rssi"] = np.round(rssi, 1).astype(np.float32)
+        copies["snr"] = np.round(snr, 1).astype(np.float32)
+        copies["gateway"] = gws.astype(np.uint8)
+        copies["received_at"] = received.view("datetime64[ns]")
+        return copies
+
+    def _release(self, copies):
+        # copies in arrival order; counts the ones that arrive after a copy of a newer uplink
+        copies = copies.iloc[np.argsort(copies["received_at"].to_numpy(), kind="stable")].reset_index(drop=True)
+        sent = copies["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if len(sent):
+            newest = np.maximum.accumulate(np.maximum(sent, self._last_sent))
+            self.stats.out_of_order += int((sent[1:] < newest[:-1]).sum()) + int(sent[0] < self._last_sent)
+            self._last_sent = int(newest[-1])
+        return copies
+
+    def deliver(self, frame):
+        """
+        Send a batch of uplinks (batches in time order, as the generator yields them).
+        Returns the copies the server has received by the newest timestamp in the batch, in arrival order;
+        later batches can't arrive any earlier than that, so the released stream is in arrival order throughout.
+        """
+        self.stats.batches += 1
+        if frame.empty:
+            return frame.iloc[:0]
+        copies = self._copies(frame)
+        if self._pending is not None and len(self._pending):
+            copies = pd.concat([self._pending, copies], ignore_index=True)
+        newest = frame["timestamp"].to_numpy(dtype="datetime64[ns]").max()
+        self._newest = newest if self._newest is None else max(self._newest, newest)
+        ready = copies["received_at"].to_numpy() <= self._newest
+        self._pending = copies[~ready]
+        return self._release(copies[ready])
+
+    def flush(self):
+        """
+        Everything still in flight, in arrival order (call once the last batch has been delivered).
+        This ends the stream: the next deliver() may start over at an earlier time.
+        """
+        pending, self._pending, self._newest = self._pending, None, None
+        released = self._release(pending) if pending is not None else pd.DataFrame()
+        self._last_sent = np.iinfo(np.int64).min
+        return released
+
+
+def deduplicate(copies):
+    """What a network server forwards: the first copy of every uplink (by devEUI and timestamp), in arrival order."""
+    return copies[~copies.duplicated(["devEUI", "timestamp"], keep="first")].reset_index(drop=True)
@@ -0,0 +1,157 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "profiles.yaml")
+
+MINUTES_PER_DAY = 1440
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+HOLIDAY = 7  # table row used for holiday dates, after the seven weekdays
+SCHEDULE_KEYS = {"default", "weekday", "weekend", "holiday", "interpolate", *DAYS}
+
+
+def _minute_of_day(where, key):
+    try:
+        hours, minutes = (int(part) for part in str(key).split(":"))
+    except ValueError:
+        raise ValueError(f"{where}: times must look like \"HH:MM\", got {key!r}") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"{where}: {key!r} is not a time of day")
+    return hours * 60 + minutes
+
+
+def _compile_day(where, points, interpolate):
+    # {"HH:MM": value or [values]} -> (1440, channels) array; the schedule wraps around midnight
+    if not isinstance(points, dict) or not points:
+        raise ValueError(f"{where}: expected a non-empty mapping of \"HH:MM\" to values")
+    at = np.array([_minute_of_day(where, key) for key in points])
+    values = np.array([np.atleast_1d(v) for v in points.values()], dtype=float)
+    if values.ndim != 2:
+        raise ValueError(f"{where}: every value needs the same number of channels")
+    order = np.argsort(at)
+    at, values = at[order], values[order]
+
+    minutes = np.arange(MINUTES_PER_DAY)
+    if interpolate == "linear":
+        return np.column_stack([np.interp(minutes, at, values[:, c], period=MINUTES_PER_DAY)
+                                for c in range(values.shape[1])])
+    # step: each value holds until the next time; before the first time the last one still applies
+    return values[(np.searchsorted(at, minutes, side="right") - 1) % len(at)]
+
+
+def _compile_schedule(where, schedule):
+    # day types -> (8, 1440, channels) table: rows are Monday..Sunday, then holidays
+    if not isinstance(schedule, dict):
+        raise ValueError(f"{where}: expected a mapping of day types to schedules")
+    unknown = set(schedule) - SCHEDULE_KEYS
+    if unknown:
+        raise ValueError(f"{where}: unknown day types {sorted(unknown)} (allowed: {sorted(SCHEDULE_KEYS)})")
+    if "default" not in schedule:
+        raise ValueError(f"{where}: a schedule needs a default day")
+    interpolate = schedule.get("interpolate", "step")
+    if interpolate not in ("step", "linear"):
+        raise ValueError(f"{where}: interpolate must be step or linear, got {interpolate!r}")
+
+    days = {key: _compile_day(f"{where}.{key}", points, interpolate)
+            for key, points in schedule.items() if key != "interpolate"}
+    channels = {day.shape[1] for day in days.values()}
+    if len(channels) != 1:
+        raise ValueError(f"{where}: day types disagree on the number of channels")
+
+    rows = []
+    for i, name in enumerate(DAYS):
+        group = "weekend" if i >= 5 else "weekday"
+        rows.append(days.get(name, days.get(group, days["default"])))
+    rows.append(days.get("holiday", days.get("weekend", days["default"])))
+    return np.stack(rows)
+
+
+class Profile:
+    """
+    Compiled schedules for one profile (e.g. the mall people counters).
+    Each channel is a table indexed by [day type, minute of day], so looking up a whole
+    run's targets is one integer-index gather; sensors using the same profile share the tables.
+    """
+
+    def __init__(self, name, tables, holidays=()):
+        self.name = name
+        self.tables = tables
+        self._holidays = np.array(sorted(holidays), dtype="datetime64[D]")
+
+    def index(self, timestamps):
+        """Row positions into the flattened (day type, minute) tables for datetime64 timestamps."""
+        timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+        days = timestamps.astype("datetime64[D]")
+        minute = (timestamps - days) // np.timedelta64(1, "m")
+        day_type = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        if len(self._holidays):
+            day_type = np.where(np.isin(days, self._holidays), HOLIDAY, day_type)
+        return day_type * MINUTES_PER_DAY + minute
+
+    def lookup(self, timestamps, channel, index=None):
+        """Channel values at each timestamp, shape (n,) or (n, k) for k-valued channels."""
+        index = self.index(timestamps) if index is None else index
+        table = self.tables[channel]
+        values = table.reshape(-1, table.shape[-1])[index]
+        return values[:, 0] if table.shape[-1] == 1 else values
+
+
+class ProfileLibrary:
+    """All profiles from a profiles config, compiled once; get(kind, name) hands out the shared Profile."""
+
+    def __init__(self, spec, source="<profiles>"):
+        if not isinstance(spec, dict):
+            raise ValueError(f"{source}: expected a mapping")
+        holidays = spec.get("holidays") or []
+        try:
+            holidays = [np.datetime64(str(day), "D") for day in holidays]
+        except ValueError:
+            raise ValueError(f"{source}: holidays must be YYYY-MM-DD dates, got {holidays}") from None
+
+        self.source = source
+        self.profiles = {}
+        for kind, profiles in spec.items():
+            if kind == "holidays":
+                continue
+            if not isinstance(profiles, dict):
+                raise ValueError(f"{source}: {kind} must map profile names to channels")
+            for name, channels in profiles.items():
+                where = f"{source}: {kind}.{name}"
+                if not isinstance(channels, dict) or not channels:
+                    raise ValueError(f"{where}: expected a mapping of channels to schedules")
+                tables = {channel: _compile_schedule(f"{where}.{channel}", schedule)
+                          for channel, schedule in channels.items()}
+                self.profiles[(kind, name)] = Profile(f"{kind}.{name}", tables, holidays)
+
+    def get(self, kind, name="default"):
+        if (kind, name) not in self.profiles:
+            raise ValueError(f"{self.source}: no {kind} profile named {name!r}")
+        return self.profiles[(kind, name)]
+
+    def names(self, kind):
+        return [name for k, name in self.profiles if k == kind]
+
+
+def profile_groups(sensors):
+    """
+    For a fleet: positions of one sensor per distinct profile, and each sensor's group number,
+    so targets are looked up once per profile and gathered per device.
+    """
+    groups, index = {}, np.empty(len(sensors), dtype=np.intp)
+    for k, s in enumerate(sensors):
+        index[k] = groups.setdefault(id(s.profile), (len(groups), k))[0]
+    return [k for _, k in groups.values()], index
+
+
+@lru_cache(maxsize=None)
+def load_profiles(path=None):
+    """Read and compile a profiles YAML file (configs/profiles.yaml by default); cached per path."""
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("Profile configs need PyYAML (pip install pyyaml)") from e
+
+    path = path or DEFAULT_CONFIG
+    with open(path) as f:
+        return ProfileLibrary(yaml.safe_load(f), source=path)
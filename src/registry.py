@@ -0,0 +1,203 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.sensors.people_counter import LOCATIONS
+from src.utils.payload_codec import devEUI_to_int, int_to_devEUI
+
+# Device registry: every device of a fleet, one row each, in fleet table order (group by group, index order).
+# devEUIs are uint64s hashed from (seed, group, index) in bulk, so a million devices get theirs
+# without building a single sensor; lookups go through a sorted copy with searchsorted.
+REGISTRY_DTYPE = np.dtype([
+    ("devEUI", "u8"),
+    ("group", "u2"),
+    ("index", "u4"),
+    ("sensor_type", "u1"),
+    ("location", "u1"),
+    ("frequency", "f4"),
+    ("battery", "f4"),
+])
+
+# where Simulator saves the registry of a run, next to its outputs
+DEVICES_NAME = "devices.npz"
+
+# sensor_type codes: ammonia, then one people counter type per location
+SENSOR_TYPES = ["ammonia"] + [f"people_counter_{loc}" for loc in LOCATIONS]
+NO_LOCATION = 255
+
+# defaults of the sensor classes, for groups that don't set them
+DEFAULT_FREQUENCY = 300
+DEFAULT_BATTERY = 100
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def mix64(x):
+    """splitmix64 finalizer: well-spread uint64 hashes of uint64 inputs (wrapping arithmetic)."""
+    with np.errstate(over="ignore"):
+        x = np.asarray(x, dtype=np.uint64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def group_key(seed, name):
+    """uint64 every devEUI of a group is derived from (seed=None draws a fresh one)."""
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    digest = hashlib.blake2b(f"{seed}/{name}".encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+
+def _hash_euis(keys, indices, attempt):
+    with np.errstate(over="ignore"):
+        return mix64(keys + mix64(indices.astype(np.uint64) * _GOLDEN + np.uint64(attempt)))
+
+
+def _repeats(values):
+    # positions holding a value that already occurs at an earlier position
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    return order[1:][ordered[1:] == ordered[:-1]]
+
+
+def allocate_euis(keys, indices, max_attempts=8):
+    """
+    devEUIs for devices given their group keys and indices, unique across all of them.
+    A device whose hash is already taken (by a device earlier in the arrays) is re-hashed with
+    the next attempt number until it is free. Returns the devEUIs and how many collisions were resolved.
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    indices = np.asarray(indices, dtype=np.uint64)
+    euis = _hash_euis(keys, indices, 0)
+    collisions = 0
+    for attempt in range(1, max_attempts + 1):
+        taken = _repeats(euis)
+        if not len(taken):
+            return euis, collisions
+        collisions += len(taken)
+        euis[taken] = _hash_euis(keys[taken], indices[taken], attempt)
+    raise RuntimeError(f"devEUI collisions still unresolved after {max_attempts} attempts")
+
+
+class DeviceRegistry:
+    """
+    Array-backed table of a fleet's devices (REGISTRY_DTYPE) with indexes for fast lookups:
+    devEUIs through a sorted copy (searchsorted), sensor types and locations through
+    stable argsorts with one offset per code, and groups as contiguous slices.
+    """
+
+    def __init__(self, table, groups, collisions=0):
+        # table: REGISTRY_DTYPE array in fleet order; groups: group names, in group code order
+        self.table = table
+        self.groups = list(groups)
+        self.collisions = collisions
+        self._group_codes = {name: g for g, name in enumerate(self.groups)}
+        self._eui_order = np.argsort(table["devEUI"])
+        self._sorted_euis = table["devEUI"][self._eui_order]
+        if len(self._sorted_euis) and (self._sorted_euis[1:] == self._sorted_euis[:-1]).any():
+            raise ValueError("Device registry holds duplicate devEUIs")
+        self._group_bounds = np.searchsorted(table["group"], np.arange(len(self.groups) + 1))
+        self._by_type = self._code_index(table["sensor_type"], len(SENSOR_TYPES))
+        self._by_location = self._code_index(table["location"], len(LOCATIONS))
+
+    @staticmethod
+    def _code_index(codes, n):
+        # positions grouped by code (in table order within a code) and where each code's run starts
+        order = np.argsort(codes, kind="stable")
+        return order, np.searchsorted(codes[order], np.arange(n + 1))
+
+    @classmethod
+    def from_fleet(cls, fleet, seed):
+        """Registry of every device in a FleetSpec; groups with their own seed use it instead of seed."""
+        counts = np.array([g["count"] for g in fleet.groups], dtype=np.int64)
+        keys = np.repeat([group_key(g["seed"] if g["seed"] is not None else seed, g["name"]) for g in fleet.groups],
+                         counts).astype(np.uint64)
+        table = np.empty(len(fleet), dtype=REGISTRY_DTYPE)
+        table["group"] = fleet.table["group"]
+        table["index"] = fleet.table["index"]
+        table["location"] = fleet.table["location"]
+        table["devEUI"], collisions = allocate_euis(keys, table["index"])
+
+        kinds = np.array([g["kind"] == "ammonia" for g in fleet.groups])[table["group"]]
+        table["sensor_type"] = np.where(kinds, 0, table["location"].astype(np.int64) + 1)
+        table["frequency"] = np.repeat([g["settings"].get("frequency", DEFAULT_FREQUENCY) for g in fleet.groups], counts)
+        table["battery"] = np.repeat([g["settings"].get("battery", DEFAULT_BATTERY) for g in fleet.groups], counts)
+        return cls(table, [g["name"] for g in fleet.groups], collisions)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, devEUI):
+        return self.lookup([devEUI])[0] >= 0
+
+    def lookup(self, devEUIs):
+        """Table positions of devEUIs (hex strings or uint64s), -1 where a devEUI isn't registered."""
+        values = np.asarray(devEUIs)
+        if values.dtype.kind in "US":
+            values = devEUI_to_int(values)
+        values = values.astype(np.uint64, copy=False)
+        at = np.searchsorted(self._sorted_euis, values)
+        at = np.minimum(at, max(len(self._sorted_euis) - 1, 0))
+        found = (self._sorted_euis[at] == values) if len(self._sorted_euis) else np.zeros(len(values), dtype=bool)
+        return np.where(found, self._eui_order[at] if len(self._eui_order) else 0, -1)
+
+    def get(self, devEUI):
+        """Metadata of one device as a dict; KeyError if it isn't registered."""
+        position = self.lookup([devEUI])[0]
+        if position < 0:
+            raise KeyError(f"Unknown devEUI {devEUI}")
+        return self.frame([position]).to_dict("records")[0]
+
+    def group_slice(self, name):
+        """Table positions of a group's devices, as a slice (they are contiguous, in index order)."""
+        if name not in self._group_codes:
+            raise ValueError(f"Unknown sensor type: {name}")
+        g = self._group_codes[name]
+        return slice(int(self._group_bounds[g]), int(self._group_bounds[g + 1]))
+
+    def devEUIs(self, name, indices=None):
+        """uint64 devEUIs of a group's devices at indices (all of them by default)."""
+        euis = self.table["devEUI"][self.group_slice(name)]
+        return euis if indices is None else euis[np.asarray(indices, dtype=np.int64)]
+
+    def by_type(self, sensor_type):
+        """Table positions of the devices reporting a sensor_type (e.g. "people_counter_mall")."""
+        if sensor_type not in SENSOR_TYPES:
+            return np.zeros(0, dtype=np.intp)
+        order, bounds = self._by_type
+        code = SENSOR_TYPES.index(sensor_type)
+        return order[bounds[code]:bounds[code + 1]]
+
+    def by_location(self, location):
+        """Table positions of the devices installed at a location."""
+        if location not in LOCATIONS:
+            return np.zeros(0, dtype=np.intp)
+        order, bounds = self._by_location
+        code = LOCATIONS.index(location)
+        return order[bounds[code]:bounds[code + 1]]
+
+    def frame(self, positions=None):
+        """Devices at table positions (all by default) as a DataFrame with readable labels."""
+        rows = self.table if positions is None else self.table[np.asarray(positions, dtype=np.int64)]
+        locations = np.append(np.array(LOCATIONS, dtype=object), None)
+        return pd.DataFrame({
+            "devEUI": int_to_devEUI(rows["devEUI"]),
+            "group": pd.Categorical.from_codes(rows["group"].astype(np.int64), categories=self.groups),
+            "index": rows["index"],
+            "sensor_type": pd.Categorical.from_codes(rows["sensor_type"].astype(np.int64), categories=SENSOR_TYPES),
+            "location": locations[np.minimum(rows["location"], len(LOCATIONS))],
+            "frequency": rows["frequency"],
+            "battery": rows["battery"],
+        })
+
+    def save(self, path):
+        """Write the table to an .npz file (indexes are rebuilt on load)."""
+        np.savez(path, table=self.table, groups=np.array(self.groups), collisions=self.collisions)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["table"], data["groups"].tolist(), int(data["collisions"]))
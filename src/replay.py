@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import inspect
+import numpy as np
+from datetime import datetime, timedelta
+
+
+class ReplayStats:
+    """Emitted-vs-scheduled lag for a replay run (seconds of wall-clock time)."""
+
+    def __init__(self):
+        self._lags = []
+        self.emitted = 0
+        self.batches = 0
+        self.wall_seconds = 0.0
+
+    def record(self, lags):
+        self._lags.append(lags)
+        self.emitted += len(lags)
+        self.batches += 1
+
+    def summary(self):
+        lags = np.concatenate(self._lags) if self._lags else np.zeros(0)
+        p50, p95, p99 = np.percentile(lags, [50, 95, 99]) if len(lags) else (0.0, 0.0, 0.0)
+        return {
+            "emitted": self.emitted,
+            "batches": self.batches,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "rate_per_sec": round(self.emitted / self.wall_seconds, 1) if self.wall_seconds else 0.0,
+            "lag_mean_ms": round(float(lags.mean()) * 1000, 3) if len(lags) else 0.0,
+            "lag_p50_ms": round(float(p50) * 1000, 3),
+            "lag_p95_ms": round(float(p95) * 1000, 3),
+            "lag_p99_ms": round(float(p99) * 1000, 3),
+            "lag_max_ms": round(float(lags.max()) * 1000, 3) if len(lags) else 0.0,
+        }
+
+
+class _DeviceCursor:
+    # walks one sensor's readings a chunk at a time; due times are seconds after the replay start
+    def __init__(self, sensor, start_time, offset_seconds, duration_minutes, chunk_size):
+        self._chunks = sensor.iter_chunks(duration_minutes, chunk_size=chunk_size,
+                                          start_time=start_time + timedelta(seconds=offset_seconds))
+        self._start = np.datetime64(start_time, "ns")
+        self._records = []
+        self._due = np.zeros(0)
+        self._pos = 0
+
+    def next_due(self):
+        while self._pos >= len(self._records):
+            # a chunk can come back empty when a dropout swallowed all of it; keep going
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return None
+            ts = chunk["timestamp"].to_numpy(dtype="datetime64[ns]")
+            self._due = (ts - self._start) / np.timedelta64(1, "s")
+            self._records = chunk.to_dict("records")
+            self._pos = 0
+        return self._due[self._pos]
+
+    def pop(self):
+        record = self._records[self._pos]
+        self._pos += 1
+        return record
+
+
+class ReplayScheduler:
+    """
+    Emits sensor readings at wall-clock pace, or sped up by `speedup` (60 = one simulated
+    hour per real minute), on a single asyncio event loop.
+    A min-heap keyed on each device's next due time decides what fires next; all readings
+    that are due together are handed to `emit` as one list of dicts (emit may be sync or async).
+    With stagger=True each device gets a random phase within its reporting interval, as real
+    deployments do, instead of every device firing on the same tick.
+    """
+
+    def __init__(self, sensors, emit=None, speedup=1.0, duration_minutes=60, start_time=None,
+                 stagger=True, chunk_size=12):
+        self.sensors = list(sensors)
+        self.emit = emit
+        self.speedup = float(speedup)
+        self.duration_minutes = duration_minutes
+        self.start_time = start_time if start_time else datetime.now()
+        self.stagger = stagger
+        self.chunk_size = chunk_size
+        self.stats = ReplayStats()
+
+    async def _emit(self, batch):
+        if self.emit is None:
+            return
+        result = self.emit(batch)
+        if inspect.isawaitable(result):
+            await result
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        cursors = []
+        heap = []
+        for i, sensor in enumerate(self.sensors):
+            offset = sensor.rng.uniform(0, sensor.frequency) if self.stagger else 0.0
+            cursor = _DeviceCursor(sensor, self.start_time, offset, self.duration_minutes, self.chunk_size)
+            cursors.append(cursor)
+            due = cursor.next_due()
+            if due is not None:
+                heap.append((due, i))
+        heapq.heapify(heap)
+
+        wall_start = loop.time()
+        while heap:
+            delay = wall_start + heap[0][0] / self.speedup - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # everything due by now goes out in one batch
+            now = loop.time()
+            horizon = (now - wall_start) * self.speedup
+            batch = []
+            due_times = []
+            while heap and heap[0][0] <= horizon:
+                due, i = heapq.heappop(heap)
+                batch.append(cursors[i].pop())
+                due_times.append(due)
+                next_due = cursors[i].next_due()
+                if next_due is not None:
+                    heapq.heappush(heap, (next_due, i))
+
+            self.stats.record(now - (wall_start + np.array(due_times) / self.speedup))
+            await self._emit(batch)
+
+        self.stats.wall_seconds = loop.time() - wall_start
+        return self.stats
+
+    def run_blocking(self):
+        """Run the replay to completion on a fresh event loop and return its ReplayStats."""
+        return asyncio.run(self.run())
@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.schema import concat_frames
+from src.utils.data_export import find_output, get_exporter, read_output
+
+# Rollups: per-bucket aggregates of the generated readings, written next to the raw outputs as
+# <output_dir>/rollups/<group>.<level>.<granularity>. Every metric gets a sum, min, max and last value
+# (with count, the readings in the bucket, shared by all metrics), so partial rollups of the same
+# bucket -- from consecutive chunks, resumed runs or different nodes -- merge exactly (see combine()).
+ROLLUP_DIR = "rollups"
+
+# bucket width in seconds; buckets start at whole minutes/hours/days
+GRANULARITIES = {"1min": 60, "hourly": 3600, "daily": 86400}
+
+# device: one row per bucket and devEUI; type: one row per bucket and sensor_type
+LEVELS = {"device": ["timestamp", "devEUI"], "type": ["timestamp", "sensor_type"]}
+
+METRICS = ["battery", "rssi", "snr", "temperature", "humidity", "nh3", "period_in", "period_out", "current_occupancy"]
+
+# anomaly_type labels that count as anomalies (radio-only glitches don't)
+QUIET_LABELS = ("none", "radio")
+
+
+def rollup_path(output_dir, name, level, granularity):
+    """Output path (without extension) of one rollup of a group."""
+    return os.path.join(output_dir, ROLLUP_DIR, f"{name}.{level}.{granularity}")
+
+
+def _codes(column):
+    # integer codes and labels of a categorical (or plain) column
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column)
+
+
+def aggregate(frame, level, granularity):
+    """
+    Rollup rows of one frame of readings: rows are sorted by (bucket, key) with a stable lexsort,
+    then every statistic is a ufunc.reduceat over the runs, so the cost is one sort of the frame.
+    "last" is the value of the latest reading in the bucket (the last one in frame order on ties).
+    """
+    width = GRANULARITIES[granularity] * 1_000_000_000
+    ts = frame["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    bucket = ts // width * width
+    key_column = LEVELS[level][1]
+    codes, labels = _codes(frame[key_column])
+    order = np.lexsort((codes, bucket))
+    bucket, codes = bucket[order], codes[order]
+    starts = np.flatnonzero(np.r_[True, (bucket[1:] != bucket[:-1]) | (codes[1:] != codes[:-1])])
+    ends = np.r_[starts[1:], len(order)] - 1
+
+    out = {
+        "timestamp": bucket[starts].view("datetime64[ns]"),
+        key_column: pd.Categorical.from_codes(codes[starts], categories=labels),
+    }
+    if level == "device":
+        types, type_labels = _codes(frame["sensor_type"])
+        out["sensor_type"] = pd.Categorical.from_codes(types[order][starts], categories=type_labels)
+    out["count"] = np.diff(np.r_[starts, len(order)]).astype(np.int64)
+    if "anomaly_type" in frame:
+        flagged = (~frame["anomaly_type"].isin(QUIET_LABELS).to_numpy())[order]
+        out["anomalies"] = np.add.reduceat(flagged.astype(np.int64), starts)
+    for metric in METRICS:
+        if metric not in frame:
+            continue
+        # min/max/last keep the column's own dtype; sums add up in float64
+        values = frame[metric].to_numpy()[order]
+        out[f"{metric}_sum"] = np.add.reduceat(values, starts, dtype=np.float64)
+        out[f"{metric}_min"] = np.minimum.reduceat(values, starts)
+        out[f"{metric}_max"] = np.maximum.reduceat(values, starts)
+        out[f"{metric}_last"] = values[ends]
+    out["last_at"] = ts[order][ends].view("datetime64[ns]")
+    return pd.DataFrame(out)
+
+
+def _how(column):
+    if column in ("count", "anomalies") or column.endswith("_sum"):
+        return "sum"
+    if column.endswith("_min"):
+        return "min"
+    if column.endswith("_max"):
+        return "max"
+    return "last"
+
+
+def combine(frames, level):
+    """
+    Merge partial rollups of the same level into one row per bucket and key (in time order):
+    counts and sums add up, mins and maxes fold, and last comes from the partial with the latest reading.
+    """
+    keys = LEVELS[level]
+    df = concat_frames([f for f in frames if len(f)], ignore_index=True) if any(len(f) for f in frames) \
+        else frames[0]
+    if df.empty:
+        return df
+    df = df.sort_values(keys + ["last_at"], kind="stable")
+    agg = {column: _how(column) for column in df.columns if column not in keys}
+    return df.groupby(keys, observed=True, sort=False).agg(agg).reset_index()
+
+
+def mean(rollup, metric):
+    """Mean of a metric over all the readings behind a rollup (NaN when there are none)."""
+    count = rollup["count"].sum() if len(rollup) else 0
+    return rollup[f"{metric}_sum"].sum() / count if count else float("nan")
+
+
+def means(rollup, metrics):
+    """Per-bucket means of metrics, keeping the rollup's key columns (for plotting)."""
+    keys = [c for c in ("timestamp", "sensor_type", "devEUI") if c in rollup.columns]
+    return rollup[keys].assign(**{m: rollup[f"{m}_sum"] / rollup["count"] for m in metrics})
+
+
+class RollupStream:
+    """
+    Writes one rollup from partial rollups that arrive in time order (e.g. one per generated chunk).
+    Rows of the newest bucket are held back, since the next partial may add to them; everything older
+    is final and goes straight to the exporter, so memory stays at one bucket's worth of rows.
+    """
+
+    def __init__(self, exporter, level):
+        self.exporter = exporter
+        self.level = level
+        self._open = None
+
+    def add(self, part):
+        if part.empty:
+            return
+        keys = LEVELS[self.level]
+        if part[keys].duplicated().any():
+            # several rows of one bucket and key in a part (e.g. a merged block holding every node's rows)
+            part = combine([part], self.level)
+        if self._open is not None:
+            # only rows of the held-back bucket can need merging; once a newer bucket shows up it is final
+            merging = part["timestamp"].to_numpy() <= self._open["timestamp"].to_numpy().max()
+            held = combine([self._open, part[merging]], self.level) if merging.any() else self._open
+            part = part[~merging].reset_index(drop=True)
+            if part.empty:
+                self._open = held
+                return
+            self.exporter.write(held)
+        stamps = part["timestamp"].to_numpy()
+        newest = stamps == stamps.max()
+        if not newest.all():
+            self.exporter.write(part[~newest].reset_index(drop=True))
+        self._open = part[newest].reset_index(drop=True)
+
+    def close(self):
+        if self._open is not None and len(self._open):
+            self.exporter.write(self._open)
+        self._open = None
+        self.exporter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RollupWriter:
+    """
+    Exporter-like sink for a group's readings (frames in time order) that keeps the group's rollups
+    up to date: write() aggregates each frame once per level and granularity.
+    With append=True, rows go after an earlier run's rollups; read_rollup() merges the bucket they share.
+    """
+
+    def __init__(self, output_dir, name, output_format="csv", compression=None, append=False,
+                 granularities=tuple(GRANULARITIES), levels=("type",)):
+        self.path = os.path.join(output_dir, ROLLUP_DIR)
+        self.append = append
+        self.rows_written = 0
+        self.streams = {
+            (level, granularity): RollupStream(get_exporter(rollup_path(output_dir, name, level, granularity),
+                                                            output_format, compression=compression, append=append),
+                                               level)
+            for level in levels for granularity in granularities
+        }
+
+    def write(self, df):
+        if df.empty:
+            return
+        for (level, granularity), stream in self.streams.items():
+            stream.add(aggregate(df, level, granularity))
+        self.rows_written += len(df)
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def restore_rollup(df, level):
+    """Put a rollup read back from disk (CSV keeps no types) on the dtypes aggregate() produces."""
+    if "last_at" in df and not pd.api.types.is_datetime64_any_dtype(df["last_at"]):
+        df["last_at"] = pd.to_datetime(df["last_at"], format="ISO8601")
+    for column in LEVELS[level][1:] + ["sensor_type"]:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def find_rollup(output_dir, name, level, granularity):
+    """Path of a group's rollup under output_dir, or None if it wasn't written."""
+    return find_output(os.path.join(output_dir, ROLLUP_DIR), f"{name}.{level}.{granularity}")
+
+
+def read_rollup(output_dir, name, level, granularity):
+    """A rollup written by RollupWriter, with buckets split over appended runs merged; None if there is none."""
+    path = find_rollup(output_dir, name, level, granularity)
+    if path is None:
+        return None
+    df = restore_rollup(read_output(path), level)
+    if df.duplicated(LEVELS[level]).any():
+        df = combine([df], level)
+    return df
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from src.anomalies import ANOMALY_TYPES
+
+# Column dtypes of the frames each sensor kind generates.
+# Strings that repeat on every row are categoricals, measurements are float32 and
+# counters use the smallest integer that holds them (seqNumber wraps at 65536 like a real frame counter).
+COMMON = {
+    "timestamp": "datetime64[ns]",
+    "sensor_type": "category",
+    "devEUI": "category",
+    "battery": "float32",
+    "rssi": "float32",
+    "snr": "float32",
+    "seqNumber": "uint16",
+}
+
+# Ground truth the simulator knows but a real uplink doesn't carry (see src/anomalies.py);
+# frames built without them (e.g. decoded payloads) simply leave them out.
+LABELS = {"anomaly_type": "category"}
+
+SCHEMAS = {
+    "base": {**COMMON, "value": "float32", **LABELS},
+    "ammonia": {**COMMON, "temperature": "float32", "humidity": "float32", "nh3": "float32", **LABELS},
+    "people_counter": {**COMMON, "period_in": "int16", "period_out": "int16",
+                       "current_occupancy": "int16", "location": "category", **LABELS},
+}
+
+# Categoricals with a fixed set of labels: read back onto the full label set, in its order,
+# whichever labels a file happens to hold
+FIXED_CATEGORIES = {"anomaly_type": pd.CategoricalDtype(ANOMALY_TYPES)}
+
+# Columns the network layer adds to the gateway copies it delivers (see src/network.py)
+NETWORK = {"gateway": "uint8", "received_at": "datetime64[ns]"}
+
+# every known column -> dtype, for readers that don't know which kind a file holds
+COLUMN_DTYPES = {**{name: dtype for schema in SCHEMAS.values() for name, dtype in schema.items()}, **NETWORK}
+
+
+def repeat_category(value, n):
+    """Categorical column holding one label n times (e.g. a single sensor's devEUI)."""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[value])
+
+
+def tile_categories(labels, reps):
+    """Categorical of per-device labels, repeated for reps timesteps (rows ordered by time, then device)."""
+    codes, uniques = pd.factorize(np.asarray(labels), sort=True)
+    return pd.Categorical.from_codes(np.tile(codes, reps), categories=uniques)
+
+
+def build_frame(kind, columns):
+    """
+    Assemble a generated frame in the kind's schema from column arrays or scalars.
+    Arrays that already have the schema dtype are used as they are; categorical columns can be
+    passed as Categoricals (see repeat_category / tile_categories) or as plain labels.
+    """
+    n = len(columns["timestamp"])
+    data = {}
+    for name, dtype in SCHEMAS[kind].items():
+        if name in LABELS and name not in columns:
+            continue
+        values = columns[name]
+        if dtype == "category":
+            if np.isscalar(values):
+                values = repeat_category(values, n)
+            data[name] = values if isinstance(values, pd.Categorical) else pd.Categorical(values)
+        else:
+            data[name] = np.broadcast_to(np.asarray(values, dtype=dtype), n) if np.isscalar(values) \
+                else np.asarray(values, dtype=dtype)
+    return pd.DataFrame(data, copy=False)
+
+
+def _has_dtype(column, dtype):
+    # unordered CategoricalDtypes compare equal whatever the order of their categories; here it matters
+    if isinstance(dtype, pd.CategoricalDtype):
+        return isinstance(column.dtype, pd.CategoricalDtype) and column.cat.categories.equals(dtype.categories)
+    return column.dtype == dtype
+
+
+def restore_dtypes(df):
+    """
+    Put columns read back from CSV (or Feather, which stores labels as plain strings) on their schema dtypes.
+    Integer columns with gaps (combined outputs) become float32, which holds them exactly; timestamps come
+    back as datetime64[ns] whatever unit the reader parsed them in.
+    """
+    for name in df.columns:
+        dtype = FIXED_CATEGORIES.get(name, COLUMN_DTYPES.get(name))
+        if dtype is None or _has_dtype(df[name], dtype):
+            continue
+        if dtype in ("int16", "uint16") and df[name].isna().any():
+            dtype = "float32"
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].cat.set_categories(dtype.categories)
+        else:
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+def concat_frames(frames, **kwargs):
+    """
+    pd.concat that keeps categorical columns categorical: frames whose categories differ
+    (e.g. different sensors) are first put on the sorted union of their categories.
+    """
+    frames = list(frames)
+    if len(frames) > 1:
+        categorical = {c for f in frames for c in f.columns if isinstance(f[c].dtype, pd.CategoricalDtype)}
+        for c in categorical:
+            dtypes = [f[c].dtype for f in frames if c in f.columns]
+            if all(_has_dtype(f[c], dtypes[0]) for f in frames if c in f.columns):
+                continue  # already on one dtype (e.g. anomaly_type): keep its category order
+            labels = [f[c].cat.categories if isinstance(f[c].dtype, pd.CategoricalDtype) else pd.unique(f[c].dropna())
+                      for f in frames if c in f.columns]
+            dtype = pd.CategoricalDtype(np.unique(np.concatenate([np.asarray(l, dtype=object) for l in labels])))
+            frames = [f.assign(**{c: f[c].astype(dtype)}) if c in f.columns and f[c].dtype != dtype else f
+                      for f in frames]
+    return pd.concat(frames, **kwargs)
@@ -1,12 +1,34 @@
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-from src.base_sensor import BaseSensor
+from datetime import datetime
+from src.anomalies import SPIKE, drop_lost, fleet_drift_scales, inject_events, label_categories
+from src.base_sensor import BaseSensor, BlockSampler, lockstep_step, time_grid
+from src.profiles import load_profiles, profile_groups
+from src.schema import build_frame, repeat_category, tile_categories
+
+def _ou_walk(state, targets, noise, k, max_step):
+    # OU states of a batched run: the one before each step, plus the one after the last.
+    # The clipped step makes the walk sequential, so it runs on plain floats
+    state = float(state)
+    walk = [state]
+    for target, e in zip(targets.tolist(), noise.tolist()):
+        state += min(max((target - state) * k + e, -max_step), max_step)
+        walk.append(state)
+    return np.array(walk)
 
 class AmmoniaSensor(BaseSensor):
+    kind = "ammonia"
+    state_fields = BaseSensor.state_fields + ("_temp_state", "_hum_state")
+    # NH3 spikes at anomaly_rate; a drifting electrochemical cell reads up to 0.5 ppm off
+    anomaly_weights = {"spike": 1.0, "drift": 0.02, "stuck": 0.02, "dropout": 0.02}
+    anomaly_columns = ("temperature", "humidity", "nh3")
+    drift_scales = {"nh3": 0.5}
+    battery_drain = False
+
     def __init__(self, devEUI=None, battery=100, seqNumber=0,
-                 frequency=300, noise_level=0.01, anomaly_rate=0.01, seed=None):
-        
+                 frequency=300, noise_level=0.01, anomaly_rate=0.01, seed=None, profile=None,
+                 anomaly_weights=None):
+        # profile: temperature/humidity targets (src.profiles.Profile); defaults to configs/profiles.yaml
+
         super().__init__(
             type="ammonia",
             devEUI=devEUI,
@@ -15,6 +37,7 @@ class AmmoniaSensor(BaseSensor):
             frequency=frequency,
             noise_level=noise_level,
             anomaly_rate=anomaly_rate,
+            anomaly_weights=anomaly_weights,
             seed=seed
         )
 
@@ -33,53 +56,36 @@ class AmmoniaSensor(BaseSensor):
         self._temp_state = None
         self._hum_state = None
 
-    def _time_period(self, hour):
-        if 6 <= hour < 12: return "morning"
-        if 12 <= hour < 18: return "afternoon"
-        if 18 <= hour < 24: return "evening"
-        return "night"
-
-    def _target_temp(self, hour):
-        targets = {
-            "morning": 27,
-            "afternoon": 30.5,
-            "evening": 29,
-            "night": 26
-        }
-        return targets[self._time_period(hour)]
-
-    def _target_hum(self, hour):
-        targets = {
-            "morning": 44,
-            "afternoon": 50,
-            "evening": 55,
-            "night": 47
-        }
-        return targets[self._time_period(hour)]
+        # minute-resolution target tables, shared by every sensor on the same profile
+        self.profile = profile if profile is not None else load_profiles().get(self.kind)
+
+    def _targets(self, timestamps):
+        index = self.profile.index(timestamps)
+        return (self.profile.lookup(timestamps, "temperature", index),
+                self.profile.lookup(timestamps, "humidity", index))
 
     # for markovian property
     def _ou_step(self, prev, target, dt_min, tau, sigma, max_step):
         drift = (target - prev) * (dt_min / tau)
-        noise = np.random.normal(0, sigma)
+        noise = self.rng.normal(0, sigma)
         proposed = prev + drift + noise
         delta = np.clip(proposed - prev, -max_step, max_step)
         return prev + delta
 
     def _init_env_state(self, start_time):
-        h = start_time.hour
-        self._temp_state = self._target_temp(h) + np.random.normal(0, 0.2)
-        self._hum_state = self._target_hum(h) + np.random.normal(0, 1.0)
+        temp_target, hum_target = self._targets([start_time])
+        self._temp_state = temp_target[0] + self.rng.normal(0, 0.2)
+        self._hum_state = hum_target[0] + self.rng.normal(0, 1.0)
 
-    def _update_env(self, ts):
+    def _update_env(self, temp_target, hum_target):
         dt_min = self.frequency / 60.0
-        h = ts.hour
 
         self._temp_state = self._ou_step(
-            self._temp_state, self._target_temp(h),
+            self._temp_state, temp_target,
             dt_min, self.temp_tau, self.temp_sigma, self.temp_max_step
         )
         self._hum_state = self._ou_step(
-            self._hum_state, self._target_hum(h),
+            self._hum_state, hum_target,
             dt_min, self.hum_tau, self.hum_sigma, self.hum_max_step
         )
 
@@ -88,10 +94,10 @@ class AmmoniaSensor(BaseSensor):
         h = float(np.clip(self._hum_state, 20, 95))
         return round(t, 1), round(h, 1)
 
-    def generate_reading(self, t):
+    def generate_reading(self, t, spike=0.0):
+        # spike: extra ppm from an anomaly (drawn in bulk per chunk, see src/anomalies.py)
         base = self.base_nh3 + self.nh3_amp * np.sin(t / 96)
-        noise = np.random.normal(0, self.noise_level)
-        spike = np.random.uniform(100, 700) if np.random.random() < self.anomaly_rate else 0
+        noise = self.rng.normal(0, self.noise_level)
         nh3_value = base + noise + spike
         if self._temp_state is not None and self._hum_state is not None:
             # normalize to deviations from nominal values
@@ -104,35 +110,218 @@ class AmmoniaSensor(BaseSensor):
         nh3_value = max(0.05, nh3_value)
         return round(nh3_value, 3)
 
-    def generate_data(self, duration_minutes=1440, start_time=None):
+    def draw_values(self, rng, timestamps, draws):
+        # nh3, temperature and humidity noise of one block (AmmoniaFleet draws its devices' blocks here too)
+        n = len(timestamps)
+        return rng.normal(0, self.noise_level, n), rng.normal(0, self.temp_sigma, n), rng.normal(0, self.hum_sigma, n)
+
+    def generate_values(self, step0, timestamps, draws, samples):
+        nh3_noise, temp_noise, hum_noise = samples
+        if not len(timestamps):
+            return {name: np.empty(0) for name in self.anomaly_columns}
+        if self._temp_state is None or self._hum_state is None:
+            self._init_env_state(timestamps[0])
+
+        dt_min = self.frequency / 60.0
+        temp_targets, hum_targets = self._targets(timestamps)
+        temp = _ou_walk(self._temp_state, temp_targets, temp_noise, dt_min / self.temp_tau, self.temp_max_step)
+        hum = _ou_walk(self._hum_state, hum_targets, hum_noise, dt_min / self.hum_tau, self.hum_max_step)
+        self._temp_state, self._hum_state = float(temp[-1]), float(hum[-1])
+
+        # nh3 uses the env state from before each step's update, as generate_reading() does
+        t = np.arange(step0, step0 + len(timestamps))
+        spikes = np.where(draws[0] == SPIKE, 100 + 600 * draws[1], 0.0)
+        nh3 = self.base_nh3 + self.nh3_amp * np.sin(t / 96) + nh3_noise + spikes
+        nh3 *= 1 + 0.005 * (temp[:-1] - 28) + 0.002 * (hum[:-1] - 50)
+        return {"temperature": np.round(np.clip(temp[1:], 20, 40), 1),
+                "humidity": np.round(np.clip(hum[1:], 20, 95), 1),
+                "nh3": np.round(np.maximum(0.05, nh3), 3)}
+
+    def _round_values(self, columns):
+        # drift can push the reading below the floor
+        return {**columns, "nh3": np.round(np.maximum(0.05, columns["nh3"]), 3)}
+
+    def generate_data(self, duration_minutes=1440, start_time=None, batched=False):
         if start_time is None:
             start_time = datetime.now()
 
         num_points = int((duration_minutes * 60) / self.frequency)
-        timestamps = [start_time + timedelta(seconds=i * self.frequency) for i in range(num_points)]
+        generate = self._generate_chunk_batched if batched else self._generate_chunk
+        return generate(start_time, num_points)
+
+    def _generate_chunk(self, start_time, num_points, step0=0):
+        timestamps = time_grid(start_time, num_points, self.frequency)[0]
+        # plain floats: the per-reading loop below is cheaper on Python scalars
+        temp_targets, hum_targets = (t.tolist() for t in self._targets(timestamps))
 
-        # init smooth states
+        # init smooth states (only once; later chunks continue the walk)
         if self._temp_state is None or self._hum_state is None:
             self._init_env_state(start_time)
 
-        records = []
-        for i, ts in enumerate(timestamps):
-            nh3_value = self.generate_reading(i)
-            temperature, humidity = self._update_env(ts)
-
-            record = {
-                "timestamp": ts,
-                "sensor_type": self.type,
-                "devEUI": self.devEUI,
-                "battery": self.battery,
-                "rssi": round(self._random_rssi(), 1),
-                "snr": round(self._random_snr(), 1),
-                "seqNumber": self.seqNumber,
-                "temperature": temperature,
-                "humidity": humidity,
-                "nh3": nh3_value
-            }
+        draws = self._draw_anomalies(num_points)
+        codes, magnitude = draws[0], draws[1]
+        spikes = np.where(codes == SPIKE, 100 + 600 * magnitude, 0.0).tolist()
+
+        # readings go straight into arrays of the schema dtypes
+        seq = np.empty(num_points, dtype=np.uint16)
+        temperature = np.empty(num_points, dtype=np.float32)
+        humidity = np.empty(num_points, dtype=np.float32)
+        nh3 = np.empty(num_points, dtype=np.float32)
+        for i in range(num_points):
+            nh3[i] = self.generate_reading(step0 + i, spikes[i])
+            temperature[i], humidity[i] = self._update_env(temp_targets[i], hum_targets[i])
+            seq[i] = self.seqNumber
             self._increment_seq()
-            records.append(record)
 
-        return pd.DataFrame(records)
+        columns = {"temperature": temperature, "humidity": humidity, "nh3": nh3}
+        keep, labels = self._inject_events(draws, columns)
+        return drop_lost(build_frame(self.kind, {
+            "timestamp": timestamps,
+            "sensor_type": repeat_category(self.type, num_points),
+            "devEUI": repeat_category(self.devEUI, num_points),
+            "battery": np.full(num_points, self.battery, dtype=np.float32),
+            "rssi": np.round(draws[3], 1),
+            "snr": np.round(draws[4], 1),
+            "seqNumber": seq,
+            **self._round_values(columns),
+            "anomaly_type": labels
+        }), keep)
+
+
+class AmmoniaFleet:
+    """
+    Runs many AmmoniaSensor devices in lockstep.
+    Per-device OU temperature/humidity state is held in arrays and every device
+    is advanced together, one timestep per vector operation.
+    """
+
+    def __init__(self, sensors):
+        self.sensors = list(sensors)
+        if not self.sensors:
+            raise ValueError("AmmoniaFleet needs at least one sensor")
+
+        frequencies = {s.frequency for s in self.sensors}
+        if len(frequencies) != 1:
+            raise ValueError(f"All sensors in a fleet must share one frequency, got {sorted(frequencies)}")
+        self.frequency = frequencies.pop()
+
+        # per-device parameters
+        self.devEUI = np.array([s.devEUI for s in self.sensors])
+        self.base_nh3 = np.array([s.base_nh3 for s in self.sensors], dtype=float)
+        self.nh3_amp = np.array([s.nh3_amp for s in self.sensors], dtype=float)
+        self.temp_tau = np.array([s.temp_tau for s in self.sensors], dtype=float)
+        self.temp_max_step = np.array([s.temp_max_step for s in self.sensors], dtype=float)
+        self.hum_tau = np.array([s.hum_tau for s in self.sensors], dtype=float)
+        self.hum_max_step = np.array([s.hum_max_step for s in self.sensors], dtype=float)
+        self.drift_scales = fleet_drift_scales(self.sensors)
+
+        # devices on the same profile share its tables; targets are looked up once per distinct profile
+        self._profiles, self._profile_index = profile_groups(self.sensors)
+        self._samples = BlockSampler(self._draw_block)
+
+    @classmethod
+    def create(cls, n_devices, **kwargs):
+        """Build a fleet of n_devices identical AmmoniaSensors (kwargs go to each sensor)."""
+        return cls([AmmoniaSensor(**kwargs) for _ in range(n_devices)])
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def _init_env_state(self, start_time):
+        for s in self.sensors:
+            if s._temp_state is None or s._hum_state is None:
+                s._init_env_state(start_time)
+        temp = np.array([s._temp_state for s in self.sensors], dtype=float)
+        hum = np.array([s._hum_state for s in self.sensors], dtype=float)
+        return temp, hum
+
+    def _draw_block(self, block, origin):
+        # each device's block is drawn by the sensor itself, as its batched path draws it (see
+        # BaseSensor._draw_batch_block), so a fleet of one matches generate_data(batched=True)
+        draws = [s._draw_batch_block(block, origin) for s in self.sensors]
+        return tuple(np.column_stack(columns) for columns in zip(*draws))
+
+    def generate_data(self, duration_minutes=1440, start_time=None):
+        """Generate readings for every device; rows are ordered by timestamp, then device."""
+        if start_time is None:
+            start_time = datetime.now()
+        num_points = int((duration_minutes * 60) / self.frequency)
+        return self._generate_chunk(start_time, num_points)
+
+    iter_chunks = BaseSensor.iter_chunks
+
+    def _generate_chunk(self, start_time, num_points, step0=0):
+        # num_points readings per device from start_time; step0 is the reading index within the whole run
+        n = len(self.sensors)
+        timestamps = time_grid(start_time, num_points, self.frequency)[0]
+
+        temp, hum = self._init_env_state(start_time)
+
+        shape = (num_points, n)
+        step = lockstep_step(self.sensors)
+        origin = timestamps[0] - np.timedelta64(step * self.frequency, "s") if num_points else None
+        (codes, magnitude, v, rssi, snr, radio, _,
+         nh3_noise, temp_noise, hum_noise) = self._samples.take(step, num_points, origin)
+        spikes = np.where(codes == SPIKE, 100 + 600 * magnitude, 0.0)
+
+        dt_min = self.frequency / 60.0
+        temp_k = dt_min / self.temp_tau
+        hum_k = dt_min / self.hum_tau
+        targets = [self.sensors[k]._targets(timestamps) for k in self._profiles]
+        temp_targets = np.column_stack([t for t, _ in targets])[:, self._profile_index]
+        hum_targets = np.column_stack([h for _, h in targets])[:, self._profile_index]
+
+        # OU walk: sequential in time, vectorized across devices
+        temp_prev = np.empty(shape)
+        hum_prev = np.empty(shape)
+        temps = np.empty(shape)
+        hums = np.empty(shape)
+        for i in range(num_points):
+            temp_prev[i] = temp
+            hum_prev[i] = hum
+            temp = temp + np.clip((temp_targets[i] - temp) * temp_k + temp_noise[i],
+                                  -self.temp_max_step, self.temp_max_step)
+            hum = hum + np.clip((hum_targets[i] - hum) * hum_k + hum_noise[i],
+                                -self.hum_max_step, self.hum_max_step)
+            temps[i] = temp
+            hums[i] = hum
+
+        # nh3 uses the env state from before this step's update, as in AmmoniaSensor.generate_data
+        t = np.arange(step0, step0 + num_points)[:, None]
+        nh3 = self.base_nh3 + self.nh3_amp * np.sin(t / 96) + nh3_noise + spikes
+        nh3 *= 1 + 0.005 * (temp_prev - 28) + 0.002 * (hum_prev - 50)
+        nh3 = np.round(np.maximum(0.05, nh3), 3)
+
+        # multi-step events work on the reported values, after rounding, as in AmmoniaSensor
+        temps = np.round(np.clip(temps, 20, 40), 1)
+        hums = np.round(np.clip(hums, 20, 95), 1)
+        carry = np.stack([s._anomaly_carry for s in self.sensors])
+        keep, labels, carry = inject_events(codes, magnitude, v, radio, carry,
+                                            {"temperature": temps, "humidity": hums, "nh3": nh3}, self.drift_scales)
+        nh3 = np.round(np.maximum(0.05, nh3), 3)
+
+        seq0 = np.array([s.seqNumber for s in self.sensors])
+        seq = (seq0 + np.arange(num_points)[:, None]) % 65536
+        battery = np.array([s.battery for s in self.sensors], dtype=float)
+
+        # write the carried state back so the sensors stay usable on their own
+        for k, s in enumerate(self.sensors):
+            s._temp_state = float(temp[k])
+            s._hum_state = float(hum[k])
+            s._anomaly_carry = carry[k]
+            s.seqNumber = int((s.seqNumber + num_points) % 65536)
+            s._step = step + num_points
+
+        return drop_lost(build_frame("ammonia", {
+            "timestamp": np.repeat(timestamps, n),
+            "sensor_type": repeat_category("ammonia", n * num_points),
+            "devEUI": tile_categories(self.devEUI, num_points),
+            "battery": np.tile(battery, num_points),
+            "rssi": np.round(rssi, 1).ravel(),
+            "snr": np.round(snr, 1).ravel(),
+            "seqNumber": seq.ravel(),
+            "temperature": temps.ravel(),
+            "humidity": hums.ravel(),
+            "nh3": nh3.ravel(),
+            "anomaly_type": label_categories(labels)
+        }), keep)
@@ -1,14 +1,34 @@
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-from src.base_sensor import BaseSensor
+from datetime import datetime
+from src.anomalies import SPIKE, ZERO, drop_lost, fleet_drift_scales, inject_events, label_categories
+from src.base_sensor import BaseSensor, BlockSampler, lockstep_step, time_grid
+from src.profiles import load_profiles
+from src.schema import build_frame, repeat_category, tile_categories
+
+# locations with a built-in flow profile (configs/profiles.yaml) and spike multiplier
+LOCATIONS = ["toilet", "restaurant", "mall", "classroom"]
+
+# flow multiplier used for spike anomalies
+SPIKE_MULTIPLIER = {
+    "toilet": 5,
+    "restaurant": 3,
+    "mall": 2,
+    "classroom": 4
+}
 
 class PeopleCounterSensor(BaseSensor):
+    kind = "people_counter"
+    state_fields = BaseSensor.state_fields + ("current_occupancy", "cooldown_counter")
+    # spike and zero readings share anomaly_rate; drift only skews the reported occupancy
+    anomaly_weights = {"spike": 0.5, "zero": 0.5, "drift": 0.02, "stuck": 0.02, "dropout": 0.02}
+    anomaly_columns = ("period_in", "period_out", "current_occupancy")
+    battery_drain = False
 
     def __init__(self, devEUI=None, battery=100, seqNumber=0,
                  frequency=300, noise_level=0.5, anomaly_rate=0.01,
-                 location="toilet", seed=None):
+                 location="toilet", seed=None, profile=None, anomaly_weights=None):
         # location: 'toilet'(default), 'restaurant', 'mall', or 'classroom'
+        # profile: flow ranges (src.profiles.Profile); defaults to the location's profile in configs/profiles.yaml
 
         super().__init__(
             type=f"people_counter_{location}",
@@ -18,6 +38,7 @@ class PeopleCounterSensor(BaseSensor):
             frequency=frequency,
             noise_level=noise_level,
             anomaly_rate=anomaly_rate,
+            anomaly_weights=anomaly_weights,
             seed=seed
         )
 
@@ -30,6 +51,7 @@ class PeopleCounterSensor(BaseSensor):
             "mall": 200,
             "classroom": 30
         }.get(self.location, 10)
+        self.drift_scales = {"current_occupancy": 0.2 * self.max_capacity}
 
         self.cooldown_counter = 0  # for idle intervals
         self.activity_prob = {
@@ -39,62 +61,102 @@ class PeopleCounterSensor(BaseSensor):
             "classroom": 0.3    # short bursts, long idle gaps
         }.get(self.location, 0.5)
 
-    def _get_time_period(self, hour):
-        if 6 <= hour < 9:
-            return "morning_peak"
-        elif 12 <= hour < 14:
-            return "lunch"
-        elif 17 <= hour < 21:
-            return "evening_peak"
-        else:
-            return "off_hours"
-
-    def _people_flow_pattern(self, hour):
-
-        period = self._get_time_period(hour)
-
-        # base ranges by location & time
-        location_patterns = {
-            "toilet": {
-                "morning_peak": (0, 5),
-                "lunch": (0, 3),
-                "evening_peak": (0, 5),
-                "off_hours": (0, 1)
-            },
-            "restaurant": {
-                "morning_peak": (0, 5),
-                "lunch": (3, 10),
-                "evening_peak": (5, 15),
-                "off_hours": (0, 3)
-            },
-            "mall": {
-                "morning_peak": (0, 15),
-                "lunch": (5, 30),
-                "evening_peak": (10, 40),
-                "off_hours": (0, 10)
-            },
-            "classroom": {
-                "morning_peak": (0, 25),
-                "lunch": (0, 5),
-                "evening_peak": (0, 25),
-                "off_hours": (0, 3)
-            }
-        }
-
-        loc = self.location if self.location in location_patterns else "toilet"
-        low, high = location_patterns[loc][period]
-        return np.random.uniform(low, high)
+        # minute-resolution flow ranges, shared by every sensor at the same location
+        if profile is None:
+            profiles = load_profiles()
+            loc = self.location if self.location in profiles.names(self.kind) else "toilet"
+            profile = profiles.get(self.kind, loc)
+        self.profile = profile
 
-    def generate_data(self, duration_minutes=1440, start_time=None):
+    def _people_flow_pattern(self, low, high):
+        return self.rng.uniform(low, high)
+
+    def draw_values(self, rng, timestamps, draws):
+        # activity, flow and noise samples of one block (PeopleCounterFleet draws its devices' blocks here too)
+        n = len(timestamps)
+        flows = self.profile.lookup(timestamps, "flow")
+        low, high = flows[:, 0], flows[:, 1]
+        active = rng.random(n) < self.activity_prob
+        flow_in, flow_out = rng.poisson(rng.uniform(low, high, (2, n)))
+        idle_len = rng.integers(2, 6, n)  # 2–5 intervals of no movement
+        noise_in, noise_out = rng.normal(0, self.noise_level, (2, n))
+
+        # spike counts are only drawn for the readings that spike
+        codes, magnitude = draws[0], draws[1]
+        spike = np.flatnonzero(codes == SPIKE)
+        factor = SPIKE_MULTIPLIER.get(self.location, SPIKE_MULTIPLIER["toilet"]) * (0.5 + 0.5 * magnitude[spike])
+        anomaly_in = np.zeros(n, dtype=int)
+        anomaly_out = np.zeros(n, dtype=int)
+        if len(spike):
+            lam = rng.uniform(low[spike], high[spike], (2, len(spike))) * factor
+            anomaly_in[spike], anomaly_out[spike] = rng.poisson(np.maximum(1, lam))
+        return active, flow_in, flow_out, idle_len, noise_in, noise_out, anomaly_in, anomaly_out
+
+    def generate_values(self, step0, timestamps, draws, samples):
+        active, flow_in, flow_out, idle_len, noise_in, noise_out, anomaly_in, anomaly_out = samples
+        codes = draws[0]
+        anomaly = ((codes == SPIKE) | (codes == ZERO)).tolist()
+        # counts of an active and of a quiet reading; anomalies replace both and bypass the out <= occupancy guard
+        busy_in = np.maximum(0, np.rint(flow_in + noise_in)).astype(int).tolist()
+        busy_out = np.maximum(0, np.rint(flow_out + noise_out)).astype(int).tolist()
+        quiet_in = np.maximum(0, np.rint(noise_in)).astype(int).tolist()
+        quiet_out = np.maximum(0, np.rint(noise_out)).astype(int).tolist()
+        active, idle_len = active.tolist(), idle_len.tolist()
+        anomaly_in, anomaly_out = anomaly_in.tolist(), anomaly_out.tolist()
+
+        # only the cooldown/occupancy recurrence is sequential; it runs on plain ints
+        n = len(timestamps)
+        period_in, period_out, occupancies = [0] * n, [0] * n, [0] * n
+        cooldown, occupancy = int(self.cooldown_counter), int(self.current_occupancy)
+        for i in range(n):
+            if cooldown > 0:
+                cooldown -= 1
+                quiet = True
+            else:
+                quiet = not active[i]
+                cooldown = idle_len[i] if quiet else 0
+            if anomaly[i]:
+                p_in, p_out = anomaly_in[i], anomaly_out[i]
+            elif quiet:
+                p_in, p_out = quiet_in[i], min(quiet_out[i], occupancy)
+            else:
+                p_in, p_out = busy_in[i], min(busy_out[i], occupancy)
+            occupancy = max(0, min(occupancy + p_in - p_out, self.max_capacity))
+            period_in[i], period_out[i], occupancies[i] = p_in, p_out, occupancy
+        self.cooldown_counter, self.current_occupancy = cooldown, occupancy
+
+        return {"period_in": np.array(period_in, dtype=float), "period_out": np.array(period_out, dtype=float),
+                "current_occupancy": np.array(occupancies, dtype=float),
+                "location": repeat_category(self.location, n)}
+
+    def _round_values(self, columns):
+        return {name: np.maximum(0, np.rint(values)) if name in self.anomaly_columns else values
+                for name, values in columns.items()}
+
+    def generate_data(self, duration_minutes=1440, start_time=None, batched=False):
         if start_time is None:
             start_time = datetime.now()
 
         num_points = int((duration_minutes * 60) / self.frequency)
-        timestamps = [start_time + timedelta(seconds=i * self.frequency) for i in range(num_points)]
+        generate = self._generate_chunk_batched if batched else self._generate_chunk
+        return generate(start_time, num_points)
+
+    def _generate_chunk(self, start_time, num_points, step0=0):
+        # occupancy and cooldown live on the sensor, so consecutive chunks continue seamlessly
+        timestamps = time_grid(start_time, num_points, self.frequency)[0]
+        flows = self.profile.lookup(timestamps, "flow").tolist()  # [low, high] per reading
+        draws = self._draw_anomalies(num_points)
+        codes = draws[0].tolist()
+        multiplier = SPIKE_MULTIPLIER.get(self.location, SPIKE_MULTIPLIER["toilet"])
+        spike_factors = (multiplier * (0.5 + 0.5 * draws[1])).tolist()
 
-        data = []
-        for ts in timestamps:
-            hour = ts.hour
+        # readings go straight into arrays of the schema dtypes
+        seq = np.empty(num_points, dtype=np.uint16)
+        flow_in = np.empty(num_points, dtype=np.int16)
+        flow_out = np.empty(num_points, dtype=np.int16)
+        occupancy = np.empty(num_points, dtype=np.int16)
+        for i in range(num_points):
+            flow = flows[i]
             anomaly_triggered = False
             
             # burst activity logic
@@ -102,37 +164,28 @@ class PeopleCounterSensor(BaseSensor):
                 period_in = period_out = 0
                 self.cooldown_counter -= 1
             else:
-                if np.random.random() < self.activity_prob:
+                if self.rng.random() < self.activity_prob:
                     # active; generate normally
-                    period_in = np.random.poisson(self._people_flow_pattern(hour))
-                    period_out = np.random.poisson(self._people_flow_pattern(hour))
+                    period_in = self.rng.poisson(self._people_flow_pattern(*flow))
+                    period_out = self.rng.poisson(self._people_flow_pattern(*flow))
                 else:
                     # inactivity
-                    self.cooldown_counter = np.random.randint(2, 6)  # 2–5 intervals of no movement
+                    self.cooldown_counter = self.rng.integers(2, 6)  # 2–5 intervals of no movement
                     period_in = period_out = 0
             period_in = max(0, period_in)
             period_out = max(0, period_out)
 
-            period_in = max(0, int(round(period_in + np.random.normal(0, self.noise_level))))
-            period_out = max(0, int(round(period_out + np.random.normal(0, self.noise_level))))
+            period_in = max(0, int(round(period_in + self.rng.normal(0, self.noise_level))))
+            period_out = max(0, int(round(period_out + self.rng.normal(0, self.noise_level))))
 
-            # anomalies
-            if np.random.random() < self.anomaly_rate:
+            # anomalies (drawn for the whole chunk up front)
+            if codes[i] == SPIKE:
                 anomaly_triggered = True
-                anomaly_type = np.random.choice(["spike", "zero"])
-                if anomaly_type == "spike":
-                    multiplier = {
-                        "toilet": 5,
-                        "restaurant": 3,
-                        "mall": 2,
-                        "classroom": 4
-                    }[self.location]
-                    lam_in = max(1, self._people_flow_pattern(hour) * np.random.uniform(multiplier/2, multiplier))
-                    lam_out = max(1, self._people_flow_pattern(hour) * np.random.uniform(multiplier/2, multiplier))
-                    period_in = np.random.poisson(lam_in)
-                    period_out = np.random.poisson(lam_out)
-                else: # zero
-                    period_in, period_out = 0, 0
+                period_in = self.rng.poisson(max(1, self._people_flow_pattern(*flow) * spike_factors[i]))
+                period_out = self.rng.poisson(max(1, self._people_flow_pattern(*flow) * spike_factors[i]))
+            elif codes[i] == ZERO:
+                anomaly_triggered = True
+                period_in, period_out = 0, 0
 
             # prevent out > current occupancy unless anomaly
             if not anomaly_triggered and not np.isnan(period_out):
@@ -143,20 +196,142 @@ class PeopleCounterSensor(BaseSensor):
                 self.current_occupancy += period_in - period_out
                 self.current_occupancy = max(0, min(self.current_occupancy, self.max_capacity))
 
-            record = {
-                "timestamp": ts,
-                "sensor_type": self.type,
-                "devEUI": self.devEUI,
-                "battery": self.battery,
-                "rssi": round(self._random_rssi(), 1),
-                "snr": round(self._random_snr(), 1),
-                "seqNumber": self.seqNumber,
-                "period_in": int(period_in) if not np.isnan(period_in) else np.nan,
-                "period_out": int(period_out) if not np.isnan(period_out) else np.nan,
-                "current_occupancy": int(self.current_occupancy),
-                "location": self.location
-            }
+            seq[i] = self.seqNumber
+            flow_in[i] = period_in
+            flow_out[i] = period_out
+            occupancy[i] = self.current_occupancy
             self._increment_seq()
-            data.append(record)
 
-        return pd.DataFrame(data)
+        # stuck/drift change what the sensor reports, not the occupancy it tracks
+        reported = {"period_in": flow_in.astype(float), "period_out": flow_out.astype(float),
+                    "current_occupancy": occupancy.astype(float)}
+        keep, labels = self._inject_events(draws, reported)
+        return drop_lost(build_frame(self.kind, {
+            "timestamp": timestamps,
+            "sensor_type": repeat_category(self.type, num_points),
+            "devEUI": repeat_category(self.devEUI, num_points),
+            "battery": np.full(num_points, self.battery, dtype=np.float32),
+            "rssi": np.round(draws[3], 1),
+            "snr": np.round(draws[4], 1),
+            "seqNumber": seq,
+            **self._round_values(reported),
+            "location": repeat_category(self.location, num_points),
+            "anomaly_type": labels
+        }), keep)
+
+
+class PeopleCounterFleet:
+    """
+    Runs many PeopleCounterSensor devices in lockstep, across mixed locations.
+    Each device's samples come from its own sensor; capacities live in an array
+    and only the cooldown/occupancy recurrence loops over time.
+    """
+
+    def __init__(self, sensors):
+        self.sensors = list(sensors)
+        if not self.sensors:
+            raise ValueError("PeopleCounterFleet needs at least one sensor")
+
+        frequencies = {s.frequency for s in self.sensors}
+        if len(frequencies) != 1:
+            raise ValueError(f"All sensors in a fleet must share one frequency, got {sorted(frequencies)}")
+        self.frequency = frequencies.pop()
+
+        # per-device parameters
+        self.devEUI = np.array([s.devEUI for s in self.sensors])
+        self.sensor_type = np.array([s.type for s in self.sensors])
+        self.location = np.array([s.location for s in self.sensors])
+        self.max_capacity = np.array([s.max_capacity for s in self.sensors])
+        self.drift_scales = fleet_drift_scales(self.sensors)
+        self._samples = BlockSampler(self._draw_block)
+
+    @classmethod
+    def create(cls, locations, **kwargs):
+        """Build one PeopleCounterSensor per entry in locations (kwargs go to each sensor)."""
+        return cls([PeopleCounterSensor(location=loc, **kwargs) for loc in locations])
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def _draw_block(self, block, origin):
+        # each device's block is drawn by the sensor itself, as its batched path draws it (see
+        # BaseSensor._draw_batch_block), so a fleet of one matches generate_data(batched=True)
+        draws = [s._draw_batch_block(block, origin) for s in self.sensors]
+        return tuple(np.column_stack(columns) for columns in zip(*draws))
+
+    def generate_data(self, duration_minutes=1440, start_time=None):
+        """Generate readings for every device; rows are ordered by timestamp, then device."""
+        if start_time is None:
+            start_time = datetime.now()
+        num_points = int((duration_minutes * 60) / self.frequency)
+        return self._generate_chunk(start_time, num_points)
+
+    iter_chunks = BaseSensor.iter_chunks
+
+    def _generate_chunk(self, start_time, num_points, step0=0):
+        # occupancy and cooldown carry over between chunks through the sensors' own state
+        n = len(self.sensors)
+        timestamps = time_grid(start_time, num_points, self.frequency)[0]
+        shape = (num_points, n)
+
+        step = lockstep_step(self.sensors)
+        origin = timestamps[0] - np.timedelta64(step * self.frequency, "s") if num_points else None
+        (codes, magnitude, v, rssi, snr, radio, _,
+         active, flow_in, flow_out, idle_len, noise_in, noise_out, anomaly_in, anomaly_out) = self._samples.take(step, num_points, origin)
+        anomaly = (codes == SPIKE) | (codes == ZERO)
+
+        cooldown = np.array([s.cooldown_counter for s in self.sensors])
+        occupancy = np.array([s.current_occupancy for s in self.sensors])
+        period_in = np.empty(shape, dtype=int)
+        period_out = np.empty(shape, dtype=int)
+        occupancies = np.empty(shape, dtype=int)
+
+        for i in range(num_points):
+            # burst activity logic
+            cooling = cooldown > 0
+            going_idle = ~cooling & ~active[i]
+            quiet = cooling | going_idle
+            cooldown = np.where(cooling, cooldown - 1, np.where(going_idle, idle_len[i], 0))
+
+            p_in = np.maximum(0, np.rint(np.where(quiet, 0, flow_in[i]) + noise_in[i])).astype(int)
+            p_out = np.maximum(0, np.rint(np.where(quiet, 0, flow_out[i]) + noise_out[i])).astype(int)
+
+            # anomalies bypass the out <= occupancy guard
+            p_in = np.where(anomaly[i], anomaly_in[i], p_in)
+            p_out = np.where(anomaly[i], anomaly_out[i], np.minimum(p_out, occupancy))
+
+            occupancy = np.clip(occupancy + p_in - p_out, 0, self.max_capacity)
+            period_in[i] = p_in
+            period_out[i] = p_out
+            occupancies[i] = occupancy
+
+        battery = np.array([s.battery for s in self.sensors], dtype=float)
+        seq0 = np.array([s.seqNumber for s in self.sensors])
+        seq = (seq0 + np.arange(num_points)[:, None]) % 65536
+
+        # stuck/drift change what the sensors report, not the occupancy they track
+        reported = {"period_in": period_in.astype(float), "period_out": period_out.astype(float),
+                    "current_occupancy": occupancies.astype(float)}
+        carry = np.stack([s._anomaly_carry for s in self.sensors])
+        keep, labels, carry = inject_events(codes, magnitude, v, radio, carry, reported, self.drift_scales)
+
+        # write the carried state back so the sensors stay usable on their own
+        for k, s in enumerate(self.sensors):
+            s.cooldown_counter = int(cooldown[k])
+            s.current_occupancy = int(occupancy[k])
+            s._anomaly_carry = carry[k]
+            s.seqNumber = int((s.seqNumber + num_points) % 65536)
+            s._step = step + num_points
+
+        return drop_lost(build_frame("people_counter", {
+            "timestamp": np.repeat(timestamps, n),
+            "sensor_type": tile_categories(self.sensor_type, num_points),
+            "devEUI": tile_categories(self.devEUI, num_points),
+            "battery": np.tile(battery, num_points),
+            "rssi": np.round(rssi, 1).ravel(),
+            "snr": np.round(snr, 1).ravel(),
+            "seqNumber": seq.ravel(),
+            **{name: np.maximum(0, np.rint(values)).ravel() for name, values in reported.items()},
+            "location": tile_categories(self.location, num_points),
+            "anomaly_type": label_categories(labels)
+        }), keep)
@@ -0,0 +1,455 @@
+import os
+import glob
+import heapq
+import pandas as pd
+
+from src.schema import COLUMN_DTYPES, concat_frames, restore_dtypes
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Feather output needs pyarrow (pip install pyarrow)") from e
+
+
+def _stable_schema(schema, dictionaries=True):
+    # pandas categoricals map to dictionary columns whose index width follows the number of
+    # categories; widen it once so later chunks with more categories still fit the file schema.
+    # Arrow IPC files can't change a dictionary between batches, so there they are stored as plain strings
+    import pyarrow as pa
+
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()) if dictionaries else pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class BaseExporter:
+    """
+    Writes simulator frames to one output file.
+    Frames can be streamed in with write() (e.g. one per chunk); close() finalises the file.
+    With append=True, frames go after the rows already in an existing output instead of replacing it.
+    """
+    extension = ""
+
+    def __init__(self, path, compression=None, append=False):
+        # path is given without extension; the exporter adds its own
+        self.compression = compression
+        self.path = path + self.extension
+        self.append = append and os.path.exists(self.path)
+        self.rows_written = 0
+        # size of the output this one appends to, so bytes_written counts only what this exporter adds
+        self.bytes_before = output_size(self.path) if self.append else 0
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def write(self, df):
+        self._write(df)
+        self.rows_written += len(df)
+
+    def _write(self, df):
+        raise NotImplementedError("Exporters must implement _write()")
+
+    @property
+    def bytes_written(self):
+        """Bytes this exporter added to its output (read once it is closed)."""
+        size = output_size(self.path) if os.path.exists(self.path) else 0
+        return size - self.bytes_before
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvExporter(BaseExporter):
+    extension = ".csv"
+
+    def __init__(self, path, compression=None, append=False):
+        if compression == "gzip":
+            self.extension = ".csv.gz"
+        super().__init__(path, compression, append)
+        self._first = not self.append
+
+    def _write(self, df):
+        # appended gzip members are still a valid gzip stream
+        df.to_csv(self.path, mode="w" if self._first else "a", header=self._first,
+                  index=False, compression=self.compression)
+        self._first = False
+
+
+class ParquetExporter(BaseExporter):
+    extension = ".parquet"
+
+    def __init__(self, path, compression="snappy", append=False):
+        _require_pyarrow()
+        super().__init__(path, compression or "none", append)
+        self._writer = None
+        self._schema = None
+
+    def _open_appending(self):
+        # a Parquet file can't be extended in place: its row groups are copied into a new file
+        # (no decoding of the data pages' values into pandas) that replaces it on close()
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(self.path) as existing:
+            self._schema = existing.schema_arrow
+            self._writer = pq.ParquetWriter(self.path + ".tmp", self._schema, compression=self.compression)
+            for i in range(existing.num_row_groups):
+                self._writer.write_table(existing.read_row_group(i))
+
+    def _write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None and self.append:
+            self._open_appending()
+        # the first frame fixes the schema; later chunks are cast onto it
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = _stable_schema(table.schema)
+            table = table.cast(self._schema)
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=self.compression)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            if self.append:
+                os.replace(self.path + ".tmp", self.path)
+
+
+class FeatherExporter(BaseExporter):
+    """Arrow IPC file (Feather v2) output."""
+    extension = ".feather"
+
+    def __init__(self, path, compression="lz4", append=False):
+        _require_pyarrow()
+        super().__init__(path, compression, append)
+        self._sink = None
+        self._writer = None
+        self._schema = None
+
+    def _open(self, path, schema):
+        import pyarrow as pa
+
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        self._sink = pa.OSFile(path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+        self._schema = schema
+
+    def _open_appending(self):
+        # IPC files end in a footer, so appending means copying the record batches into a new file
+        import pyarrow as pa
+
+        with pa.memory_map(self.path) as source:
+            existing = pa.ipc.open_file(source)
+            self._open(self.path + ".tmp", existing.schema)
+            for i in range(existing.num_record_batches):
+                self._writer.write_batch(existing.get_batch(i))
+
+    def _write(self, df):
+        import pyarrow as pa
+
+        if self._writer is None and self.append:
+            self._open_appending()
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._open(self.path, _stable_schema(table.schema, dictionaries=False))
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = self._sink = None
+            if self.append:
+                os.replace(self.path + ".tmp", self.path)
+
+
+class TeeExporter(BaseExporter):
+    """Writes every frame to several exporters; path is the first one's."""
+
+    def __init__(self, *exporters):
+        self.exporters = exporters
+        self.path = exporters[0].path
+        self.append = exporters[0].append
+        self.bytes_before = exporters[0].bytes_before
+        self.rows_written = 0
+
+    def _write(self, df):
+        for exporter in self.exporters:
+            exporter.write(df)
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+
+EXPORTERS = {
+    "csv": CsvExporter,
+    "parquet": ParquetExporter,
+    "feather": FeatherExporter,
+    "arrow": FeatherExporter,
+}
+
+
+class PartitionedExporter(BaseExporter):
+    """
+    Splits rows into hive-style partition directories, e.g.
+    <path>/sensor_type=ammonia/date=2025-01-01/part-0.parquet
+    Partition keys are any column name, plus "date" (taken from timestamp).
+    Partition columns stay in the data files, so each part file is self-contained.
+    Appending adds a new part-N file next to a partition's existing parts.
+    """
+
+    def __init__(self, path, output_format="csv", partition_by=("sensor_type", "date"), compression=None,
+                 append=False):
+        super().__init__(path, compression, append)
+        self.exporter_class = EXPORTERS[output_format]
+        self.partition_by = list(partition_by)
+        self._parts = {}
+
+    def _keys(self, df):
+        return [df["timestamp"].dt.strftime("%Y-%m-%d") if key == "date" else df[key].astype(str)
+                for key in self.partition_by]
+
+    def _write(self, df):
+        if df.empty:
+            return
+        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            df = df.assign(timestamp=pd.to_datetime(df["timestamp"]))
+        for values, part in df.groupby(self._keys(df), sort=False):
+            values = values if isinstance(values, tuple) else (values,)
+            if values not in self._parts:
+                subdir = os.path.join(self.path, *(f"{k}={v}" for k, v in zip(self.partition_by, values)))
+                kwargs = {"compression": self.compression} if self.compression else {}
+                n = len(part_files(subdir)) if self.append else 0
+                self._parts[values] = self.exporter_class(os.path.join(subdir, f"part-{n}"), **kwargs)
+            self._parts[values].write(part)
+
+    def close(self):
+        for exporter in self._parts.values():
+            exporter.close()
+        self._parts = {}
+
+
+def get_exporter(path, output_format="csv", partition_by=None, compression=None, append=False):
+    """Build an exporter for path (without extension) in the given format."""
+    if output_format not in EXPORTERS:
+        raise ValueError(f"Unknown output format: {output_format} (expected one of {sorted(EXPORTERS)})")
+    if partition_by:
+        return PartitionedExporter(path, output_format, partition_by, compression, append)
+    kwargs = {"compression": compression} if compression else {}
+    return EXPORTERS[output_format](path, append=append, **kwargs)
+
+
+def _part_number(path):
+    name = os.path.basename(path)[len("part-"):].split(".")[0]
+    return int(name) if name.isdigit() else -1
+
+
+def part_files(path):
+    """Part files under a partition directory, each partition's parts in write order (part-2 before part-10)."""
+    parts = glob.glob(os.path.join(path, "**", "part-*"), recursive=True)
+    return sorted(parts, key=lambda p: (os.path.dirname(p), _part_number(p), p))
+
+
+def export_frame(df, path, output_format="csv", partition_by=None, compression=None):
+    """Write a single DataFrame and return the path it was written to."""
+    with get_exporter(path, output_format, partition_by, compression) as exporter:
+        exporter.write(df)
+    return exporter.path
+
+
+def find_output(output_dir, name):
+    """
+    Locate the output written for name in any supported format (or as a partition directory).
+    A run in another format leaves the old file behind, so the most recently written one wins.
+    """
+    candidates = [os.path.join(output_dir, name + ext) for ext in (".parquet", ".feather", ".csv", ".csv.gz")]
+    candidates = [path for path in candidates if os.path.exists(path)]
+    path = os.path.join(output_dir, name)
+    if os.path.isdir(path):
+        candidates.append(path)
+    # max() keeps the first of equally new candidates, so ties still prefer parquet
+    return max(candidates, key=output_mtime, default=None)
+
+
+def output_mtime(path):
+    """Last modification time of an output file, or of the newest part in a partition directory."""
+    if os.path.isdir(path):
+        return max((os.path.getmtime(p) for p in part_files(path)), default=os.path.getmtime(path))
+    return os.path.getmtime(path)
+
+
+def output_size(path):
+    """Bytes on disk of an output file, or of all parts in a partition directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(p) for p in part_files(path))
+    return os.path.getsize(path)
+
+
+def output_columns(path):
+    """Column names stored in a single output file, read from its header/schema only."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if path.endswith(".feather"):
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _csv_dtypes(path):
+    # CSV has no types: parse labels as categoricals and measurements as float32 directly;
+    # integer columns may have gaps, so restore_dtypes() settles those after parsing
+    return {c: COLUMN_DTYPES[c] for c in output_columns(path)
+            if c in COLUMN_DTYPES and COLUMN_DTYPES[c] in ("category", "float32")}
+
+
+def read_output(path, columns=None):
+    """Read an exporter output back into a DataFrame, restoring timestamps for CSV."""
+    if os.path.isdir(path):
+        parts = part_files(path)
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return concat_frames([read_output(p, columns) for p in parts], ignore_index=True)
+    if columns is not None:
+        # columns that this output doesn't have (e.g. nh3 in a people counter file) are skipped
+        available = set(output_columns(path))
+        columns = [c for c in columns if c in available]
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    if path.endswith(".feather"):
+        return restore_dtypes(pd.read_feather(path, columns=columns))
+    df = pd.read_csv(path, usecols=columns, dtype=_csv_dtypes(path))
+    # ISO8601 also takes the date-only values to_csv writes for a block that is all midnight
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    return restore_dtypes(df)
+
+
+def iter_output_chunks(path, chunk_rows=100_000, columns=None):
+    """Stream an exporter output back as DataFrames of roughly chunk_rows rows, in file order."""
+    if os.path.isdir(path):
+        for part in part_files(path):
+            yield from iter_output_chunks(part, chunk_rows, columns)
+        return
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    if path.endswith(".feather"):
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                yield restore_dtypes((batch.select(columns) if columns else batch).to_pandas())
+        return
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=_csv_dtypes(path)):
+        if "timestamp" in chunk.columns:
+            chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], format="ISO8601")
+        yield restore_dtypes(chunk)
+
+
+def iter_sorted_chunks(path, chunk_rows=100_000, columns=None, key="timestamp"):
+    """
+    Stream an output back in key order. Single files already are (outputs are written in time order);
+    a partition directory's parts are each sorted but split by e.g. sensor type, so they are k-way merged.
+    """
+    if os.path.isdir(path):
+        return merge_sorted([iter_output_chunks(part, chunk_rows, columns) for part in part_files(path)], key)
+    return iter_output_chunks(path, chunk_rows, columns)
+
+
+def iter_frame_chunks(df, chunk_rows=100_000):
+    """Slice an in-memory DataFrame into a stream of chunks (views, no copies)."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+# empty categorical for label columns that none of a block's rows have
+_NO_LABELS = pd.CategoricalDtype(pd.Index([], dtype=object))
+
+
+def merge_sorted(streams, key="timestamp"):
+    """
+    k-way merge of DataFrame streams that are each already sorted by key.
+    A heap orders the streams by the last key in their buffered chunk. Every row up to the
+    smallest of those keys (the watermark) is final, so it is emitted straight away and
+    memory stays at about one chunk per stream. Ties keep stream order: a stream whose buffer
+    ends at the watermark reads its next chunk first, since that may hold more rows at the same key.
+    Yields sorted DataFrames that all share the union of the streams' columns.
+    """
+    streams = [iter(stream) for stream in streams]
+    buffers = {}
+    heap = []
+    live = set()  # streams in the heap, i.e. not exhausted yet
+
+    def extend(i):
+        # appends stream i's next non-empty chunk to its buffer; an exhausted stream leaves the heap
+        for chunk in streams[i]:
+            if len(chunk):
+                buffers[i] = concat_frames([buffers[i], chunk], ignore_index=True) if i in buffers else chunk
+                heapq.heappush(heap, (chunk[key].iloc[-1], i))
+                live.add(i)
+                return
+
+    for i in range(len(streams)):
+        extend(i)
+
+    # union of columns in stream order; columns some streams lack become NaN there, so numeric
+    # ones get a float dtype up front (float32 for float32 and small ints) and labels stay categorical
+    # (a block of only the streams without them would otherwise get all-NaN floats), to keep every block on one schema
+    columns = list(dict.fromkeys(c for i in sorted(buffers) for c in buffers[i].columns))
+    partial = {}
+    for c in columns:
+        dtypes = [buf[c].dtype for buf in buffers.values() if c in buf.columns]
+        if len(dtypes) == len(buffers):
+            continue
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            partial[c] = _NO_LABELS
+        elif all(pd.api.types.is_numeric_dtype(d) for d in dtypes):
+            small = all(d == "float32" or (pd.api.types.is_integer_dtype(d) and d.itemsize <= 2) for d in dtypes)
+            partial[c] = "float32" if small else "float64"
+
+    while buffers:
+        watermark = heap[0][0] if heap else None
+        while heap and heap[0][0] == watermark:
+            _, i = heapq.heappop(heap)
+            live.discard(i)
+            extend(i)
+        parts = []
+        for i in sorted(buffers):
+            buf = buffers[i]
+            # once every stream is exhausted, whatever is buffered is final
+            cut = buf[key].searchsorted(watermark, side="right") if heap else len(buf)
+            if cut:
+                parts.append(buf.iloc[:cut])
+                buffers[i] = buf.iloc[cut:]
+            if not len(buffers[i]) and i not in live:
+                del buffers[i]
+        if not parts:
+            continue
+        block = concat_frames(parts, ignore_index=True).reindex(columns=columns)
+        for c, dtype in partial.items():
+            if dtype is _NO_LABELS:
+                if not isinstance(block[c].dtype, pd.CategoricalDtype):
+                    block[c] = block[c].astype(dtype)
+            elif block[c].dtype != dtype:
+                block[c] = block[c].astype(dtype)
+        yield block.sort_values(key, kind="stable", ignore_index=True)
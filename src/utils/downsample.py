@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: pick n_out of the points (x, y) that keep the visual shape
+    of the line. The first and last points are always kept; each bucket in between contributes
+    the point forming the largest triangle with the previous pick and the next bucket's mean.
+    Returns sorted positional indices.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    edges = np.append(edges, n)  # the last "next bucket" is just the final point
+    picks = np.empty(n_out, dtype=int)
+    picks[0], picks[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2]
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax()) if hi > lo else lo
+        picks[i + 1] = a
+    return picks
+
+
+def minmax_indices(y, n_out):
+    """Keep the min and max of each of n_out // 2 equal buckets (good for spiky or bar data)."""
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    picks = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        segment = y[lo:hi]
+        picks += [lo + int(segment.argmin()), lo + int(segment.argmax())]
+    return np.unique(picks)
+
+
+def downsample(df, x, y, n_out=2000, by=None, method="lttb"):
+    """
+    Reduce df to about n_out rows per series before plotting.
+    y may be one column or several (the union of each column's picks is kept);
+    by splits the frame into separately downsampled series (e.g. the plot's colour column).
+    Rows are assumed sorted by x.
+    """
+    ys = [y] if isinstance(y, str) else list(y)
+    if len(df) <= n_out:
+        return df
+    if by is not None:
+        parts = [downsample(part, x, ys, n_out, None, method) for _, part in df.groupby(by, sort=False, observed=True)]
+        return pd.concat(parts) if parts else df
+
+    xs = df[x]
+    xs = xs.astype("int64") if pd.api.types.is_datetime64_any_dtype(xs) else xs
+    keep = []
+    for col in ys:
+        valid = np.flatnonzero(df[col].notna().to_numpy())
+        if not len(valid):
+            continue
+        values = df[col].to_numpy(dtype=float)[valid]
+        if method == "minmax":
+            picks = minmax_indices(values, n_out)
+        else:
+            picks = lttb_indices(xs.to_numpy()[valid], values, n_out)
+        keep.append(valid[picks])
+    if not keep:
+        return df.iloc[:0]
+    return df.iloc[np.unique(np.concatenate(keep))]
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from src.schema import build_frame
+from src.sensors.people_counter import LOCATIONS
+
+# Fixed-layout binary uplink frames, big-endian and packed like real device payloads.
+# Every frame starts with the same header; measurements are stored as scaled integers
+# (e.g. rssi in 0.1 dBm), so values at the simulator's own rounding survive a round trip.
+# Timestamps are whole unix seconds.
+
+HEADER = [
+    ("frame_type", "u1"),
+    ("devEUI", ">u8"),
+    ("seqNumber", ">u2"),
+    ("time", ">u4"),
+    ("battery", ">u2"),   # 0.01 %
+    ("rssi", ">i2"),      # 0.1 dBm
+    ("snr", ">i2"),       # 0.1 dB
+]
+
+FRAME_TYPES = {"ammonia": 1, "people_counter": 2}
+
+AMMONIA_FRAME = np.dtype(HEADER + [
+    ("temperature", ">i2"),  # 0.1 °C
+    ("humidity", ">u2"),     # 0.1 %RH
+    ("nh3", ">u4"),          # 0.001 ppm
+])
+
+PEOPLE_COUNTER_FRAME = np.dtype(HEADER + [
+    ("location", "u1"),
+    ("period_in", ">u2"),
+    ("period_out", ">u2"),
+    ("current_occupancy", ">u2"),
+])
+
+FRAMES = {"ammonia": AMMONIA_FRAME, "people_counter": PEOPLE_COUNTER_FRAME}
+
+# column -> scale factor for the fixed-point fields
+SCALES = {
+    "battery": 100,
+    "rssi": 10,
+    "snr": 10,
+    "temperature": 10,
+    "humidity": 10,
+    "nh3": 1000,
+}
+
+# integer fields filled straight from the column of the same name
+COUNTS = ("seqNumber", "period_in", "period_out", "current_occupancy")
+
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_NIBBLE = np.zeros(256, dtype=np.uint64)
+_NIBBLE[_HEX] = np.arange(16, dtype=np.uint64)
+_NIBBLE[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16, dtype=np.uint64)
+_SHIFTS = np.arange(60, -1, -4, dtype=np.uint64)
+
+
+_IS_HEX = np.zeros(256, dtype=bool)
+_IS_HEX[np.frombuffer(b"0123456789abcdefABCDEF", dtype=np.uint8)] = True
+
+
+def devEUI_to_int(devEUIs):
+    """Vectorized hex devEUI strings -> uint64; ValueError for anything but 16 hex digits."""
+    # one byte more than a devEUI: shorter strings end in zero padding, longer ones don't
+    ascii_codes = np.asarray(devEUIs, dtype="S17").view(np.uint8).reshape(-1, 17)
+    bad = (ascii_codes[:, 16] != 0) | ~_IS_HEX[ascii_codes[:, :16]].all(axis=1)
+    if bad.any():
+        raise ValueError(f"devEUI must be 16 hex digits, got {str(np.asarray(devEUIs)[np.flatnonzero(bad)[0]])!r}")
+    return np.bitwise_or.reduce(_NIBBLE[ascii_codes[:, :16]] << _SHIFTS, axis=1)
+
+
+def int_to_devEUI(values):
+    """Vectorized uint64 -> 16-char lowercase hex devEUI strings."""
+    values = np.asarray(values, dtype=np.uint64)
+    nibbles = (values[:, None] >> _SHIFTS) & np.uint64(0xF)
+    return _HEX[nibbles].view("S16").ravel().astype(str)
+
+
+def frame_kind(sensor_type):
+    return "people_counter" if sensor_type.startswith("people_counter") else sensor_type
+
+
+def _devEUI_column(column):
+    # generated frames hold devEUI as a categorical: convert each device's label once
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        if (codes < 0).any():
+            raise ValueError("devEUI is missing from some readings")
+        return devEUI_to_int(column.cat.categories.to_numpy())[codes]
+    return devEUI_to_int(column.to_numpy())
+
+
+def _fit(name, values, field_dtype, scale=1):
+    # scaled column values as the field's integer type; ValueError for readings the field can't hold
+    # (frames would otherwise wrap them around silently); NaN fails the range test too
+    info = np.iinfo(field_dtype)
+    scaled = np.rint(values * scale) if scale != 1 else values
+    bad = ~((scaled >= info.min) & (scaled <= info.max))
+    if bad.any():
+        raise ValueError(f"{name} = {values[np.flatnonzero(bad)[0]]} is outside the frame's range "
+                         f"[{info.min / scale:g}, {info.max / scale:g}]")
+    return scaled
+
+
+def encode(df, kind=None):
+    """
+    Encode a batch of readings (one sensor kind) into contiguous fixed-size frames.
+    Returns bytes; frame i is buf[i * itemsize:(i + 1) * itemsize].
+    """
+    if kind is None:
+        kinds = {frame_kind(t) for t in df["sensor_type"].unique()}
+        if len(kinds) != 1:
+            raise ValueError(f"encode() needs readings of a single sensor kind, got {sorted(kinds)}")
+        kind = kinds.pop()
+    if kind not in FRAMES:
+        raise ValueError(f"No payload layout for sensor kind: {kind}")
+
+    dtype = FRAMES[kind]
+    columns = ["timestamp", *(name for name in dtype.names if name not in ("frame_type", "time"))]
+    missing = [name for name in columns if name not in df.columns]
+    if missing:
+        raise ValueError(f"{kind} frames need columns {missing}")
+
+    frames = np.zeros(len(df), dtype=dtype)
+    frames["frame_type"] = FRAME_TYPES[kind]
+    frames["devEUI"] = _devEUI_column(df["devEUI"])
+    seconds = df["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    frames["time"] = _fit("timestamp", seconds, dtype["time"])
+    for name in dtype.names:
+        if name in SCALES:
+            frames[name] = _fit(name, df[name].to_numpy(dtype=float), dtype[name], SCALES[name])
+        elif name in COUNTS:
+            frames[name] = _fit(name, df[name].to_numpy(dtype=float), dtype[name])
+    if kind == "people_counter":
+        codes = pd.Index(LOCATIONS).get_indexer(df["location"])
+        if (codes < 0).any():
+            raise ValueError(f"location {str(df['location'].to_numpy()[np.flatnonzero(codes < 0)[0]])!r} has no "
+                             f"payload code (known: {LOCATIONS})")
+        frames["location"] = codes
+    return frames.tobytes()
+
+
+def decode(buf, kind):
+    """Decode contiguous frames produced by encode() back into a reading DataFrame."""
+    if kind not in FRAMES:
+        raise ValueError(f"No payload layout for sensor kind: {kind}")
+    dtype = FRAMES[kind]
+    if len(buf) % dtype.itemsize:
+        raise ValueError(f"Buffer length {len(buf)} is not a multiple of the {kind} frame size {dtype.itemsize}")
+    frames = np.frombuffer(buf, dtype=dtype)
+    if len(frames) and not (frames["frame_type"] == FRAME_TYPES[kind]).all():
+        raise ValueError(f"Buffer contains frames that are not {kind} frames")
+
+    if kind == "people_counter":
+        if len(frames) and frames["location"].max() >= len(LOCATIONS):
+            raise ValueError(f"Buffer contains unknown location code {frames['location'].max()}")
+        location = np.array(LOCATIONS)[frames["location"]]
+        sensor_type = np.char.add("people_counter_", location)
+    else:
+        sensor_type = kind
+
+    data = {
+        "timestamp": frames["time"].astype("datetime64[s]").astype("datetime64[ns]"),
+        "sensor_type": sensor_type,
+        "devEUI": int_to_devEUI(frames["devEUI"]),
+    }
+    for name in dtype.names:
+        if name in ("frame_type", "devEUI", "time"):
+            continue
+        if name == "location":
+            data[name] = location
+        elif name in SCALES:
+            data[name] = frames[name] / SCALES[name]
+        else:
+            data[name] = frames[name]
+
+    # same schema and column order as the generated frames
+    return build_frame(kind, data)
@@ -0,0 +1,168 @@
+import os
+import numpy as np
+import pandas as pd
+
+from src.registry import DEVICES_NAME, DeviceRegistry
+from src.rollups import GRANULARITIES, LEVELS, METRICS, aggregate, combine, find_rollup, read_rollup
+from src.schema import concat_frames
+from src.utils.data_export import find_output, output_mtime, part_files, read_output
+
+
+def _partition_value(part_path, key):
+    for piece in part_path.split(os.sep):
+        if piece.startswith(key + "="):
+            return piece[len(key) + 1:]
+    return None
+
+
+def _parquet_row_groups(pf, sensor_types):
+    # row groups whose sensor_type [min, max] statistics can hold one of sensor_types (None: read them all)
+    names = [pf.metadata.schema.column(i).name for i in range(pf.metadata.num_columns)]
+    if "sensor_type" not in names:
+        return None
+    col = names.index("sensor_type")
+    keep = []
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(col).statistics
+        if stats is None or not stats.has_min_max or any(stats.min <= t <= stats.max for t in sensor_types):
+            keep.append(i)
+    return keep
+
+
+def scan(path, columns=None, sensor_types=None):
+    """
+    Read an output with predicate pushdown: only `columns` are read, partition directories are pruned
+    by their sensor_type=... key and Parquet row groups by their sensor_type statistics.
+    Pruning is coarse (whole partitions / row groups), so rows are filtered exactly afterwards.
+    Hours of day aren't pushed down: every date partition and row group spans all of them. They are
+    selected in memory, from the IndexedFrame the store builds once per file.
+    """
+    if columns is not None and sensor_types is not None:
+        columns = list(dict.fromkeys(list(columns) + ["sensor_type"]))
+
+    if os.path.isdir(path):
+        parts = part_files(path)
+        if sensor_types is not None:
+            parts = [p for p in parts if _partition_value(p, "sensor_type") in (None, *sensor_types)]
+        frames = [scan(p, columns, sensor_types) for p in parts]
+        return concat_frames(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    if path.endswith(".parquet") and sensor_types is not None:
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [c for c in columns if c in pf.schema_arrow.names]
+        groups = _parquet_row_groups(pf, sensor_types)
+        df = (pf.read(columns=columns) if groups is None else pf.read_row_groups(groups, columns=columns)).to_pandas()
+    else:
+        df = read_output(path, columns)
+
+    if sensor_types is None or df.empty:
+        return df
+    mask = df["sensor_type"].isin(sensor_types).to_numpy()
+    return df if mask.all() else df[mask].reset_index(drop=True)
+
+
+class IndexedFrame:
+    """
+    A cached frame plus a precomputed (sensor_type, hour-of-day) index.
+    Rows are bucketed once by key = type_code * 24 + hour; a selection just concatenates the
+    row positions of the wanted buckets, so it costs time proportional to the selected slice.
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        codes, self.sensor_types = pd.factorize(self.df["sensor_type"], sort=True)
+        self._type_code = {t: i for i, t in enumerate(self.sensor_types)}
+        key = codes * 24 + self.df["timestamp"].dt.hour.to_numpy()
+        self._order = np.argsort(key, kind="stable")
+        self._bounds = np.searchsorted(key[self._order], np.arange(len(self.sensor_types) * 24 + 1))
+
+    def __len__(self):
+        return len(self.df)
+
+    def positions(self, sensor_types=None, hours=None):
+        codes = (range(len(self.sensor_types)) if sensor_types is None
+                 else [self._type_code[t] for t in sensor_types if t in self._type_code])
+        hours = range(24) if hours is None else hours
+        parts = [self._order[self._bounds[c * 24 + h]:self._bounds[c * 24 + h + 1]] for c in codes for h in hours]
+        # positions within each bucket are already ascending; a sort restores time order across buckets
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=int)
+
+    def select(self, sensor_types=None, hours=None):
+        return self.df.take(self.positions(sensor_types, hours)).reset_index(drop=True)
+
+
+class SimulationStore:
+    """
+    Query layer between the dashboard and the simulator outputs in output_dir.
+    Views are answered from the rollups written next to each output (e.g. "ammonia",
+    "people_counter_mall"), read once, indexed by sensor type and hour of day, and cached
+    until the file changes; outputs that aren't needed for a query are never opened.
+    The first load of a file reads it whole (only sensor types are pruned on disk, see scan());
+    hour-of-day selections are served from the in-memory index after that.
+    """
+
+    def __init__(self, output_dir="outputs"):
+        self.output_dir = output_dir
+        self._cache = {}
+        self._registry = None
+
+    def registry(self):
+        """The DeviceRegistry of the run in output_dir (saved as devices.npz), or None before the first run."""
+        path = os.path.join(self.output_dir, DEVICES_NAME)
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if self._registry is None or self._registry[0] != mtime:
+            self._registry = (mtime, DeviceRegistry.load(path))
+        return self._registry[1]
+
+    def available(self, names):
+        return [name for name in names if find_output(self.output_dir, name)]
+
+    def _rollup(self, name, level, granularity, sensor_types=None):
+        # the indexed rollup the simulator wrote, or (older or external outputs) one computed from the
+        # raw output's rows of sensor_types; cached until the file it came from changes
+        path = find_rollup(self.output_dir, name, level, granularity)
+        source = path or find_output(self.output_dir, name)
+        if source is None:
+            return None
+        types = None if path or sensor_types is None else tuple(sorted(sensor_types))
+        key = ("rollup", name, level, granularity, types)
+        mtime = output_mtime(source)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != mtime:
+            if path:
+                rollup = read_rollup(self.output_dir, name, level, granularity)
+            else:
+                # only what aggregate() reads: bucket, keys, anomaly labels and metrics
+                columns = list(dict.fromkeys(["timestamp", *LEVELS[level][1:], "sensor_type", "anomaly_type", *METRICS]))
+                rows = scan(source, columns, types)
+                rollup = aggregate(rows, level, granularity) if len(rows) else None
+            cached = (mtime, IndexedFrame(rollup) if rollup is not None else None)
+            self._cache[key] = cached
+        return cached[1]
+
+    def rollup(self, names, level="type", granularity="hourly", sensor_types=None, hours=None):
+        """
+        Rollup rows (see src/rollups.py) of the named outputs for the sensor types and hours of day,
+        in time order. Type rollups of outputs that share a sensor type are combined into one row per bucket.
+        Hours filter by bucket start, so they need 1-minute or hourly buckets.
+        """
+        if level not in LEVELS or granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown rollup {level}/{granularity}")
+        if hours is not None and GRANULARITIES[granularity] > 3600:
+            raise ValueError(f"{granularity} buckets can't be filtered by hour of day")
+        frames = []
+        for name in names:
+            rollup = self._rollup(name, level, granularity, sensor_types)
+            if rollup is None or not len(rollup):
+                continue
+            frames.append(rollup.select(sensor_types, hours))
+        if not frames:
+            return pd.DataFrame(columns=LEVELS[level] + ["count"])
+        if len(frames) > 1 and level == "type":
+            return combine(frames, level)
+        df = concat_frames(frames, ignore_index=True)
+        return df.sort_values("timestamp", kind="stable", ignore_index=True)
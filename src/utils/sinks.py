@@ -0,0 +1,430 @@
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+
+def _json_batch(records):
+    return json.dumps(records, default=str).encode()
+
+
+class SinkStats:
+    """Delivery counters and enqueue-to-ack latency for one sink."""
+
+    def __init__(self, name):
+        self.name = name
+        self.delivered = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self._latencies = []
+        self._lock = threading.Lock()
+        self._started = None  # set when the first batch is picked up, so idle time before it isn't counted
+        self._finished = None
+
+    def start_batch(self):
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+
+    def record_batch(self, enqueued_at, acked_at):
+        with self._lock:
+            self.delivered += len(enqueued_at)
+            self.batches += 1
+            self._latencies.append(acked_at - np.asarray(enqueued_at))
+            self._finished = acked_at
+
+    def record_failure(self, count):
+        with self._lock:
+            self.failed += count
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self):
+        with self._lock:
+            lat = np.concatenate(self._latencies) if self._latencies else np.zeros(0)
+            elapsed = (self._finished or time.perf_counter()) - self._started if self._started else 0.0
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1000 if len(lat) else (0.0, 0.0, 0.0)
+        return {
+            "sink": self.name,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "throughput_per_sec": round(self.delivered / elapsed, 1) if elapsed > 0 else 0.0,
+            "latency_p50_ms": round(float(p50), 3),
+            "latency_p95_ms": round(float(p95), 3),
+            "latency_p99_ms": round(float(p99), 3),
+        }
+
+
+class BatchingSink:
+    """
+    Base class for network sinks.
+    send() queues readings in slices of up to batch_size rows (a DataFrame slice or a slice of the
+    list, with one enqueue time each) and blocks while max_in_flight readings are already queued or
+    being delivered, so a fast generator is throttled to what the destination can take (backpressure).
+    A pool of worker threads, each holding one persistent connection, turns slices into batches of up to
+    batch_size readings, waiting at most `linger` seconds to fill one. Failed deliveries are
+    retried with exponential backoff on a fresh connection, then counted as failed.
+    Subclasses implement _connect(), _deliver(conn, payload) and _disconnect(conn).
+    """
+    name = "sink"
+
+    def __init__(self, batch_size=500, linger=0.05, max_in_flight=10_000, connections=4,
+                 max_retries=5, backoff=0.05, serializer=_json_batch):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.serializer = serializer
+        self.stats = SinkStats(self.name)
+        self.max_in_flight = max_in_flight
+        self._queue = queue.Queue()
+        self._in_flight = 0  # readings queued or being delivered
+        self._space = threading.Condition()
+        self._closing = threading.Event()
+        self._workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(connections)]
+        for worker in self._workers:
+            worker.start()
+
+    def send(self, records):
+        """Queue a DataFrame or list of reading dicts for delivery (blocks while max_in_flight readings are queued)."""
+        for lo in range(0, len(records), self.batch_size):
+            rows = records[lo:lo + self.batch_size]
+            with self._space:
+                # a slice always goes out once the queue is empty, even one larger than max_in_flight
+                while self._in_flight and self._in_flight + len(rows) > self.max_in_flight:
+                    self._space.wait()
+                self._in_flight += len(rows)
+            self._queue.put((time.perf_counter(), rows))
+
+    def flush(self):
+        """Block until everything queued so far has been delivered or given up on."""
+        with self._space:
+            self._space.wait_for(lambda: not self._in_flight)
+
+    def close(self):
+        self.flush()
+        self._closing.set()
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release(self, count):
+        with self._space:
+            self._in_flight -= count
+            self._space.notify_all()
+
+    def _next_batch(self, leftover):
+        # slices of up to batch_size readings in all, starting with the rest of a slice the previous
+        # batch had no room for; returns the batch and what is left of its last slice
+        item = leftover
+        if item is None:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                return [], None
+        batch, size = [], 0
+        deadline = time.perf_counter() + self.linger
+        while True:
+            enqueued_at, rows = item
+            room = self.batch_size - size
+            if len(rows) > room:
+                batch.append((enqueued_at, rows[:room]))
+                return batch, (enqueued_at, rows[room:])
+            batch.append(item)
+            size += len(rows)
+            if size == self.batch_size:
+                return batch, None
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch, None
+
+    def _worker(self):
+        conn, leftover = None, None
+        while not (self._closing.is_set() and self._queue.empty() and leftover is None):
+            batch, leftover = self._next_batch(leftover)
+            if not batch:
+                continue
+            size = sum(len(rows) for _, rows in batch)
+            self.stats.start_batch()
+            try:
+                conn = self._send_batch(conn, batch)
+            except Exception:
+                # anything else (a record the serializer can't encode, a broken subclass) loses this batch,
+                # not the worker: flush() and close() would otherwise wait forever on its readings
+                self._disconnect(conn)
+                conn = None
+                self.stats.record_failure(size)
+            finally:
+                self._release(size)
+        self._disconnect(conn)
+
+    def _send_batch(self, conn, batch):
+        # delivers one batch, retrying transport errors on a fresh connection; returns the connection to reuse
+        records = [record for _, rows in batch
+                   for record in (rows.to_dict("records") if isinstance(rows, pd.DataFrame) else rows)]
+        payload = self.serializer(records)
+        enqueued_at = np.repeat([t for t, _ in batch], [len(rows) for _, rows in batch])
+        for attempt in range(self.max_retries + 1):
+            try:
+                if conn is None:
+                    conn = self._connect()
+                self._deliver(conn, payload)
+                self.stats.record_batch(enqueued_at, time.perf_counter())
+                break
+            except (OSError, http.client.HTTPException, ConnectionError):
+                self._disconnect(conn)
+                conn = None
+                if attempt == self.max_retries:
+                    self.stats.record_failure(len(records))
+                else:
+                    self.stats.record_retry()
+                    time.sleep(self.backoff * (2 ** attempt))
+        return conn
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _deliver(self, conn, payload):
+        raise NotImplementedError
+
+    def _disconnect(self, conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+class HttpSink(BatchingSink):
+    """POSTs each batch to an HTTP collector over keep-alive connections."""
+    name = "http"
+
+    def __init__(self, url, timeout=5.0, **kwargs):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or "/"
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _deliver(self, conn, payload):
+        conn.request("POST", self.path, body=payload, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status >= 300:
+            raise http.client.HTTPException(f"collector answered {response.status}")
+
+
+# --------------------------
+# Minimal MQTT 3.1.1 framing
+# --------------------------
+
+def _mqtt_length(n):
+    out = bytearray()
+    while True:
+        byte, n = n % 128, n // 128
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _mqtt_string(s):
+    data = s.encode()
+    return struct.pack(">H", len(data)) + data
+
+
+def _recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        part = sock.recv(n - len(data))
+        if not part:
+            raise ConnectionError("connection closed")
+        data += part
+    return bytes(data)
+
+
+def _mqtt_read_packet(sock):
+    header = _recv_exact(sock, 1)[0]
+    length, shift = 0, 0
+    while True:
+        byte = _recv_exact(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return header >> 4, header & 0x0F, _recv_exact(sock, length)
+
+
+class MqttSink(BatchingSink):
+    """Publishes each batch as one QoS 1 MQTT message and waits for the PUBACK."""
+    name = "mqtt"
+
+    def __init__(self, host="127.0.0.1", port=1883, topic="sensors/uplink", timeout=5.0, **kwargs):
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.timeout = timeout
+        self._packet_ids = itertools.count()
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        client_id = f"simulator-{threading.get_ident()}"
+        body = _mqtt_string("MQTT") + bytes([4, 0x02]) + struct.pack(">H", 60) + _mqtt_string(client_id)
+        sock.sendall(bytes([0x10]) + _mqtt_length(len(body)) + body)
+        packet_type, _, data = _mqtt_read_packet(sock)
+        if packet_type != 2 or data[1] != 0:
+            sock.close()
+            raise ConnectionError("MQTT broker refused the connection")
+        return sock
+
+    def _deliver(self, sock, payload):
+        packet_id = next(self._packet_ids) % 65535 + 1
+        body = _mqtt_string(self.topic) + struct.pack(">H", packet_id) + payload
+        sock.sendall(bytes([0x32]) + _mqtt_length(len(body)) + body)
+        packet_type, _, data = _mqtt_read_packet(sock)
+        if packet_type != 4 or struct.unpack(">H", data[:2])[0] != packet_id:
+            raise ConnectionError("unexpected reply to MQTT PUBLISH")
+
+    def _disconnect(self, sock):
+        if sock is not None:
+            try:
+                sock.sendall(bytes([0xE0, 0]))
+            except OSError:
+                pass
+        super()._disconnect(sock)
+
+
+# --------------------------
+# Local stand-ins for load tests
+# --------------------------
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            self.send_response(503)
+        else:
+            server.count(len(json.loads(body)))
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _CountingMixin:
+    def _init_counts(self, fail_rate=0.0, seed=None):
+        self.received = 0
+        self.requests = 0
+        self.fail_rate = fail_rate
+        self.rng = np.random.default_rng(seed)
+        self._count_lock = threading.Lock()
+
+    def count(self, n):
+        with self._count_lock:
+            self.received += n
+            self.requests += 1
+
+
+class _CollectorServer(_CountingMixin, ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        try:
+            while True:
+                packet_type, flags, data = _mqtt_read_packet(sock)
+                if packet_type == 1:  # CONNECT
+                    sock.sendall(bytes([0x20, 2, 0, 0]))
+                elif packet_type == 3:  # PUBLISH
+                    topic_len = struct.unpack(">H", data[:2])[0]
+                    offset = 2 + topic_len
+                    qos = (flags >> 1) & 0x03
+                    packet_id = data[offset:offset + 2] if qos else b""
+                    payload = data[offset + (2 if qos else 0):]
+                    self.server.count(len(json.loads(payload)))
+                    if qos:
+                        sock.sendall(bytes([0x40, 2]) + packet_id)
+                elif packet_type == 12:  # PINGREQ
+                    sock.sendall(bytes([0xD0, 0]))
+                elif packet_type == 14:  # DISCONNECT
+                    return
+        except ConnectionError:
+            return
+
+
+class _BrokerServer(_CountingMixin, socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _LocalServer:
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def received(self):
+        return self.server.received
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LocalHttpCollector(_LocalServer):
+    """In-process HTTP collector that accepts JSON batches; fail_rate injects 503s to exercise retries."""
+
+    def __init__(self, host="127.0.0.1", port=0, fail_rate=0.0, seed=None):
+        self.server = _CollectorServer((host, port), _CollectorHandler)
+        self.server._init_counts(fail_rate, seed)
+        self.url = f"http://{host}:{self.server.server_address[1]}/uplink"
+
+
+class LocalMqttBroker(_LocalServer):
+    """In-process MQTT broker stand-in: accepts CONNECT/PUBLISH, acks QoS 1, counts readings."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = _BrokerServer((host, port), _BrokerHandler)
+        self.server._init_counts()
+        self.host = host
+        self.port = self.server.server_address[1]
@@ -0,0 +1,217 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+
+class StageStats:
+    """Accumulated cost of one (sensor, stage) pair."""
+
+    def __init__(self, sensor, stage):
+        self.sensor = sensor
+        self.stage = stage
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.peak_bytes = 0
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.rows += other.rows
+        self.bytes += other.bytes
+        self.peak_bytes = max(self.peak_bytes, other.peak_bytes)
+
+    def to_dict(self):
+        return {
+            "sensor": self.sensor,
+            "stage": self.stage,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds > 0 and self.rows else None,
+            "bytes": self.bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+class RunStats:
+    """
+    Per-sensor, per-stage timings, row counts, bytes written and (optionally) peak allocation
+    for a simulator run.
+    trace_memory=True runs tracemalloc for the session and records each stage's peak allocation;
+    profile=True runs cProfile for the session, for a finer split than the stages give.
+    Both are off by default since they slow the run down; plain timing costs two perf_counter calls per stage.
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=False, profile=False, profile_top=25):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.profile_top = profile_top
+        self.stages = {}
+        self.wall_seconds = 0.0
+        self.peak_bytes = 0
+        self._profile_rows = []
+        self._depth = 0
+        self._started = None
+        self._profiler = None
+        self._owns_tracemalloc = False
+
+    def fresh(self):
+        """An empty RunStats with the same options (e.g. for a worker process)."""
+        return RunStats(self.trace_memory, self.profile, self.profile_top)
+
+    # --- session ---------------------------------------------------------
+
+    @contextmanager
+    def session(self):
+        # re-entrant: only the outermost session starts and stops the timers, tracemalloc and cProfile
+        self._depth += 1
+        if self._depth == 1:
+            self._start()
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._stop()
+
+    def _start(self):
+        self._started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _stop(self):
+        self.wall_seconds += time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profile_rows = self._top_functions(self._profiler)
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+
+    def _top_functions(self, profiler):
+        stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats("cumulative")
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({"function": f"{filename}:{line}({name})", "calls": calls,
+                         "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)})
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:self.profile_top]
+
+    # --- recording -------------------------------------------------------
+
+    def _entry(self, sensor, stage):
+        key = (sensor, stage)
+        if key not in self.stages:
+            self.stages[key] = StageStats(sensor, stage)
+        return self.stages[key]
+
+    def add(self, sensor, stage, seconds=0.0, rows=0, bytes=0, calls=1):
+        entry = self._entry(sensor, stage)
+        entry.calls += calls
+        entry.seconds += seconds
+        entry.rows += rows
+        entry.bytes += bytes
+
+    @contextmanager
+    def stage(self, sensor, stage, rows=0):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(sensor, stage, time.perf_counter() - t0, rows)
+            if tracing:
+                entry = self._entry(sensor, stage)
+                entry.peak_bytes = max(entry.peak_bytes, tracemalloc.get_traced_memory()[1] - base)
+
+    def timed_iter(self, iterable, sensor, stage):
+        """Yield from iterable, charging the time spent producing each item (and its len) to the stage."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(sensor, stage):
+                item = next(iterator, None)
+            if item is None:
+                return
+            self._entry(sensor, stage).rows += len(item)
+            yield item
+
+    def merge(self, other):
+        """Fold in the stats of another run (e.g. from a worker process)."""
+        for key, entry in other.stages.items():
+            self._entry(*key).merge(entry)
+        self.peak_bytes = max(self.peak_bytes, other.peak_bytes)
+
+    # --- reporting -------------------------------------------------------
+
+    def to_frame(self):
+        return pd.DataFrame([entry.to_dict() for entry in self.stages.values()],
+                            columns=["sensor", "stage", "calls", "seconds", "rows", "rows_per_sec", "bytes", "peak_bytes"])
+
+    def summary(self):
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(self.wall_seconds, 6),
+            "trace_memory": self.trace_memory,
+            "peak_bytes": self.peak_bytes,
+            "stages": [entry.to_dict() for entry in self.stages.values()],
+            "profile": self._profile_rows,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+
+class NullStats:
+    """Stand-in used when stats are off: every hook is a no-op, so instrumented code pays next to nothing."""
+    enabled = False
+    stages = {}
+    _null = nullcontext()
+
+    def fresh(self):
+        return self
+
+    def session(self):
+        return self._null
+
+    def add(self, *args, **kwargs):
+        pass
+
+    def stage(self, *args, **kwargs):
+        return self._null
+
+    def timed_iter(self, iterable, *args):
+        return iterable
+
+    def merge(self, other):
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+def load_report(path):
+    """Read a JSON report written by RunStats.write_json()."""
+    with open(path) as f:
+        return json.load(f)
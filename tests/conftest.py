@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the simulator the way its scripts do (from src.x import y), from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
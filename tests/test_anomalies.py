@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.anomalies import (ANOMALY_TYPES, DRIFT, DROPOUT, EVENT_LENGTHS, NONE, RADIO, SPIKE, STUCK, ZERO,
+                           AnomalyModel, empty_carry, inject_events, label_categories)
+from src.sensors.ammonia_sensor import AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterSensor
+
+
+def _inject(codes, value, carry=None, radio=None, v=None):
+    # one device; v=0 gives every event its shortest length
+    codes = np.array(codes, dtype=np.uint8)[:, None]
+    carry = np.tile(empty_carry(1), (1, 1)) if carry is None else carry
+    radio = np.zeros(codes.shape, dtype=bool) if radio is None else np.array(radio)[:, None]
+    magnitude = np.ones(codes.shape)  # drift amplitude 2 * 1 - 1 = +1
+    v = np.zeros(codes.shape) if v is None else v
+    columns = {"value": np.array(value, dtype=float)[:, None]}
+    keep, labels, carry = inject_events(codes, magnitude, v, radio, carry, columns, {"value": 1.0})
+    return keep[:, 0], labels[:, 0], carry, columns["value"][:, 0]
+
+
+def test_draws_follow_the_weights():
+    model = AnomalyModel(0.1, {"spike": 1.0, "stuck": 0.5})
+    codes, magnitude, v = model.draw(np.random.default_rng(0), 100_000)
+    counts = np.bincount(codes, minlength=len(ANOMALY_TYPES))
+    assert set(np.flatnonzero(counts)) == {NONE, SPIKE, STUCK}
+    assert counts[SPIKE] == pytest.approx(10_000, rel=0.05) and counts[STUCK] == pytest.approx(5_000, rel=0.05)
+    assert ((magnitude >= 0) & (magnitude < 1)).all() and (magnitude[codes == NONE] == 0).all()
+    assert (v[codes == NONE] == 0).all()
+
+
+@pytest.mark.parametrize("rate, weights, match", [
+    (0.1, {"teleport": 1.0}, "Unknown anomaly types"),
+    (0.6, {"spike": 1.0, "zero": 1.0}, "sum to at most 1"),
+    (0.1, {"spike": -1.0}, "non-negative"),
+])
+def test_invalid_models_raise(rate, weights, match):
+    with pytest.raises(ValueError, match=match):
+        AnomalyModel(rate, weights)
+
+
+def test_stuck_runs_repeat_their_first_value():
+    keep, labels, _, value = _inject([NONE, NONE, STUCK] + [NONE] * 9, np.arange(12))
+    stuck = EVENT_LENGTHS[STUCK][0]
+    assert value.tolist() == [0, 1] + [2] * stuck + list(range(2 + stuck, 12))
+    assert labels.tolist() == [NONE, NONE] + [STUCK] * stuck + [NONE] * (10 - stuck)
+    assert keep.all()
+
+
+def test_dropouts_lose_readings_and_hide_other_labels():
+    codes = [DROPOUT, SPIKE, NONE, NONE, NONE]
+    keep, labels, _, _ = _inject(codes, np.zeros(5), radio=[False, False, True, True, False])
+    lost = EVENT_LENGTHS[DROPOUT][0]
+    assert keep.tolist() == [False] * lost + [True] * (5 - lost)
+    assert labels.tolist() == [DROPOUT] * lost + [RADIO, NONE]
+
+
+def test_drift_ramps_and_carries_into_the_next_chunk():
+    length = EVENT_LENGTHS[DRIFT][0]
+    keep, labels, carry, value = _inject([NONE] * 8 + [DRIFT, ZERO], np.zeros(10))
+    np.testing.assert_allclose(value, [0] * 8 + [1 / length, 2 / length])
+    # a point anomaly shows on top of a drift
+    assert labels.tolist() == [NONE] * 8 + [DRIFT, ZERO]
+    assert carry[0, :4].tolist() == [DRIFT, length - 2, 2, 1.0]
+
+    _, labels, carry, value = _inject([NONE] * length, np.zeros(length), carry=carry)
+    np.testing.assert_allclose(value[:length - 2], np.arange(3, length + 1) / length)
+    assert (value[length - 2:] == 0).all()
+    assert labels.tolist() == [DRIFT] * (length - 2) + [NONE] * 2
+    assert carry[0, 0] == 0
+
+
+def test_stuck_values_carry_into_the_next_chunk():
+    _, _, carry, _ = _inject([NONE, NONE, NONE, STUCK], [5, 6, 7, 8])
+    left = EVENT_LENGTHS[STUCK][0] - 1
+    assert carry[0, :2].tolist() == [STUCK, left] and carry[0, -1] == 8
+    _, labels, _, value = _inject([NONE] * 8, np.arange(10, 18), carry=carry)
+    assert value.tolist() == [8] * left + list(range(10 + left, 18))
+    assert labels.tolist() == [STUCK] * left + [NONE] * (8 - left)
+
+
+def test_label_categories():
+    labels = label_categories(np.array([[NONE, RADIO], [STUCK, DRIFT]], dtype=np.uint8))
+    assert list(labels.categories) == ANOMALY_TYPES
+    assert list(labels) == ["none", "radio", "stuck", "drift"]
+
+
+def test_zero_weights_disable_types():
+    sensor = AmmoniaSensor(seed=1, anomaly_rate=0.3, anomaly_weights={"spike": 0, "drift": 0, "stuck": 0, "dropout": 0})
+    df = sensor.generate_data(5 * 1440, start_time=datetime(2025, 1, 1))
+    assert set(df["anomaly_type"]) == {"none", "radio"}
+    assert len(df) == 5 * 1440 // 5
+
+
+def test_ground_truth_marks_anomalous_rows():
+    sensor = PeopleCounterSensor(location="mall", seed=1, anomaly_rate=0.1)
+    df = sensor.generate_data(5 * 1440, start_time=datetime(2025, 1, 1))
+    assert {"spike", "zero", "radio"} <= set(df["anomaly_type"])
+    zero = df["anomaly_type"] == "zero"
+    assert (df.loc[zero, ["period_in", "period_out"]] == 0).all().all()
+    radio = df["anomaly_type"] == "radio"
+    assert ((df.loc[radio, "rssi"] <= -60) | (df.loc[radio, "snr"] <= 0)).all()
+
+
+def test_sensors_reject_unsupported_weights():
+    with pytest.raises(ValueError, match="support anomaly types"):
+        AmmoniaSensor(seed=1, anomaly_weights={"zero": 1.0})
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.base_sensor import BLOCK, BaseSensor
+from src.sensors.ammonia_sensor import AmmoniaFleet, AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterFleet, PeopleCounterSensor
+
+START = datetime(2025, 1, 1)
+# five days at 5-minute intervals: 1440 readings, more than one sample block
+MINUTES = 5 * 1440
+# high enough that every anomaly type shows up, and events run across chunk boundaries
+ANOMALY_RATE = 0.2
+CHUNK_SIZES = [1, 7, 100, BLOCK - 1, BLOCK, BLOCK + 1, MINUTES // 5]
+
+WEIGHTS = {"drift": 0.2, "stuck": 0.2, "dropout": 0.2}
+
+
+class _Sine(BaseSensor):
+    # a bare BaseSensor, with both value paths
+    def __init__(self, **kwargs):
+        super().__init__(type="sine", **kwargs)
+
+    def generate_reading(self, t):
+        return np.sin(t / 48) + self.rng.normal(0, 0.1)
+
+    def draw_values(self, rng, timestamps, draws):
+        return (rng.normal(0, 0.1, len(timestamps)),)
+
+    def generate_values(self, step0, timestamps, draws, samples):
+        return {"value": np.sin(np.arange(step0, step0 + len(timestamps)) / 48) + samples[0]}
+
+
+SENSORS = {
+    "base": lambda seed=7: _Sine(seed=seed, anomaly_rate=ANOMALY_RATE, anomaly_weights=WEIGHTS),
+    "ammonia": lambda seed=7: AmmoniaSensor(seed=seed, anomaly_rate=ANOMALY_RATE, anomaly_weights=WEIGHTS),
+    "people_counter": lambda seed=7: PeopleCounterSensor(location="mall", seed=seed, anomaly_rate=ANOMALY_RATE,
+                                                         anomaly_weights=WEIGHTS),
+}
+
+FLEETS = {
+    "ammonia": lambda: AmmoniaFleet([SENSORS["ammonia"](seed) for seed in range(4)]),
+    # two locations, so flows come from more than one profile
+    "people_counter": lambda: PeopleCounterFleet(
+        [PeopleCounterSensor(location=location, seed=seed, anomaly_rate=ANOMALY_RATE, anomaly_weights=WEIGHTS)
+         for seed, location in enumerate(["mall", "toilet", "mall", "toilet"])]),
+}
+
+
+def _chunked(device, chunk_size, **kwargs):
+    chunks = device.iter_chunks(MINUTES, chunk_size=chunk_size, start_time=START, **kwargs)
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("kind", sorted(SENSORS))
+def test_sensor_chunks_match_generate_data(kind, chunk_size):
+    whole = SENSORS[kind]().generate_data(MINUTES, start_time=START)
+    assert set(whole["anomaly_type"]) >= {"drift", "stuck", "radio"}
+    pd.testing.assert_frame_equal(_chunked(SENSORS[kind](), chunk_size), whole)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("kind", sorted(FLEETS))
+def test_fleet_chunks_match_generate_data(kind, chunk_size):
+    whole = FLEETS[kind]().generate_data(MINUTES, start_time=START)
+    pd.testing.assert_frame_equal(_chunked(FLEETS[kind](), chunk_size), whole)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("kind", sorted(SENSORS))
+def test_batched_chunks_match_batched_generate_data(kind, chunk_size):
+    whole = SENSORS[kind]().generate_data(MINUTES, start_time=START, batched=True)
+    pd.testing.assert_frame_equal(_chunked(SENSORS[kind](), chunk_size, batched=True), whole)
+
+
+@pytest.mark.parametrize("kind", sorted(SENSORS))
+def test_batched_and_per_row_paths_agree(kind):
+    per_row = SENSORS[kind]().generate_data(MINUTES, start_time=START)
+    batched = SENSORS[kind]().generate_data(MINUTES, start_time=START, batched=True)
+    assert per_row.dtypes.to_dict() == batched.dtypes.to_dict()
+    # both paths read anomalies and radio samples from the same blocks; only value noise differs
+    shared = ["timestamp", "sensor_type", "devEUI", "rssi", "snr", "seqNumber", "anomaly_type"]
+    pd.testing.assert_frame_equal(batched[shared], per_row[shared])
+    if kind == "base":
+        assert batched["battery"].is_monotonic_decreasing and batched["battery"].iloc[-1] < 100
@@ -0,0 +1,108 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sensors.ammonia_sensor import AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterFleet
+from src.utils.data_export import find_output, get_exporter, iter_frame_chunks, merge_sorted, part_files, read_output
+
+START = datetime(2025, 1, 1)
+
+
+def _chunks(days=2):
+    fleet = PeopleCounterFleet.create(["mall", "toilet"], seed=3, anomaly_rate=0.05)
+    return list(fleet.iter_chunks(days * 1440, chunk_size=100, start_time=START))
+
+
+def _by_time(df):
+    return df.sort_values(["timestamp", "devEUI"], ignore_index=True)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_streamed_chunks_read_back_as_one_frame(tmp_path, output_format):
+    chunks = _chunks()
+    with get_exporter(str(tmp_path / "pc"), output_format) as exporter:
+        for chunk in chunks:
+            exporter.write(chunk)
+    assert exporter.rows_written == sum(len(c) for c in chunks)
+    pd.testing.assert_frame_equal(read_output(exporter.path), pd.concat(chunks, ignore_index=True),
+                                  check_categorical=False, check_exact=False)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_append_adds_rows_after_the_existing_ones(tmp_path, output_format):
+    chunks = _chunks()
+    half = len(chunks) // 2
+    for part, append in [(chunks[:half], False), (chunks[half:], True)]:
+        with get_exporter(str(tmp_path / "pc"), output_format, append=append) as exporter:
+            for chunk in part:
+                exporter.write(chunk)
+    pd.testing.assert_frame_equal(read_output(exporter.path), pd.concat(chunks, ignore_index=True),
+                                  check_categorical=False, check_exact=False)
+
+
+def test_partitions_split_by_sensor_type_and_date(tmp_path):
+    chunks = _chunks()
+    for append in (False, True):
+        with get_exporter(str(tmp_path / "pc"), "parquet", partition_by=("sensor_type", "date"),
+                          append=append) as exporter:
+            for chunk in chunks:
+                exporter.write(chunk)
+    parts = [os.path.relpath(p, exporter.path) for p in part_files(exporter.path)]
+    assert parts == [os.path.join(f"sensor_type=people_counter_{loc}", f"date=2025-01-0{day}", f"part-{n}.parquet")
+                     for loc in ["mall", "toilet"] for day in (1, 2) for n in (0, 1)]
+    assert len(read_output(exporter.path)) == 2 * sum(len(c) for c in chunks)
+    # partition columns stay in the part files
+    part = read_output(part_files(exporter.path)[-1])
+    assert set(part["sensor_type"]) == {"people_counter_toilet"}
+    assert set(part["timestamp"].dt.date.astype(str)) == {"2025-01-02"}
+
+
+def test_find_output_picks_the_newest_format(tmp_path):
+    chunks = _chunks(days=1)
+    old = get_exporter(str(tmp_path / "pc"), "parquet")
+    with old:
+        old.write(chunks[0])
+    new = get_exporter(str(tmp_path / "pc"), "csv")
+    with new:
+        new.write(chunks[1])
+    # a stale parquet file from an earlier run doesn't shadow the csv written after it
+    os.utime(old.path, (0, 0))
+    assert find_output(str(tmp_path), "pc") == new.path
+    os.utime(new.path, (0, 0))
+    os.utime(old.path)
+    assert find_output(str(tmp_path), "pc") == old.path
+    assert find_output(str(tmp_path), "missing") is None
+
+
+def test_unknown_format_raises(tmp_path):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        get_exporter(str(tmp_path / "pc"), "xlsx")
+
+
+def test_merge_sorted_orders_rows_and_keeps_stream_order_on_ties():
+    rng = np.random.default_rng(0)
+    # coarse timestamps, so every stream has ties with the others and within itself
+    frames = [pd.DataFrame({"timestamp": np.sort(rng.integers(0, 50, n)), "stream": k, "row": np.arange(n)})
+              for k, n in enumerate([200, 1, 0, 333])]
+    streams = [iter_frame_chunks(frame, chunk_rows) for frame, chunk_rows in zip(frames, [7, 1, 5, 40])]
+    blocks = list(merge_sorted(streams))
+    merged = pd.concat(blocks, ignore_index=True)
+    expected = pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
+    pd.testing.assert_frame_equal(merged, expected)
+    # rows are emitted up to each watermark, not all at the end
+    assert len(blocks) > 1
+
+
+def test_merge_sorted_blocks_share_one_schema():
+    ammonia = AmmoniaSensor(seed=1).generate_data(1440, START)
+    counters = pd.concat(_chunks(days=1), ignore_index=True)
+    blocks = list(merge_sorted([iter_frame_chunks(ammonia, 50), iter_frame_chunks(counters, 300)]))
+    assert len({tuple(block.columns) for block in blocks}) == 1
+    assert len({tuple(map(str, block.dtypes)) for block in blocks}) == 1
+    merged = pd.concat(blocks, ignore_index=True)
+    assert len(merged) == len(ammonia) + len(counters) and merged["timestamp"].is_monotonic_increasing
+    assert merged["nh3"].dtype == "float32" and merged["period_in"].dtype == "float32"
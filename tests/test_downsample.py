@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.downsample import downsample, lttb_indices, minmax_indices
+
+
+@pytest.mark.parametrize("n,n_out", [(10_000, 2000), (1001, 3), (5000, 4999), (100, 50)])
+def test_lttb_keeps_the_endpoints_within_the_budget(n, n_out):
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 50) + np.random.default_rng(0).normal(0, 0.1, n)
+    picks = lttb_indices(x, y, n_out)
+    assert len(picks) == n_out
+    assert picks[0] == 0 and picks[-1] == n - 1
+    assert (np.diff(picks) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(10_000)
+    y[4321] = 100
+    assert 4321 in lttb_indices(np.arange(10_000), y, 100)
+
+
+def test_minmax_keeps_the_extremes():
+    y = np.random.default_rng(1).normal(0, 1, 10_000)
+    picks = minmax_indices(y, 200)
+    assert len(picks) <= 200 and {y.argmin(), y.argmax()} <= set(picks)
+
+
+def test_downsample_budgets_each_series():
+    n = 5000
+    df = pd.DataFrame({
+        "timestamp": np.tile(pd.date_range("2025-01-01", periods=n, freq="min"), 2),
+        "sensor_type": np.repeat(["a", "b"], n),
+        "nh3": np.r_[np.random.default_rng(2).normal(0, 1, n), np.full(n, np.nan)],
+        "rssi": np.random.default_rng(3).normal(-25, 5, 2 * n),
+    })
+    small = downsample(df, "timestamp", ["nh3", "rssi"], n_out=500, by="sensor_type")
+    sizes = small.groupby("sensor_type").size()
+    # series a keeps the union of its two columns' picks; series b has no nh3 at all
+    assert 500 <= sizes["a"] <= 1000 and sizes["b"] == 500
+    assert small.groupby("sensor_type")["timestamp"].agg(["min", "max"]).eq(
+        df.groupby("sensor_type")["timestamp"].agg(["min", "max"])).all().all()
+    # frames within the budget come back as they are
+    head = df.head(100)
+    assert downsample(head, "timestamp", "nh3", n_out=500) is head
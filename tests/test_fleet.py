@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from src.fleet import FleetSpec, load_fleet_spec
+from src.sensors.people_counter import LOCATIONS
+
+SPEC = FleetSpec({
+    "templates": {
+        "amm": {"kind": "ammonia", "frequency": 300, "anomaly_rate": 0.01},
+        "pc": {"kind": "people_counter", "frequency": 300},
+    },
+    "groups": [
+        {"name": "ammonia", "template": "amm", "count": 3},
+        {"name": "retail", "template": "pc", "count": 10, "locations": ["mall", "restaurant"], "seed": 7},
+        {"name": "toilets", "template": "pc", "frequency": 600},
+    ],
+})
+
+
+def _spec(**group):
+    return {"templates": {"amm": {"kind": "ammonia"}}, "groups": [{"name": "g", "template": "amm", **group}]}
+
+
+def test_device_table_is_grouped_and_indexed():
+    assert len(SPEC) == 14
+    assert SPEC.devices("ammonia")["index"].tolist() == [0, 1, 2]
+    retail = SPEC.devices("retail")
+    assert retail["index"].tolist() == list(range(10))
+    assert retail["location"].tolist() == [LOCATIONS.index(loc) for loc in ["mall", "restaurant"] * 5]
+    assert SPEC.names(kind="people_counter") == ["retail", "toilets"]
+    assert SPEC.names(location="mall") == ["retail"]
+    assert SPEC.locations() == [loc for loc in LOCATIONS if loc in ("mall", "restaurant", "toilet")]
+    assert SPEC.sensor_types("retail") == ["people_counter_mall", "people_counter_restaurant"]
+    assert SPEC.group("toilets")["settings"]["frequency"] == 600
+
+
+def test_shards_cover_a_group():
+    assert SPEC.shards("retail", 4) == [(0, 4), (4, 8), (8, 10)]
+    assert SPEC.shards("retail", 100) == [(0, 10)]
+
+
+@pytest.mark.parametrize("split", ["range", "hash"])
+def test_node_devices_cover_every_device_once(split):
+    shares = [SPEC.node_devices("retail", node, 3, split=split, seed=42) for node in range(3)]
+    assert sorted(np.concatenate(shares).tolist()) == list(range(10))
+    if split == "range":
+        assert all((np.diff(share) == 1).all() for share in shares)
+    with pytest.raises(ValueError, match="node split"):
+        SPEC.node_devices("retail", 0, 3, split="modulo")
+
+
+def test_materialize_builds_configured_sensors():
+    sensors = SPEC.materialize("retail", 2, 6, seed=42)
+    assert [s.location for s in sensors] == ["mall", "restaurant", "mall", "restaurant"]
+    assert [s.devEUI for s in sensors] == [s.devEUI for s in SPEC.materialize_devices("retail", [2, 3, 4, 5], seed=42)]
+    assert len({s.devEUI for s in sensors}) == 4
+    # the group's own seed wins over the simulation seed
+    assert [s.devEUI for s in SPEC.materialize("retail", 2, 6, seed=1)] == [s.devEUI for s in sensors]
+    assert SPEC.materialize("ammonia", 0, 1, seed=1)[0].devEUI != SPEC.materialize("ammonia", 0, 1, seed=2)[0].devEUI
+    assert SPEC.materialize("ammonia", 0, 1, seed=1, anomaly_rate=0.5)[0].anomaly_rate == 0.5
+    assert SPEC.build("toilets", 0, 1, seed=1).location == "toilet"
+
+
+def test_device_euis_cover_indices_past_the_count():
+    euis = SPEC.device_euis("ammonia", np.arange(6), seed=42)
+    assert len(np.unique(euis)) == 6
+    assert (euis[:3] == SPEC.registry(42).devEUIs("ammonia")).all()
+
+
+@pytest.mark.parametrize("spec, match", [
+    ({"groups": []}, "no groups"),
+    ({"groups": [{"name": "g", "kind": "ammonia"}], "extra": 1}, "unknown keys"),
+    (_spec(count=0), "count"),
+    (_spec(frequency=-5), "frequency"),
+    (_spec(anomaly_rate=2), "anomaly_rate"),
+    (_spec(noise_level="high"), "noise_level"),
+    (_spec(locations=["mall"]), "only people counters"),
+    (_spec(anomaly_weights={"teleport": 1}), "anomaly_weights"),
+    (_spec(profile="nope"), "profile"),
+    (_spec(seed="7"), "seed"),
+    (_spec(template="missing"), "unknown template"),
+    ({"groups": [{"name": "g", "kind": "toaster"}]}, "kind"),
+    ({"groups": [{"name": "g", "kind": "people_counter", "locations": ["moon"]}]}, "locations"),
+    ({"groups": [{"name": "g", "kind": "ammonia"}, {"name": "g", "kind": "ammonia"}]}, "duplicate"),
+])
+def test_invalid_specs_raise(spec, match):
+    with pytest.raises(ValueError, match=match):
+        FleetSpec(spec)
+
+
+def test_unknown_group_raises():
+    with pytest.raises(ValueError, match="Unknown sensor type"):
+        SPEC.group("nope")
+
+
+def test_default_config_loads():
+    spec = load_fleet_spec()
+    assert spec.names() and len(spec) >= len(spec.names())
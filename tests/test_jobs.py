@@ -0,0 +1,77 @@
+import os
+import threading
+from datetime import datetime
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.jobs import JOBS_DIR, JobManager, _run_job, job_key, publish
+
+START = datetime(2025, 1, 1)
+SPEC = FleetSpec({
+    # no anomalies, so no dropouts: every expected row is generated
+    "templates": {"a": {"kind": "ammonia", "frequency": 600, "anomaly_rate": 0}},
+    "groups": [{"name": "amm", "template": "a", "count": 2}],
+})
+
+
+def _params(days):
+    return dict(duration_minutes=days * 1440, start_time=START, chunk_minutes=360, seed=42, fleet=SPEC)
+
+
+def test_same_params_share_a_job_and_cancelling_one_leaves_the_other(tmp_path):
+    output_dir = str(tmp_path)
+    manager = JobManager(Simulator, output_dir, max_workers=1)
+    try:
+        job = manager.submit(["amm"], **_params(2))
+        assert manager.submit(["amm"], **_params(2)) is job
+        doomed = manager.submit(["amm"], **_params(30))
+        assert doomed is not job and manager.get(doomed.key) is doomed
+        doomed.cancel()
+        job.future.result(timeout=120)
+    finally:
+        manager.shutdown()
+    assert (job.status, doomed.status) == ("done", "cancelled")
+    assert job.progress()["fraction"] == 1.0 and job.progress()["rows"] == 2 * 2 * 144
+    assert not os.path.exists(os.path.join(output_dir, JOBS_DIR, job.key))
+    assert not os.path.exists(os.path.join(output_dir, JOBS_DIR, doomed.key))
+    assert any(name.startswith("amm.") for name in os.listdir(output_dir))
+    assert not manager.active()
+
+
+def test_a_cancelled_run_publishes_nothing(tmp_path):
+    output_dir, staging = str(tmp_path / "out"), str(tmp_path / "out" / JOBS_DIR / "key")
+    cancel = threading.Event()
+    cancel.set()
+    state = {}
+    os.makedirs(staging)
+    assert _run_job(Simulator, _params(1), ["amm"], staging, output_dir, state, cancel) == "cancelled"
+    assert os.listdir(output_dir) == [JOBS_DIR]
+
+
+def test_a_finished_run_is_published_and_its_staging_removed(tmp_path):
+    output_dir, staging = str(tmp_path / "out"), str(tmp_path / "out" / JOBS_DIR / "key")
+    state = {}
+    assert _run_job(Simulator, _params(1), ["amm"], staging, output_dir, state, threading.Event()) == "done"
+    assert state["rows"] == state["total"] == 2 * 144
+    assert not os.path.exists(staging)
+    assert any(name.startswith("amm.") for name in os.listdir(output_dir))
+
+
+def test_publish_replaces_outputs_and_merges_shared_dirs(tmp_path):
+    staging, output_dir = tmp_path / "staging", tmp_path / "out"
+    (staging / "rollups").mkdir(parents=True)
+    (output_dir / "rollups").mkdir(parents=True)
+    (staging / "amm.csv").write_text("new")
+    (staging / "rollups" / "amm.type.hourly.csv").write_text("new")
+    (output_dir / "amm.csv").write_text("old")
+    (output_dir / "other.csv").write_text("old")
+    (output_dir / "rollups" / "other.type.hourly.csv").write_text("old")
+    publish(str(staging), str(output_dir))
+    assert (output_dir / "amm.csv").read_text() == "new"
+    assert (output_dir / "other.csv").read_text() == "old"
+    assert sorted(os.listdir(output_dir / "rollups")) == ["amm.type.hourly.csv", "other.type.hourly.csv"]
+
+
+def test_job_keys_depend_only_on_params():
+    assert job_key({"a": 1, "b": [2]}) == job_key({"b": [2], "a": 1})
+    assert job_key({"a": 1}) != job_key({"a": 2})
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.manifest import MANIFEST_NAME, node_dir, verify_nodes, write_manifest
+
+START = datetime(2025, 1, 1)
+NODES = 3
+SPEC = FleetSpec({
+    "templates": {"a": {"kind": "ammonia", "frequency": 3600}},
+    # fewer devices than nodes in "one": some nodes get an empty share
+    "groups": [{"name": "amm", "template": "a", "count": 7}, {"name": "one", "template": "a"}],
+})
+
+
+def _run_nodes(output_dir, split):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(NODES):
+            Simulator(duration_minutes=1440, start_time=START, output_dir=output_dir, seed=5, fleet=SPEC,
+                      node=(i, NODES), node_split=split, rollups=False).run_all()
+
+
+def _edit(output_dir, node, name, **entry):
+    # rewrite one node's manifest entry for name (write_manifest stamps the version again)
+    directory = node_dir(output_dir, node, NODES)
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    manifest["outputs"][name].update(entry)
+    write_manifest(directory, manifest)
+
+
+@pytest.fixture(scope="module", params=["range", "hash"])
+def split_run(request, tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp(request.param))
+    _run_nodes(output_dir, request.param)
+    return output_dir, request.param
+
+
+def test_complete_split_verifies(split_run):
+    output_dir, split = split_run
+    manifests = verify_nodes(output_dir, SPEC)
+    assert sorted(manifests) == list(range(NODES))
+    shares = [manifest["outputs"]["amm"] for _, manifest in manifests.values()]
+    if split == "range":
+        assert [entry["range"] for entry in shares] == [[0, 2], [2, 4], [4, 7]]
+    else:
+        assert [entry["bucket"] for entry in shares] == [0, 1, 2]
+
+
+def test_overlapping_and_missing_ranges_are_rejected(tmp_path):
+    output_dir = str(tmp_path)
+    _run_nodes(output_dir, "range")
+    # same device counts as before, so only the ranges give it away
+    _edit(output_dir, 1, "amm", range=[0, 2])
+    with pytest.raises(ValueError) as error:
+        verify_nodes(output_dir, SPEC)
+    assert "nodes 0 and 1 both generated devices 0..1" in str(error.value)
+    assert "no node generated devices 2..3" in str(error.value)
+
+
+def test_duplicate_hash_buckets_are_rejected(tmp_path):
+    output_dir = str(tmp_path)
+    _run_nodes(output_dir, "hash")
+    _edit(output_dir, 2, "one", bucket=0)
+    with pytest.raises(ValueError) as error:
+        verify_nodes(output_dir, SPEC)
+    assert "one: nodes 0 and 2 both generated hash bucket 0" in str(error.value)
+    assert "no node generated hash buckets [2]" in str(error.value)
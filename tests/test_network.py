@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.network import LoRaNetwork, deduplicate
+from src.sensors.ammonia_sensor import AmmoniaFleet, AmmoniaSensor
+
+START = datetime(2025, 1, 1)
+
+
+def _frames(devices=50, chunk_size=12):
+    fleet = AmmoniaFleet([AmmoniaSensor(seed=seed) for seed in range(devices)])
+    return list(fleet.iter_chunks(1440, chunk_size=chunk_size, start_time=START))
+
+
+def _run(network, frames):
+    return pd.concat([network.deliver(f) for f in frames] + [network.flush()], ignore_index=True)
+
+
+def test_copies_arrive_in_order_and_dedupe_to_the_delivered_uplinks():
+    frames = _frames()
+    network = LoRaNetwork(gateways=4, seed=7, late_rate=0.05)
+    copies = _run(network, frames)
+    s = network.stats.summary()
+    assert s["uplinks"] == sum(len(f) for f in frames)
+    assert (np.diff(copies["received_at"].to_numpy().view(np.int64)) >= 0).all()
+    assert (copies["received_at"] > copies["timestamp"]).all()
+    assert len(copies) == s["copies"] and s["duplicates"] > 0 and s["late"] > 0 and s["out_of_order"] > 0
+    unique = deduplicate(copies)
+    assert len(unique) == s["delivered"]
+    assert not unique.duplicated(["devEUI", "timestamp"]).any()
+    assert set(copies["gateway"]) <= set(range(4))
+
+
+def test_weak_links_are_lost():
+    frames = _frames(devices=20)
+    clear, weak = LoRaNetwork(gateways=1, seed=7), LoRaNetwork(gateways=1, seed=7, snr_floor=20)
+    _run(clear, frames)
+    _run(weak, frames)
+    assert clear.stats.summary()["loss_rate"] < 0.05
+    assert weak.stats.summary()["loss_rate"] > 0.9
+
+
+def test_a_single_gateway_never_duplicates():
+    network = LoRaNetwork(gateways=1, seed=7)
+    copies = _run(network, _frames(devices=10))
+    assert network.stats.summary()["duplicates"] == 0
+    assert not copies.duplicated(["devEUI", "timestamp"]).any()
+
+
+def test_link_offsets_are_stable_per_device():
+    network = LoRaNetwork(gateways=5, seed=3, path_loss_spread=20)
+    euis = [f"{i:016X}" for i in range(100)]
+    offsets = network.link_offsets(euis)
+    assert offsets.shape == (100, 5)
+    assert (offsets.min(axis=1) == 0).all() and (offsets <= 20).all()
+    np.testing.assert_array_equal(network.link_offsets(euis[::-1]), offsets[::-1])
+    np.testing.assert_array_equal(LoRaNetwork(gateways=5, seed=3, path_loss_spread=20).link_offsets(euis), offsets)
+
+
+def test_nothing_is_released_before_it_arrives():
+    frames = _frames(devices=10)
+    network = LoRaNetwork(gateways=3, seed=1, late_rate=0.2)
+    for frame in frames:
+        released = network.deliver(frame)
+        assert (released["received_at"] <= frame["timestamp"].max()).all()
+    assert len(network.flush()) > 0
+
+
+@pytest.mark.parametrize("kwargs", [{"gateways": 0}, {"gateways": 256}, {"base_loss": 1.0}, {"late_rate": 2}])
+def test_invalid_networks_raise(kwargs):
+    with pytest.raises(ValueError):
+        LoRaNetwork(**kwargs)
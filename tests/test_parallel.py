@@ -0,0 +1,36 @@
+import contextlib
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.utils.data_export import find_output, read_output
+
+START = datetime(2025, 1, 1)
+SPEC = FleetSpec({
+    "templates": {"a": {"kind": "ammonia"}, "p": {"kind": "people_counter"}},
+    "groups": [{"name": "one", "template": "a"},
+               {"name": "amm", "template": "a", "count": 3},
+               {"name": "pc", "template": "p", "count": 4, "locations": ["mall", "toilet"]}],
+})
+NAMES = ["one", "amm", "pc", "combined_simulation"]
+
+
+def _run(output_dir, workers, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Simulator(duration_minutes=1440, start_time=START, output_dir=output_dir, seed=5, fleet=SPEC,
+                         workers=workers, **kwargs).run_all()
+
+
+@pytest.mark.parametrize("chunk_minutes", [None, 360])
+def test_workers_match_a_single_process_run(tmp_path, chunk_minutes):
+    serial = _run(str(tmp_path / "serial"), 1, chunk_minutes=chunk_minutes)
+    parallel = _run(str(tmp_path / "parallel"), 2, chunk_minutes=chunk_minutes)
+    if chunk_minutes is None:
+        pd.testing.assert_frame_equal(parallel, serial)
+    for name in NAMES:
+        pd.testing.assert_frame_equal(read_output(find_output(str(tmp_path / "parallel"), name)),
+                                      read_output(find_output(str(tmp_path / "serial"), name)))
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sensors.ammonia_sensor import AmmoniaFleet, AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterFleet, PeopleCounterSensor
+from src.utils.payload_codec import FRAMES, LOCATIONS, decode, encode
+
+START = datetime(2025, 1, 1)
+
+
+def _ammonia():
+    return AmmoniaFleet([AmmoniaSensor(seed=k, anomaly_rate=0.1) for k in range(4)]).generate_data(1440, START)
+
+
+def _people_counter():
+    sensors = [PeopleCounterSensor(location=location, seed=k, anomaly_rate=0.1) for k, location in enumerate(LOCATIONS)]
+    return PeopleCounterFleet(sensors).generate_data(1440, START)
+
+
+BATCHES = {"ammonia": _ammonia, "people_counter": _people_counter}
+
+
+@pytest.mark.parametrize("kind", sorted(BATCHES))
+def test_round_trip(kind):
+    df = BATCHES[kind]()
+    buf = encode(df)
+    assert len(buf) == len(df) * FRAMES[kind].itemsize
+    back = decode(buf, kind)
+    # frames carry no labels; everything else comes back at the simulator's own rounding
+    expected = df.drop(columns="anomaly_type").reset_index(drop=True)
+    assert list(back.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(back, expected, check_categorical=False, check_exact=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize("column,value", [
+    ("nh3", -0.5),                 # unsigned field
+    ("nh3", 5_000_000.0),          # beyond 2**32 / 1000
+    ("temperature", 4000.0),       # beyond 2**15 / 10
+    ("rssi", np.nan),
+    ("seqNumber", 70_000),
+    ("timestamp", pd.Timestamp("1969-12-31")),
+])
+def test_out_of_range_values_raise(column, value):
+    df = BATCHES["ammonia"]().head(5)
+    df[column] = df[column].astype(object if column != "timestamp" else df[column].dtype)
+    df.loc[2, column] = value
+    with pytest.raises(ValueError, match=column):
+        encode(df)
+
+
+def test_largest_values_fit():
+    df = BATCHES["ammonia"]().head(1)
+    df["nh3"] = np.float64((2 ** 32 - 1) / 1000)
+    df["temperature"] = -3276.8
+    assert decode(encode(df), "ammonia")["temperature"].iloc[0] == np.float32(-3276.8)
+
+
+def test_unknown_location_raises():
+    df = BATCHES["people_counter"]().head(5)
+    df["location"] = df["location"].cat.add_categories("garage")
+    df.loc[3, "location"] = "garage"
+    with pytest.raises(ValueError, match="garage"):
+        encode(df)
+
+
+def test_unknown_location_code_raises_on_decode():
+    frames = np.frombuffer(encode(BATCHES["people_counter"]().head(3)), dtype=FRAMES["people_counter"]).copy()
+    frames["location"][1] = 255
+    with pytest.raises(ValueError, match="location"):
+        decode(frames.tobytes(), "people_counter")
+
+
+def test_bad_devEUI_raises():
+    df = BATCHES["ammonia"]().head(3)
+    df["devEUI"] = ["00112233aabbccdd", "00112233aabbccxx", "0011"]
+    with pytest.raises(ValueError, match="devEUI"):
+        encode(df)
+
+
+def test_missing_column_raises():
+    with pytest.raises(ValueError, match="nh3"):
+        encode(BATCHES["ammonia"]().drop(columns="nh3"))
+
+
+def test_unknown_kind_raises():
+    df = BATCHES["ammonia"]()
+    with pytest.raises(ValueError, match="single sensor kind"):
+        encode(pd.concat([df, BATCHES["people_counter"]()]))
+    with pytest.raises(ValueError, match="layout"):
+        encode(df, kind="thermostat")
+    with pytest.raises(ValueError, match="layout"):
+        decode(b"", "thermostat")
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.profiles import ProfileLibrary, load_profiles, profile_groups
+from src.sensors.people_counter import PeopleCounterSensor
+
+# 2025-01-06 is a Monday; 2025-01-01 (a Wednesday) is a holiday
+SPEC = {
+    "holidays": ["2025-01-01"],
+    "people_counter": {
+        "shop": {
+            "flow": {
+                "default": {"00:00": [0, 1], "12:00": [2, 3]},
+                "weekend": {"00:00": [4, 5]},
+                "friday": {"00:00": [6, 7]},
+            },
+        },
+        "park": {
+            "flow": {
+                "default": {"00:00": [0, 10], "12:00": [10, 20]},
+                "holiday": {"00:00": [8, 9]},
+                "interpolate": "linear",
+            },
+        },
+    },
+}
+
+
+def _at(*stamps):
+    return np.array(stamps, dtype="datetime64[ns]")
+
+
+def test_day_types_select_their_schedules():
+    shop = ProfileLibrary(SPEC).get("people_counter", "shop")
+    flows = shop.lookup(_at("2025-01-06T08:00", "2025-01-06T13:00", "2025-01-10T13:00",
+                            "2025-01-11T13:00", "2025-01-12T01:00"), "flow")
+    assert flows.tolist() == [[0, 1], [2, 3], [6, 7], [4, 5], [4, 5]]
+
+
+def test_holidays_fall_back_to_the_weekend():
+    library = ProfileLibrary(SPEC)
+    new_year, week_later = _at("2025-01-01T13:00"), _at("2025-01-08T13:00")
+    assert library.get("people_counter", "shop").lookup(new_year, "flow").tolist() == [[4, 5]]
+    assert library.get("people_counter", "shop").lookup(week_later, "flow").tolist() == [[2, 3]]
+    assert library.get("people_counter", "park").lookup(new_year, "flow").tolist() == [[8, 9]]
+
+
+def test_step_and_linear_schedules():
+    park = ProfileLibrary(SPEC).get("people_counter", "park")
+    # linear ramps between points, wrapping around midnight
+    assert park.lookup(_at("2025-01-06T06:00", "2025-01-06T18:00"), "flow").tolist() == [[5, 15], [5, 15]]
+    shop = ProfileLibrary(SPEC).get("people_counter", "shop")
+    assert shop.lookup(_at("2025-01-06T11:59", "2025-01-06T12:00"), "flow").tolist() == [[0, 1], [2, 3]]
+
+
+def test_index_matches_lookup():
+    shop = ProfileLibrary(SPEC).get("people_counter", "shop")
+    week = np.arange("2025-01-06", "2025-01-13", dtype="datetime64[m]").astype("datetime64[ns]")
+    index = shop.index(week)
+    assert index.min() == 0 and index.max() == 7 * 1440 - 1
+    np.testing.assert_array_equal(shop.lookup(week, "flow", index=index), shop.lookup(week, "flow"))
+
+
+@pytest.mark.parametrize("spec, match", [
+    ([], "mapping"),
+    ({"holidays": ["soon"], "ammonia": {}}, "holidays"),
+    ({"ammonia": {"default": {"temperature": {"weekday": {"00:00": 1}}}}}, "default day"),
+    ({"ammonia": {"default": {"temperature": {"default": {"25:00": 1}}}}}, "time of day"),
+    ({"ammonia": {"default": {"temperature": {"default": {"noon": 1}}}}}, "HH:MM"),
+    ({"ammonia": {"default": {"temperature": {"default": {"00:00": 1}, "someday": {"00:00": 1}}}}}, "day types"),
+    ({"ammonia": {"default": {"temperature": {"default": {"00:00": 1}, "interpolate": "cubic"}}}}, "interpolate"),
+])
+def test_invalid_profiles_raise(spec, match):
+    with pytest.raises(ValueError, match=match):
+        ProfileLibrary(spec)
+
+
+def test_library_lookup_and_sharing():
+    library = load_profiles()
+    assert "mall" in library.names("people_counter") and library.names("ammonia") == ["default"]
+    with pytest.raises(ValueError, match="no people_counter profile"):
+        library.get("people_counter", "moon")
+    sensors = [PeopleCounterSensor(location=loc, seed=i) for i, loc in enumerate(["mall", "toilet", "mall"])]
+    assert sensors[0].profile is sensors[2].profile
+    first, groups = profile_groups(sensors)
+    assert first == [0, 1] and groups.tolist() == [0, 1, 0]
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.rollups import aggregate, read_rollup
+from src.sensors.people_counter import PeopleCounterSensor
+from src.utils import query
+from src.utils.data_export import find_output, get_exporter, read_output
+from src.utils.query import SimulationStore, scan
+
+START = datetime(2025, 1, 1)
+SPEC = FleetSpec({
+    "templates": {"p": {"kind": "people_counter"}},
+    "groups": [{"name": "pc", "template": "p", "count": 4, "locations": ["mall", "toilet"]}],
+})
+TYPES = ["people_counter_mall"]
+HOURS = [6, 7, 8, 20]
+
+
+def _run(output_dir, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        Simulator(duration_minutes=2 * 1440, start_time=START, output_dir=output_dir, seed=5, fleet=SPEC,
+                  **kwargs).run_all()
+
+
+def _expected(rollup):
+    mask = rollup["sensor_type"].isin(TYPES) & rollup["timestamp"].dt.hour.isin(HOURS)
+    return rollup[mask].reset_index(drop=True)
+
+
+@pytest.mark.parametrize("output_format,partition_by", [("csv", None), ("parquet", None),
+                                                        ("parquet", ("sensor_type", "date"))])
+def test_raw_fallback_matches_a_full_read(tmp_path, output_format, partition_by):
+    _run(str(tmp_path), output_format=output_format, partition_by=partition_by, rollups=False)
+    expected = _expected(aggregate(read_output(find_output(str(tmp_path), "pc")), "type", "hourly"))
+    got = SimulationStore(str(tmp_path)).rollup(["pc"], sensor_types=TYPES, hours=HOURS)
+    assert len(got) == len(HOURS) * 2
+    pd.testing.assert_frame_equal(got, expected, check_categorical=False)
+
+
+def test_indexed_rollups_match_a_filter(tmp_path):
+    _run(str(tmp_path), output_format="parquet")
+    expected = _expected(read_rollup(str(tmp_path), "pc", "type", "hourly"))
+    pd.testing.assert_frame_equal(SimulationStore(str(tmp_path)).rollup(["pc"], sensor_types=TYPES, hours=HOURS),
+                                  expected)
+
+
+def test_scan_reads_only_matching_partitions(tmp_path, monkeypatch):
+    _run(str(tmp_path), output_format="csv", partition_by=("sensor_type", "date"), rollups=False)
+    read = []
+    monkeypatch.setattr(query, "read_output", lambda path, columns=None: read.append(path) or read_output(path, columns))
+    df = scan(find_output(str(tmp_path), "pc"), ["timestamp", "period_in"], TYPES)
+    assert len(read) == 2 and all("sensor_type=people_counter_mall" in path for path in read)
+    assert set(df.columns) == {"timestamp", "period_in", "sensor_type"}
+    assert set(df["sensor_type"]) == set(TYPES)
+
+
+def test_scan_skips_parquet_row_groups_of_other_types(tmp_path):
+    frames = [PeopleCounterSensor(location=location, seed=k).generate_data(1440, START)
+              for k, location in enumerate(["toilet", "mall", "toilet"])]
+    with get_exporter(os.path.join(tmp_path, "pc"), "parquet") as exporter:
+        for frame in frames:
+            exporter.write(frame)
+    import pyarrow.parquet as pq
+
+    assert query._parquet_row_groups(pq.ParquetFile(exporter.path), TYPES) == [1]
+    df = scan(exporter.path, ["timestamp", "current_occupancy"], TYPES)
+    pd.testing.assert_series_equal(df["current_occupancy"], frames[1]["current_occupancy"].reset_index(drop=True))
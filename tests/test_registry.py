@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from src.fleet import FleetSpec
+from src.registry import DeviceRegistry, allocate_euis
+from src.utils.payload_codec import int_to_devEUI
+
+SPEC = FleetSpec({
+    "templates": {"ammonia": {"kind": "ammonia"}, "people_counter": {"kind": "people_counter", "frequency": 600}},
+    "groups": [
+        {"name": "ammonia", "template": "ammonia", "count": 400},
+        {"name": "retail", "template": "people_counter", "count": 600, "locations": ["mall", "restaurant", "toilet"]},
+        {"name": "own_seed", "template": "ammonia", "count": 5, "seed": 7, "battery": 50},
+    ],
+})
+
+
+def test_collisions_are_rehashed():
+    # every device of two identical groups hashes to the same devEUIs
+    euis, collisions = allocate_euis(np.zeros(2000, dtype=np.uint64), np.tile(np.arange(1000), 2))
+    assert collisions == 1000 and len(np.unique(euis)) == 2000
+    # the first device with a hash keeps it
+    first, _ = allocate_euis(np.zeros(1000, dtype=np.uint64), np.arange(1000))
+    assert (euis[:1000] == first).all()
+
+
+def test_lookup_finds_registered_devices():
+    registry = DeviceRegistry.from_fleet(SPEC, seed=42)
+    assert len(registry) == 1005 and len(np.unique(registry.table["devEUI"])) == 1005
+    sample = int_to_devEUI(registry.table["devEUI"][::10])
+    assert (registry.lookup(sample) == np.arange(0, len(registry), 10)).all()
+    assert (registry.lookup(registry.table["devEUI"][::10]) == np.arange(0, len(registry), 10)).all()
+    assert registry.lookup(["0000000000000000"])[0] == -1
+    assert sample[3] in registry and "0000000000000000" not in registry
+    device = registry.get(sample[50])
+    assert (device["group"], device["index"], device["sensor_type"]) == ("retail", 100, "people_counter_restaurant")
+    with pytest.raises(KeyError):
+        registry.get("0000000000000000")
+
+
+def test_type_and_location_indexes():
+    registry = DeviceRegistry.from_fleet(SPEC, seed=42)
+    assert len(registry.by_type("ammonia")) == 405
+    mall = registry.by_type("people_counter_mall")
+    assert len(mall) == 200 and (registry.frame(mall)["location"] == "mall").all()
+    assert len(registry.by_location("toilet")) == 200
+    assert len(registry.by_location("classroom")) == 0 and len(registry.by_type("toaster")) == 0
+    assert registry.table["battery"][registry.group_slice("own_seed")].tolist() == [50] * 5
+
+
+def test_seeds_pick_the_devEUIs():
+    a, b = DeviceRegistry.from_fleet(SPEC, seed=1), DeviceRegistry.from_fleet(SPEC, seed=2)
+    assert (a.devEUIs("ammonia") != b.devEUIs("ammonia")).all()
+    # a group with its own seed ignores the simulation seed
+    assert (a.devEUIs("own_seed") == b.devEUIs("own_seed")).all()
+    assert (a.devEUIs("retail", [3, 1]) == a.devEUIs("retail")[[3, 1]]).all()
+    with pytest.raises(ValueError, match="Unknown sensor type"):
+        a.group_slice("nope")
+
+
+def test_save_and_load(tmp_path):
+    registry = DeviceRegistry.from_fleet(SPEC, seed=42)
+    loaded = DeviceRegistry.load(registry.save(str(tmp_path / "devices.npz")))
+    np.testing.assert_array_equal(loaded.table, registry.table)
+    assert loaded.groups == registry.groups
+    assert (loaded.lookup(registry.table["devEUI"]) == np.arange(len(registry))).all()
+
+
+def test_duplicate_devEUIs_are_rejected():
+    table = DeviceRegistry.from_fleet(SPEC, seed=42).table.copy()
+    table["devEUI"][1] = table["devEUI"][0]
+    with pytest.raises(ValueError, match="duplicate"):
+        DeviceRegistry(table, ["ammonia", "retail", "own_seed"])
@@ -0,0 +1,90 @@
+import contextlib
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator import Simulator
+from src.checkpoint import (capture_state, checkpoint_path, concat_states, load_checkpoint, restore_state,
+                            save_checkpoint)
+from src.fleet import FleetSpec
+from src.sensors.ammonia_sensor import AmmoniaFleet, AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterFleet, PeopleCounterSensor
+from src.utils.data_export import find_output, read_output
+
+START = datetime(2025, 1, 1)
+# the interruption falls mid-chunk, mid-block and mid-day: 1100 readings at 5-minute intervals
+FIRST_MINUTES = 5500
+TOTAL_MINUTES = 3 * 1440 + 5500
+
+SETTINGS = {"anomaly_rate": 0.2, "anomaly_weights": {"drift": 0.2, "stuck": 0.2, "dropout": 0.2}}
+SPEC = FleetSpec({
+    "templates": {"a": {"kind": "ammonia", **SETTINGS}, "p": {"kind": "people_counter", **SETTINGS}},
+    "groups": [{"name": "one", "template": "a"},
+               {"name": "amm", "template": "a", "count": 5},
+               {"name": "pc", "template": "p", "count": 6, "locations": ["mall", "toilet"]}],
+})
+
+
+def _run(output_dir, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        Simulator(fleet=SPEC, seed=5, chunk_minutes=700, shard_size=4, output_dir=output_dir, **kwargs).run_all()
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "csv"])
+def test_resumed_run_matches_full_run(tmp_path, output_format):
+    full, resumed = str(tmp_path / "full"), str(tmp_path / "resumed")
+    _run(full, duration_minutes=TOTAL_MINUTES, start_time=START, output_format=output_format)
+    _run(resumed, duration_minutes=FIRST_MINUTES, start_time=START, output_format=output_format, checkpoint=True)
+    # start_time is ignored on resume: each group carries on from where its checkpoint ended
+    _run(resumed, duration_minutes=TOTAL_MINUTES - FIRST_MINUTES, start_time=datetime(2030, 1, 1),
+         output_format=output_format, resume=True)
+
+    for name in ["one", "amm", "pc", "combined_simulation"]:
+        expected = read_output(find_output(full, name))
+        assert len(expected) > 0
+        pd.testing.assert_frame_equal(read_output(find_output(resumed, name)), expected)
+
+
+FLEETS = {
+    "ammonia": lambda: AmmoniaFleet([AmmoniaSensor(seed=i, **SETTINGS) for i in range(3)]),
+    "people_counter": lambda: PeopleCounterFleet([PeopleCounterSensor(location=loc, seed=i, **SETTINGS)
+                                                  for i, loc in enumerate(["mall", "toilet", "classroom"])]),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(FLEETS))
+def test_restored_fleet_continues_where_it_left_off(tmp_path, kind):
+    fleet = FLEETS[kind]()
+    fleet.generate_data(FIRST_MINUTES, start_time=START)
+    path = save_checkpoint(checkpoint_path(str(tmp_path), kind), {"step": 1}, capture_state(fleet))
+    later = datetime(2025, 1, 5)
+    expected = fleet.generate_data(1440, start_time=later)
+
+    meta, arrays = load_checkpoint(path)
+    assert meta["step"] == 1
+    resumed = FLEETS[kind]()
+    restore_state(resumed, arrays)
+    pd.testing.assert_frame_equal(resumed.generate_data(1440, start_time=later), expected)
+
+    # shards restore from their slice of the joined state
+    first, rest = FLEETS[kind]().sensors[:1], FLEETS[kind]().sensors[1:]
+    restore_state(first, arrays)
+    restore_state(rest, arrays, lo=1)
+    joined = concat_states([capture_state(first), capture_state(rest)])
+    for key, values in arrays.items():
+        np.testing.assert_array_equal(joined[key], values)
+
+
+def test_missing_or_stale_checkpoints(tmp_path):
+    path = checkpoint_path(str(tmp_path), "amm")
+    assert load_checkpoint(path) is None
+    save_checkpoint(path, {}, {"x": np.zeros(1)})
+    assert load_checkpoint(path)[1]["x"].tolist() == [0]
+    # a checkpoint written by an older layout
+    with open(path, "wb") as f:
+        np.savez(f, meta=np.array('{"version": 1}'), x=np.zeros(1))
+    with pytest.raises(ValueError, match="version"):
+        load_checkpoint(path)
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.rollups import GRANULARITIES, LEVELS, ROLLUP_DIR, RollupStream, aggregate, find_rollup, mean, read_rollup
+from src.schema import concat_frames
+from src.utils.data_export import read_output
+
+START = datetime(2025, 1, 1)
+NODES = 3
+SPEC = FleetSpec({
+    "templates": {"a": {"kind": "ammonia", "frequency": 600}},
+    "groups": [{"name": "amm", "template": "a", "count": 7}],
+})
+
+
+def _quiet(run):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run()
+
+
+class _Collect:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, df):
+        self.frames.append(df)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("granularity", GRANULARITIES)
+@pytest.mark.parametrize("level", LEVELS)
+def test_streamed_chunks_match_the_one_shot_rollup(level, granularity):
+    frames = list(SPEC.build("amm", 0, 7, seed=5).iter_chunks(1440, chunk_size=36, start_time=START))
+    raw = concat_frames(frames, ignore_index=True)
+    sink = _Collect()
+    with RollupStream(sink, level) as stream:
+        for frame in frames:
+            stream.add(aggregate(frame, level, granularity))
+    streamed = concat_frames(sink.frames, ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, aggregate(raw, level, granularity), check_categorical=False,
+                                  check_exact=False)
+    assert streamed["count"].sum() == len(raw)
+    if level == "type":
+        assert mean(streamed, "nh3") == pytest.approx(raw["nh3"].mean())
+
+
+def test_stream_combines_rows_of_one_bucket_within_a_part():
+    frame = SPEC.build("amm", 0, 7, seed=5).generate_data(1440, start_time=START)
+    # a block as merge_nodes streams it: the rollups of two nodes' devices (a range split), interleaved in time order
+    first = frame["devEUI"].isin(frame["devEUI"].iloc[:3])
+    halves = [frame[first], frame[~first]]
+    part = pd.concat([aggregate(half, "type", "hourly") for half in halves]).sort_values("timestamp", kind="stable")
+    sink = _Collect()
+    with RollupStream(sink, "type") as stream:
+        stream.add(part.reset_index(drop=True))
+    streamed = pd.concat(sink.frames, ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, aggregate(frame, "type", "hourly"), check_exact=False)
+
+
+@pytest.mark.parametrize("split", ["range", "hash"])
+def test_merged_node_rollups_match_a_single_host_run(tmp_path, split):
+    single, cluster = str(tmp_path / "single"), str(tmp_path / "cluster")
+    kwargs = dict(duration_minutes=2 * 1440, start_time=START, seed=5, fleet=SPEC, output_format="parquet")
+    _quiet(lambda: Simulator(output_dir=single, **kwargs).run_all())
+    for i in range(NODES):
+        _quiet(lambda: Simulator(output_dir=cluster, node=(i, NODES), node_split=split, **kwargs).run_all())
+    _quiet(lambda: Simulator(output_dir=cluster, seed=5, fleet=SPEC, output_format="parquet").merge_nodes())
+
+    for granularity in ["1min", "hourly", "daily"]:
+        expected = read_rollup(single, "amm", "type", granularity)
+        merged = read_rollup(cluster, "amm", "type", granularity)
+        # one row per bucket in the file itself, not just once read_rollup() has combined them
+        written = read_output(find_rollup(cluster, "amm", "type", granularity))
+        assert len(written) == len(expected)
+        if split == "hash":
+            # devices report in lockstep, so "last" is a tie between devices; a single host breaks it
+            # by fleet order, a hash split by node order
+            last = [c for c in expected.columns if c.endswith("_last")]
+            expected, merged = expected.drop(columns=last), merged.drop(columns=last)
+        pd.testing.assert_frame_equal(merged, expected, check_exact=False)
+
+
+def test_device_rollups_are_opt_in(tmp_path):
+    kwargs = dict(duration_minutes=1440, start_time=START, seed=5, fleet=SPEC, output_format="parquet")
+    _quiet(lambda: Simulator(output_dir=str(tmp_path / "default"), **kwargs).run_all())
+    assert sorted(os.listdir(tmp_path / "default" / ROLLUP_DIR)) == \
+        ["amm.type.1min.parquet", "amm.type.daily.parquet", "amm.type.hourly.parquet"]
+
+    _quiet(lambda: Simulator(output_dir=str(tmp_path / "devices"), rollup_levels=("type", "device"), **kwargs).run_all())
+    rollup = read_rollup(str(tmp_path / "devices"), "amm", "device", "hourly")
+    assert len(rollup) == 7 * 24
+    with pytest.raises(ValueError, match="rollup levels"):
+        Simulator(rollup_levels=("sensor",), **kwargs)
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.schema import FIXED_CATEGORIES, restore_dtypes
+from src.sensors.ammonia_sensor import AmmoniaSensor
+from src.utils.data_export import export_frame, read_output
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_outputs_read_back_on_schema_dtypes(tmp_path, output_format):
+    # a day at 5-minute intervals with the default anomaly rate: only some anomaly labels show up
+    df = AmmoniaSensor(seed=3, anomaly_rate=0.05).generate_data(1440, start_time=START)
+    back = read_output(export_frame(df, str(tmp_path / "ammonia"), output_format))
+    assert back["timestamp"].dtype == "datetime64[ns]"
+    assert list(back["anomaly_type"].cat.categories) == list(FIXED_CATEGORIES["anomaly_type"].categories)
+    pd.testing.assert_frame_equal(back, df, check_exact=False)
+
+
+def test_restore_dtypes_reorders_anomaly_labels():
+    labels = ["radio", "none", "drift"]
+    df = restore_dtypes(pd.DataFrame({
+        "timestamp": pd.to_datetime(["2025-01-01"] * 3).astype("datetime64[us]"),
+        "anomaly_type": pd.Categorical(labels),  # categories as a CSV reader infers them: sorted, present only
+    }))
+    assert df["timestamp"].dtype == "datetime64[ns]"
+    assert df["anomaly_type"].dtype == FIXED_CATEGORIES["anomaly_type"]
+    assert list(df["anomaly_type"].cat.categories) == list(FIXED_CATEGORIES["anomaly_type"].categories)
+    assert df["anomaly_type"].tolist() == labels
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.sensors.ammonia_sensor import AmmoniaFleet, AmmoniaSensor
+from src.sensors.people_counter import PeopleCounterFleet, PeopleCounterSensor
+
+START = datetime(2025, 1, 1)
+DEVICES = 4
+LOCATIONS = ["mall", "toilet", "classroom", "mall"]
+
+
+def _ammonia(k):
+    return AmmoniaSensor(seed=k, anomaly_rate=0.1)
+
+
+def _counter(k, anomaly_rate=0.1):
+    return PeopleCounterSensor(location=LOCATIONS[k], seed=k, anomaly_rate=anomaly_rate)
+
+
+def _device(frame, devEUI):
+    return frame[frame["devEUI"] == devEUI].reset_index(drop=True)
+
+
+def test_ammonia_fleet_rows_are_ordered_by_time_then_device():
+    fleet = AmmoniaFleet([AmmoniaSensor(seed=k, anomaly_rate=0) for k in range(DEVICES)])
+    df = fleet.generate_data(1440, START)
+    assert len(df) == 288 * DEVICES
+    assert list(df["devEUI"].iloc[:DEVICES]) == list(fleet.devEUI)
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["temperature"].between(20, 40).all() and df["humidity"].between(20, 95).all()
+    assert (df["nh3"] >= 0.05).all()
+
+
+def test_ammonia_fleet_devices_match_fleets_of_one():
+    # every per-device sample comes from the device's own stream, so neighbours never change a device's data
+    whole = AmmoniaFleet([_ammonia(k) for k in range(DEVICES)]).generate_data(1440, START)
+    for k in range(DEVICES):
+        alone = AmmoniaFleet([_ammonia(k)]).generate_data(1440, START)
+        pd.testing.assert_frame_equal(_device(whole, alone["devEUI"].iloc[0]), alone, check_categorical=False)
+
+
+def test_ammonia_fleet_of_one_matches_the_batched_sensor():
+    # the fleet draws each device's samples through the sensor's own draw_values(), in the same order
+    alone = AmmoniaFleet([_ammonia(3)]).generate_data(3 * 1440, START)
+    batched = _ammonia(3).generate_data(3 * 1440, START, batched=True)
+    pd.testing.assert_frame_equal(alone, batched, check_categorical=False)
+
+
+def test_ammonia_fleet_writes_state_back_to_its_sensors():
+    sensors = [_ammonia(k) for k in range(DEVICES)]
+    AmmoniaFleet(sensors).generate_data(1440, START)
+    assert {s.seqNumber for s in sensors} == {288} and {s._step for s in sensors} == {288}
+    # a sensor picked out of the fleet carries on by itself
+    fleet = AmmoniaFleet(sensors[:1])
+    later = fleet.generate_data(60, datetime(2025, 1, 2))
+    assert later["seqNumber"].iloc[0] == 288
+
+
+def test_ammonia_fleet_rejects_mixed_frequencies():
+    with pytest.raises(ValueError, match="frequency"):
+        AmmoniaFleet([AmmoniaSensor(frequency=300), AmmoniaSensor(frequency=600)])
+    with pytest.raises(ValueError, match="at least one"):
+        AmmoniaFleet([])
+
+
+def test_people_counter_fleet_devices_match_fleets_of_one():
+    whole = PeopleCounterFleet([_counter(k) for k in range(DEVICES)]).generate_data(1440, START)
+    for k in range(DEVICES):
+        alone = PeopleCounterFleet([_counter(k)]).generate_data(1440, START)
+        pd.testing.assert_frame_equal(_device(whole, alone["devEUI"].iloc[0]), alone, check_categorical=False)
+
+
+def test_people_counter_fleet_of_one_matches_the_batched_sensor():
+    for k in range(DEVICES):
+        alone = PeopleCounterFleet([_counter(k)]).generate_data(3 * 1440, START)
+        batched = _counter(k).generate_data(3 * 1440, START, batched=True)
+        pd.testing.assert_frame_equal(alone, batched, check_categorical=False)
+
+
+def test_people_counter_fleet_tracks_occupancy_per_location():
+    sensors = [_counter(k, anomaly_rate=0) for k in range(DEVICES)]
+    df = PeopleCounterFleet(sensors).generate_data(2 * 1440, START)
+    assert set(df["sensor_type"]) == {f"people_counter_{loc}" for loc in LOCATIONS}
+    for s in sensors:
+        rows = _device(df, s.devEUI)
+        assert (rows["location"] == s.location).all()
+        # without anomalies nobody leaves who isn't inside, and occupancy stays within capacity
+        before = rows["current_occupancy"].shift(fill_value=0)
+        assert (rows["period_out"] <= before).all()
+        expected = (before + rows["period_in"] - rows["period_out"]).clip(0, s.max_capacity)
+        assert (rows["current_occupancy"] == expected).all()
+        assert rows["current_occupancy"].iloc[-1] == s.current_occupancy
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.sinks import BatchingSink, HttpSink, LocalHttpCollector
+
+
+def _strict_json(records):
+    # unlike the default serializer, refuses anything JSON can't hold (here: a set)
+    return json.dumps(records).encode()
+
+
+def _flushes(sink, timeout=10):
+    done = threading.Thread(target=sink.flush, daemon=True)
+    done.start()
+    done.join(timeout)
+    return not done.is_alive()
+
+
+def test_unexpected_errors_fail_the_batch_not_the_worker():
+    with LocalHttpCollector() as collector:
+        sink = HttpSink(collector.url, batch_size=10, linger=0.01, connections=1, serializer=_strict_json)
+        sink.send([{"n": i} for i in range(10)])
+        assert _flushes(sink)
+        sink.send([{"n": {1}}])
+        assert _flushes(sink)
+        sink.send([{"n": i} for i in range(10)])
+        sink.close()
+        assert collector.received == 20
+    stats = sink.stats.summary()
+    assert (stats["delivered"], stats["failed"], stats["batches"]) == (20, 1, 2)
+
+
+def test_throughput_counts_from_the_first_batch():
+    with LocalHttpCollector() as collector:
+        sink = HttpSink(collector.url, batch_size=100, linger=0.01)
+        time.sleep(0.5)  # idle before anything is sent
+        sink.send([{"n": i} for i in range(100)])
+        sink.close()
+    # 100 readings in one batch over loopback take far less than the idle half second
+    assert sink.stats.summary()["throughput_per_sec"] > 400
+
+
+class _Recorder(BatchingSink):
+    # delivers nowhere; records each batch's size, optionally holding every delivery until released
+    name = "recorder"
+
+    def __init__(self, **kwargs):
+        self.sizes = []
+        self.gate = threading.Event()
+        self.gate.set()
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        return object()
+
+    def _deliver(self, conn, payload):
+        self.gate.wait()
+        self.sizes.append(len(json.loads(payload)))
+
+    def _disconnect(self, conn):
+        pass
+
+
+def test_frames_are_sent_in_batch_size_slices():
+    frame = pd.DataFrame({"n": np.arange(1050), "devEUI": pd.Categorical(["a", "b"] * 525)})
+    sink = _Recorder(batch_size=100, linger=0.5, connections=1)
+    sink.send(frame)
+    sink.send([{"n": i, "devEUI": "c"} for i in range(30)])
+    sink.close()
+    # the 50-row tail of the frame and the list share a batch
+    assert sorted(sink.sizes, reverse=True) == [100] * 10 + [80]
+    stats = sink.stats.summary()
+    assert (stats["delivered"], stats["batches"], stats["failed"]) == (1080, 11, 0)
+
+
+def test_backpressure_counts_readings():
+    sink = _Recorder(batch_size=10, linger=0.01, max_in_flight=50, connections=1)
+    sink.gate.clear()
+    sent = threading.Event()
+    sender = threading.Thread(target=lambda: (sink.send([{"n": i} for i in range(100)]), sent.set()), daemon=True)
+    sender.start()
+    time.sleep(0.3)
+    # five slices of ten readings fill the queue; the sixth waits for room
+    assert not sent.is_set() and sink._in_flight == 50
+    sink.gate.set()
+    assert sent.wait(10)
+    sink.close()
+    assert sink.stats.summary()["delivered"] == 100
@@ -0,0 +1,98 @@
+import contextlib
+import io
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from simulator import Simulator
+from src.fleet import FleetSpec
+from src.utils.data_export import find_output, output_size
+from src.utils.stats import NULL_STATS, RunStats, load_report
+
+START = datetime(2025, 1, 1)
+SPEC = FleetSpec({
+    "templates": {"a": {"kind": "ammonia", "frequency": 600}},
+    "groups": [{"name": "amm", "template": "a", "count": 3}, {"name": "solo", "template": "a"}],
+})
+
+
+def _quiet(run):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run()
+
+
+def test_stages_accumulate_calls_rows_and_time():
+    stats = RunStats()
+    with stats.session():
+        for _ in range(3):
+            with stats.stage("amm", "export", rows=10):
+                time.sleep(0.001)
+        chunks = list(stats.timed_iter([[1, 2], [3]], "amm", "generate"))
+    assert chunks == [[1, 2], [3]]
+    export = stats.stages[("amm", "export")].to_dict()
+    assert (export["calls"], export["rows"]) == (3, 30) and export["seconds"] > 0
+    assert stats.stages[("amm", "generate")].rows == 3
+    assert stats.wall_seconds >= export["seconds"]
+
+
+def test_merge_folds_in_worker_stats():
+    main, worker = RunStats(), RunStats()
+    main.add("amm", "export", 1.0, rows=5)
+    worker.add("amm", "export", 2.0, rows=7)
+    worker.add("solo", "generate", 0.5, rows=1)
+    main.merge(worker)
+    assert main.stages[("amm", "export")].to_dict()["rows_per_sec"] == 4.0
+    assert set(main.stages) == {("amm", "export"), ("solo", "generate")}
+
+
+def test_trace_memory_records_stage_peaks():
+    stats = RunStats(trace_memory=True)
+    with stats.session():
+        with stats.stage("amm", "build"):
+            block = bytearray(4 * 2**20)
+    del block
+    assert stats.stages[("amm", "build")].peak_bytes >= 4 * 2**20
+    assert stats.peak_bytes >= 4 * 2**20
+
+
+def test_null_stats_are_no_ops():
+    with NULL_STATS.session(), NULL_STATS.stage("amm", "export"):
+        NULL_STATS.add("amm", "export", 1.0)
+    assert NULL_STATS.stages == {} and not NULL_STATS.enabled
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_simulator_writes_a_report(tmp_path, workers):
+    sim = Simulator(output_dir=str(tmp_path), duration_minutes=1440, start_time=START, seed=5, fleet=SPEC,
+                    stats=True, workers=workers)
+    _quiet(sim.run_all)
+    report = load_report(os.path.join(tmp_path, "run_stats.json"))
+    stages = {(s["sensor"], s["stage"]): s for s in report["stages"]}
+    assert {"build", "generate", "export"} <= {stage for _, stage in stages}
+    # worker stats are merged back into the parent's report
+    assert stages[("amm", "generate")]["rows"] == 3 * 144
+    assert stages[("solo", "generate")]["rows"] == 144
+    assert report["wall_seconds"] > 0
+
+
+def test_resumed_run_reports_only_the_bytes_it_appends(tmp_path):
+    def run(**kwargs):
+        sim = Simulator(output_dir=str(tmp_path), duration_minutes=1440, start_time=START, seed=5, fleet=SPEC,
+                        stats=True, checkpoint=True, **kwargs)
+        _quiet(sim.run_all)
+        return {(s["sensor"], s["stage"]): s for s in load_report(os.path.join(tmp_path, "run_stats.json"))["stages"]}
+
+    run()
+    before = {name: output_size(find_output(str(tmp_path), name)) for name in ["amm", "combined_simulation"]}
+    stages = run(resume=True)
+    for name, size in before.items():
+        assert stages[(name, "export")]["bytes"] == output_size(find_output(str(tmp_path), name)) - size
+
+
+def test_stats_are_off_by_default(tmp_path):
+    sim = Simulator(output_dir=str(tmp_path), duration_minutes=60, start_time=START, seed=5, fleet=SPEC)
+    _quiet(sim.run_all)
+    assert sim.stats is NULL_STATS
+    assert not os.path.exists(os.path.join(tmp_path, "run_stats.json"))